@@ -22,4 +22,8 @@ CORS(app, resources={r"/*": {
     "allow_headers": ["Content-Type", "Authorization"]
 }})  # Enhanced CORS settings
 
+# Apply the CPU/thread budget before any model or OCR work starts
+from app.runtime_config import configure_runtime
+configure_runtime()
+
 from app import routes 
\ No newline at end of file
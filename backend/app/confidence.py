@@ -0,0 +1,162 @@
+import numpy as np
+
+# Calibrations of a document's overall confidence. Parser v2 and the LLM parser use the
+# "weighted" one: the weighted mean of the field confidences, scaled down to 70% when no
+# field is above CONFIDENT_FIELD, up to 100% when all of them are. Parser v1 uses "mean",
+# the plain mean of the field confidences.
+SCORED_FIELDS = ("customer", "order_id", "shipping_address", "line_items")
+
+# Fields importance: order_id > line_items > customer > shipping_address
+FIELD_WEIGHTS = {
+    "order_id": 1.5,
+    "line_items": 1.3,
+    "customer": 1.0,
+    "shipping_address": 0.8
+}
+CONFIDENT_FIELD = 0.6
+COMPLETENESS_BASE = 0.7
+COMPLETENESS_BONUS = 0.3
+
+TOTAL_WEIGHT = sum(FIELD_WEIGHTS.values())
+
+def overall_confidence(confidence):
+    """
+    Combine the field confidences of a document into its overall confidence.
+
+    Args:
+        confidence (dict): Confidence of "customer", "order_id", "shipping_address" and "line_items"
+
+    Returns:
+        float: Weighted confidence, lowered when fields are missing or unsure
+    """
+    # Calculate weighted confidence
+    weighted_sum = sum(confidence[field] * FIELD_WEIGHTS[field] for field in SCORED_FIELDS)
+
+    # Adjust confidence based on completeness
+    completeness_factor = sum(1 for field in SCORED_FIELDS if confidence[field] > CONFIDENT_FIELD) / len(SCORED_FIELDS)
+
+    # Final confidence calculation
+    return (weighted_sum / TOTAL_WEIGHT) * (COMPLETENESS_BASE + (completeness_factor * COMPLETENESS_BONUS))
+
+def mean_confidence(confidence):
+    """
+    Combine the field confidences of a document into their plain mean, as parser v1 does.
+
+    Args:
+        confidence (dict): Confidence of "customer", "order_id", "shipping_address" and "line_items"
+
+    Returns:
+        float: Mean field confidence
+    """
+    return sum(confidence[field] for field in SCORED_FIELDS) / len(SCORED_FIELDS)
+
+def overall_confidences(field_confidences, weights=None):
+    """
+    Compute the overall confidence of many documents at once.
+
+    With the default weights, gives exactly the values overall_confidence() gives
+    for each row: the weighted sum is accumulated field by field in the same order.
+
+    Args:
+        field_confidences (np.ndarray): (documents, fields) array, columns in SCORED_FIELDS order
+        weights (dict): Weight of each field, e.g. to try a new calibration (default: FIELD_WEIGHTS)
+
+    Returns:
+        np.ndarray: Overall confidence per document
+    """
+    weights = weights or FIELD_WEIGHTS
+    field_confidences = np.asarray(field_confidences, dtype=np.float64)
+    weighted_sum = np.zeros(len(field_confidences))
+    confident_fields = np.zeros(len(field_confidences))
+    for column, field in enumerate(SCORED_FIELDS):
+        values = field_confidences[:, column]
+        weighted_sum += values * weights[field]
+        confident_fields += values > CONFIDENT_FIELD
+
+    completeness_factor = confident_fields / len(SCORED_FIELDS)
+    return (weighted_sum / sum(weights.values())) * (COMPLETENESS_BASE + (completeness_factor * COMPLETENESS_BONUS))
+
+def mean_confidences(field_confidences):
+    """
+    Compute the plain mean confidence of many documents at once, exactly as
+    mean_confidence() does for each row.
+
+    Args:
+        field_confidences (np.ndarray): (documents, fields) array, columns in SCORED_FIELDS order
+
+    Returns:
+        np.ndarray: Mean field confidence per document
+    """
+    field_confidences = np.asarray(field_confidences, dtype=np.float64)
+    total = np.zeros(len(field_confidences))
+    for column in range(len(SCORED_FIELDS)):
+        total += field_confidences[:, column]
+    return total / len(SCORED_FIELDS)
+
+# Batch scoring function of each calibration
+CALIBRATIONS = {
+    "weighted": overall_confidences,  # Parser v2 and the LLM parser
+    "mean": mean_confidences          # Parser v1
+}
+
+def document_field_confidences(documents):
+    """
+    Read the field confidences of parsed documents from their extraction details.
+
+    The line items confidence is the mean SKU confidence of the items, as the
+    parsers compute it. Fields without details count as 0.
+
+    Args:
+        documents (list): Parser or LLM outputs, with "extraction_details"
+
+    Returns:
+        np.ndarray: (documents, fields) array, columns in SCORED_FIELDS order
+    """
+    # Collect plain lists first: the nested dicts can only be read one by one in Python
+    header_fields = SCORED_FIELDS[:-1]
+    header = []
+    item_counts = []
+    item_confidences = []
+    for document in documents:
+        details = document.get("extraction_details") or {}
+        header.append([(details.get(field) or {}).get("confidence", 0) for field in header_fields])
+        items = details.get("line_items") or []
+        item_counts.append(len(items))
+        item_confidences.extend([item["sku"]["confidence"] for item in items])
+
+    # Sum the items of every document in one pass (bincount adds them in order, like sum())
+    item_counts = np.array(item_counts, dtype=np.int64)
+    owners = np.repeat(np.arange(len(documents)), item_counts)
+    item_sums = np.bincount(owners, weights=np.array(item_confidences, dtype=np.float64), minlength=len(documents))
+    line_items = item_sums / np.maximum(item_counts, 1)
+
+    return np.column_stack([np.array(header, dtype=np.float64).reshape(len(documents), len(header_fields)),
+                            line_items])
+
+def rescore_documents(documents, calibration="weighted"):
+    """
+    Recompute the confidence of parsed documents with the current calibration, in place.
+
+    The documents should all come from strategies using the given calibration:
+    "weighted" for parser v2 and LLM outputs, "mean" for parser v1 outputs.
+
+    Args:
+        documents (list): Parser or LLM outputs, with "extraction_details"
+        calibration (str): Name of the calibration in CALIBRATIONS
+
+    Returns:
+        np.ndarray: New overall confidence per document, e.g. to re-threshold
+                    them with overall < CONFIDENCE_THRESHOLD
+
+    Raises:
+        ValueError: If the calibration is unknown
+    """
+    if calibration not in CALIBRATIONS:
+        raise ValueError(f"Unknown confidence calibration '{calibration}', expected one of: {', '.join(CALIBRATIONS)}")
+    fields = document_field_confidences(documents)
+    overall = CALIBRATIONS[calibration](fields)
+    for document, row, document_overall in zip(documents, fields.tolist(), overall.tolist()):
+        confidence = dict(zip(SCORED_FIELDS, row))
+        confidence["overall"] = document_overall
+        document["confidence"] = confidence
+    return overall
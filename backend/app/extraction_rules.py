@@ -0,0 +1,679 @@
+import os
+import re
+import json
+import time
+from threading import Lock
+from app.regex_engine import KeywordScanner, anchor_positions, check_deadline, first_match, iter_matches
+from app.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Extraction rule sets shared by the parsers. The defaults ship with the app; a vendor
+# rule file only needs the groups and lists it changes (JSON, or YAML if PyYAML is installed)
+#
+# Document-level patterns should be written so that no two adjacent parts can match the
+# same characters (e.g. "\s*(?:[\:\#]\s*)?" rather than "\s*[\:\#]?\s*"), which keeps a
+# failed attempt linear instead of cubic in the length of a whitespace run. Where a
+# captured value may itself start with whitespace, the separator is matched atomically
+# ("(?=(\s*))\1") and a second branch covers the whitespace-only value the original
+# pattern could also produce. Value runs are bounded so that an attempt never scans
+# more than a few hundred characters past its keyword.
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules", "default_rules.json")
+EXTRACTION_RULES_PATH = os.environ.get("EXTRACTION_RULES_PATH", "")
+
+# Flags a rule can list; rules without "flags" are case-insensitive
+RULE_FLAGS = {
+    "IGNORECASE": re.IGNORECASE,
+    "MULTILINE": re.MULTILINE,
+    "DOTALL": re.DOTALL
+}
+RULE_KEYS = {"description", "pattern", "keywords", "anchor", "requires", "flags"}
+
+# Where an anchored rule is tried: at its keywords, or at the run of digits right before them
+ANCHOR_KEYWORD = "keyword"
+ANCHOR_DIGITS = "digits"
+
+# Per-rule counters are updated from every request thread
+_stats_lock = Lock()
+
+def match_value(match):
+    """
+    Get the value a rule captured.
+
+    Args:
+        match (re.Match): Match of a rule pattern
+
+    Returns:
+        str: The "value" group if the pattern has one (None when it matched no value), else group 1
+    """
+    if "value" in match.re.groupindex:
+        return match.group("value")
+    return match.group(1)
+
+def digit_run_starts(text, positions):
+    """
+    Get the start of the run of digits right before each position.
+
+    Args:
+        text (str): Text the positions refer to
+        positions (list): Sorted positions
+
+    Returns:
+        list: Sorted start positions, for the positions preceded by at least one digit
+    """
+    starts = []
+    for pos in positions:
+        start = pos
+        # str.isdecimal() is the same character class as \d
+        while start > 0 and text[start - 1].isdecimal():
+            start -= 1
+        if start < pos:
+            starts.append(start)
+    return starts
+
+def lower_ascii(text):
+    """
+    Lowercase text for the keyword prefilter.
+
+    Args:
+        text (str): Text to check
+
+    Returns:
+        str: Lowercased text, or None if the text isn't ASCII (IGNORECASE also folds
+             some non-ASCII characters, e.g. "ſku", so such text skips the prefilter)
+    """
+    return text.lower() if text.isascii() else None
+
+class Rule:
+    """
+    One compiled extraction pattern, with its keywords and usage counters.
+
+    Keywords are lowercase ASCII literals that every match of the pattern
+    starts with (case-insensitively). They let a rule be tried only where a
+    keyword starts in a document, and skipped on lines without any of them.
+    """
+
+    def __init__(self, name, pattern, keywords=(), anchor=ANCHOR_KEYWORD, requires=(), description=""):
+        """
+        Args:
+            name (str): Rule name for stats, e.g. "order_id.fallback[2]"
+            pattern (re.Pattern): Compiled pattern
+            keywords (tuple): Literals every match starts with (empty to always search)
+            anchor (str): ANCHOR_KEYWORD, or ANCHOR_DIGITS for matches starting at the digits before a keyword
+            requires (tuple): Substrings every match contains (e.g. "#")
+            description (str): Example of what the rule matches
+        """
+        self.name = name
+        self.pattern = pattern
+        self.keywords = tuple(keywords)
+        self.anchor = anchor
+        self.requires = tuple(requires)
+        self.description = description
+        self.calls = 0
+        self.hits = 0
+        self.elapsed = 0.0
+
+    def _record(self, elapsed, hits):
+        with _stats_lock:
+            self.calls += 1
+            self.hits += hits
+            self.elapsed += elapsed
+
+    def _has_required(self, text):
+        return all(required in text for required in self.requires)
+
+    def _starts(self, text, positions):
+        """Get the positions to try the pattern at, from a scan by RuleSet.keyword_scanner()"""
+        names = []
+        for keyword in self.keywords:
+            # The scanner drops keywords that start with another scanned keyword
+            name = keyword if keyword in positions else next((name for name in positions if keyword.startswith(name)), None)
+            if name is None:
+                raise ValueError(f"Keyword '{keyword}' of extraction rule {self.name} was not scanned")
+            if name not in names:
+                names.append(name)
+        starts = anchor_positions(positions, tuple(names))
+        if self.anchor == ANCHOR_DIGITS:
+            return digit_run_starts(text, starts)
+        return starts
+
+    def first_match(self, text, positions=None, deadline=None):
+        """
+        Find the leftmost match in a document.
+
+        Args:
+            text (str): Text to match
+            positions (dict): Optional keyword positions from RuleSet.keyword_scanner(), to only try the
+                              pattern where its keywords start (rules without keywords search the text)
+            deadline (float): Optional output of regex_deadline()
+
+        Returns:
+            re.Match: The first match, or None
+
+        Raises:
+            RegexTimeBudgetExceeded: If the deadline passes
+        """
+        start_time = time.perf_counter()
+        if not self._has_required(text):
+            result = None
+        elif positions is None or not self.keywords:
+            check_deadline(deadline)
+            result = self.pattern.search(text)
+        else:
+            result = first_match(self.pattern, text, self._starts(text, positions), deadline)
+        self._record(time.perf_counter() - start_time, 1 if result else 0)
+        return result
+
+    def iter_matches(self, text, positions=None, deadline=None):
+        """
+        Find all non-overlapping matches in a document.
+
+        Args:
+            text (str): Text to match
+            positions (dict): Optional keyword positions, as for first_match()
+            deadline (float): Optional output of regex_deadline()
+
+        Yields:
+            re.Match: Matches in order
+
+        Raises:
+            RegexTimeBudgetExceeded: If the deadline passes
+        """
+        start_time = time.perf_counter()
+        if not self._has_required(text):
+            matches = iter(())
+        elif positions is None or not self.keywords:
+            check_deadline(deadline)
+            matches = self.pattern.finditer(text)
+        else:
+            matches = iter_matches(self.pattern, text, self._starts(text, positions), deadline)
+
+        # Only the time spent matching is counted, not the caller's work between matches
+        elapsed = 0.0
+        hits = 0
+        try:
+            for match in matches:
+                elapsed += time.perf_counter() - start_time
+                hits += 1
+                yield match
+                start_time = time.perf_counter()
+            elapsed += time.perf_counter() - start_time
+        finally:
+            self._record(elapsed, hits)
+
+    def search(self, text, lowered=None):
+        """
+        Search a short text (e.g. one line), skipping the pattern when none of its keywords appear.
+
+        Args:
+            text (str): Text to search
+            lowered (str): Output of lower_ascii(text), None to always run the pattern
+
+        Returns:
+            re.Match: The first match, or None
+        """
+        if lowered is not None and self.keywords and not any(keyword in lowered for keyword in self.keywords):
+            return None
+        if not self._has_required(text):
+            return None
+        start_time = time.perf_counter()
+        result = self.pattern.search(text)
+        self._record(time.perf_counter() - start_time, 1 if result else 0)
+        return result
+
+    def match(self, value):
+        """
+        Match the pattern at the start of a value (e.g. a SKU).
+
+        Args:
+            value (str): Value to check
+
+        Returns:
+            re.Match: The match, or None
+        """
+        start_time = time.perf_counter()
+        result = self.pattern.match(value)
+        self._record(time.perf_counter() - start_time, 1 if result else 0)
+        return result
+
+    def get_stats(self):
+        """
+        Get the rule's usage counters.
+
+        Returns:
+            dict: Calls, hits and total matching time
+        """
+        with _stats_lock:
+            return {
+                "description": self.description,
+                "calls": self.calls,
+                "hits": self.hits,
+                "time_ms": round(self.elapsed * 1000, 3)
+            }
+
+    def reset_stats(self):
+        with _stats_lock:
+            self.calls = 0
+            self.hits = 0
+            self.elapsed = 0.0
+
+class RuleGroup:
+    """
+    Ordered rules for one field; the first rule that matches wins.
+    """
+
+    def __init__(self, name, rules):
+        """
+        Args:
+            name (str): Group name, e.g. "order_id.fallback"
+            rules (list): Rule objects in the order they are tried
+        """
+        self.name = name
+        self.rules = list(rules)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    @property
+    def keywords(self):
+        """Keywords of all rules in the group"""
+        return {keyword for rule in self.rules for keyword in rule.keywords}
+
+    def first_match(self, text, positions=None, deadline=None):
+        """First match of the first rule that matches (see Rule.first_match())"""
+        for rule in self.rules:
+            result = rule.first_match(text, positions, deadline)
+            if result:
+                return result
+        return None
+
+    def iter_matches(self, text, positions=None, deadline=None):
+        """Matches of every rule in turn (see Rule.iter_matches())"""
+        for rule in self.rules:
+            yield from rule.iter_matches(text, positions, deadline)
+
+    def search(self, text, lowered=None):
+        """First match of the first rule that matches (see Rule.search())"""
+        for rule in self.rules:
+            result = rule.search(text, lowered)
+            if result:
+                return result
+        return None
+
+    def match(self, value):
+        """First match of the first rule that matches at the start of value (see Rule.match())"""
+        for rule in self.rules:
+            result = rule.match(value)
+            if result:
+                return result
+        return None
+
+class RuleSet:
+    """
+    Compiled extraction rule groups and the word lists used around them.
+    """
+
+    def __init__(self, spec, sources=()):
+        """
+        Args:
+            spec (dict): Rule set with "groups" (name -> list of rule specs) and "lists" (name -> list of strings)
+            sources (tuple): Files the rule set was read from
+
+        Raises:
+            ValueError: If a rule is malformed or its pattern doesn't compile
+        """
+        self.sources = list(sources)
+        self.groups = {name: compile_group(name, rules) for name, rules in spec.get("groups", {}).items()}
+        # Flattened rules for search_lines(), by group names
+        self._line_filters = {}
+        self._line_rules = {}
+        self.lists = {}
+        for name, values in spec.get("lists", {}).items():
+            if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+                raise ValueError(f"Rule list '{name}' must be a list of strings")
+            self.lists[name] = tuple(values)
+
+    def group(self, name):
+        """
+        Get a rule group.
+
+        Args:
+            name (str): Group name
+
+        Returns:
+            RuleGroup: The group
+
+        Raises:
+            ValueError: If the rule set has no such group
+        """
+        try:
+            return self.groups[name]
+        except KeyError:
+            raise ValueError(f"Extraction rule group '{name}' is not defined") from None
+
+    def get_list(self, name):
+        """
+        Get a word list.
+
+        Args:
+            name (str): List name
+
+        Returns:
+            tuple: The strings in the list
+
+        Raises:
+            ValueError: If the rule set has no such list
+        """
+        try:
+            return self.lists[name]
+        except KeyError:
+            raise ValueError(f"Extraction rule list '{name}' is not defined") from None
+
+    def keyword_scanner(self, group_names):
+        """
+        Build a scanner for the keywords of some rule groups, for anchored matching.
+
+        Keywords that start with another keyword are left out; rules using them
+        are tried where the shorter keyword starts.
+
+        Args:
+            group_names (list): Names of the groups that will be matched with the scan
+
+        Returns:
+            KeywordScanner: Scanner whose positions are keyed by keyword
+        """
+        keywords = set()
+        for name in group_names:
+            keywords |= self.group(name).keywords
+        scanned = {keyword for keyword in keywords
+                   if not any(other != keyword and keyword.startswith(other) for other in keywords)}
+        return KeywordScanner({keyword: keyword for keyword in sorted(scanned)})
+
+    def search_line(self, line, group_names):
+        """
+        Search one line with several rule groups (see search_lines()).
+
+        Args:
+            line (str): Line of text
+            group_names (tuple): Group names
+
+        Returns:
+            tuple: First match of each group, or None
+        """
+        results, = self.search_lines((line,), group_names)
+        return results
+
+    def search_lines(self, lines, group_names):
+        """
+        Search each line with several rule groups, sharing the keyword prefilter.
+
+        Same as RuleGroup.search() on each group, flattened and with the rule
+        counters kept locally until the lines are done, as this runs for every
+        line of a document.
+
+        Args:
+            lines (iterable): Lines of text
+            group_names (tuple): Group names
+
+        Yields:
+            tuple: For each line, the first match of each group, or None
+        """
+        line_filter = self._line_filters.get(group_names)
+        if line_filter is None:
+            line_filter = self._line_filter(group_names)
+        rules, line_keywords, result_count = line_filter
+
+        no_match = (None,) * result_count
+        calls = [0] * len(rules)
+        hits = [0] * len(rules)
+        elapsed = [0.0] * len(rules)
+        perf_counter = time.perf_counter
+        try:
+            for line in lines:
+                if line.isascii():
+                    lowered = line.lower()
+                    # Most lines of a long document have none of the keywords (a loop of
+                    # substring checks is faster here than one regex over all keywords)
+                    if line_keywords:
+                        for keyword in line_keywords:
+                            if keyword in lowered:
+                                break
+                        else:
+                            yield no_match
+                            continue
+                else:
+                    # IGNORECASE also folds some non-ASCII characters (e.g. "ſku"), so run every rule
+                    lowered = None
+
+                results = [None] * result_count
+                start_time = perf_counter()
+                for position, index, keywords, requires, pattern in rules:
+                    if results[index] is not None:
+                        continue
+                    if lowered is not None and keywords:
+                        for keyword in keywords:
+                            if keyword in lowered:
+                                break
+                        else:
+                            continue
+                    if requires and not all(required in line for required in requires):
+                        continue
+                    result = pattern.search(line)
+                    end_time = perf_counter()
+                    calls[position] += 1
+                    elapsed[position] += end_time - start_time
+                    if result is not None:
+                        hits[position] += 1
+                        results[index] = result
+                    start_time = end_time
+                yield tuple(results)
+        finally:
+            with _stats_lock:
+                for position, rule in enumerate(self._line_rules[group_names]):
+                    rule.calls += calls[position]
+                    rule.hits += hits[position]
+                    rule.elapsed += elapsed[position]
+
+    def _line_filter(self, group_names):
+        """Flatten the rules of some groups for search_lines()"""
+        groups = [self.group(name) for name in group_names]
+        flattened = [(index, rule) for index, group in enumerate(groups) for rule in group]
+        rules = [(position, index, rule.keywords, rule.requires, rule.pattern)
+                 for position, (index, rule) in enumerate(flattened)]
+        # Rules without keywords can match any line
+        if all(rule.keywords for _, rule in flattened):
+            line_keywords = tuple(sorted({keyword for group in groups for keyword in group.keywords}))
+        else:
+            line_keywords = ()
+        self._line_rules[group_names] = [rule for _, rule in flattened]
+        line_filter = (rules, line_keywords, len(groups))
+        self._line_filters[group_names] = line_filter
+        return line_filter
+
+    def get_stats(self):
+        """
+        Get the usage counters of every rule.
+
+        Returns:
+            dict: Rule set sources and per-rule calls, hits and time
+        """
+        return {
+            "sources": self.sources,
+            "rules": {rule.name: rule.get_stats() for group in self.groups.values() for rule in group}
+        }
+
+    def reset_stats(self):
+        for group in self.groups.values():
+            for rule in group:
+                rule.reset_stats()
+
+def compile_rule(name, spec):
+    """
+    Compile one rule spec.
+
+    Args:
+        name (str): Rule name for stats and errors
+        spec (dict): Rule spec with "pattern" and optional "description", "keywords", "anchor", "requires", "flags"
+
+    Returns:
+        Rule: The compiled rule
+
+    Raises:
+        ValueError: If the spec is malformed or the pattern doesn't compile
+    """
+    if not isinstance(spec, dict) or not isinstance(spec.get("pattern"), str):
+        raise ValueError(f"Extraction rule {name} needs a \"pattern\" string")
+    unknown = set(spec) - RULE_KEYS
+    if unknown:
+        raise ValueError(f"Extraction rule {name} has unknown keys: {', '.join(sorted(unknown))}")
+
+    keywords = spec.get("keywords") or []
+    for keyword in keywords:
+        if not keyword or not keyword.isascii() or keyword != keyword.lower():
+            raise ValueError(f"Extraction rule {name} keyword '{keyword}' must be lowercase ASCII")
+    anchor = spec.get("anchor", ANCHOR_KEYWORD)
+    if anchor not in (ANCHOR_KEYWORD, ANCHOR_DIGITS):
+        raise ValueError(f"Extraction rule {name} has unknown anchor '{anchor}'")
+    if anchor == ANCHOR_DIGITS and not keywords:
+        raise ValueError(f"Extraction rule {name} needs keywords for the '{ANCHOR_DIGITS}' anchor")
+
+    flags = 0
+    for flag in spec.get("flags", ["IGNORECASE"]):
+        if flag not in RULE_FLAGS:
+            raise ValueError(f"Extraction rule {name} has unknown flag '{flag}'")
+        flags |= RULE_FLAGS[flag]
+    try:
+        pattern = re.compile(spec["pattern"], flags)
+    except re.error as e:
+        raise ValueError(f"Extraction rule {name} has an invalid pattern: {str(e)}") from None
+
+    return Rule(name, pattern, keywords=keywords, anchor=anchor, requires=spec.get("requires", ()),
+                description=spec.get("description", ""))
+
+def compile_group(name, specs):
+    """
+    Compile the rule specs of one group.
+
+    Args:
+        name (str): Group name
+        specs (list): Rule specs in the order they are tried
+
+    Returns:
+        RuleGroup: The compiled group
+
+    Raises:
+        ValueError: If a rule is malformed
+    """
+    if not isinstance(specs, list) or not specs:
+        raise ValueError(f"Extraction rule group '{name}' must be a non-empty list of rules")
+    return RuleGroup(name, [compile_rule(f"{name}[{index}]", spec) for index, spec in enumerate(specs)])
+
+def read_rule_file(path):
+    """
+    Read a rule set file.
+
+    Args:
+        path (str): Path to a .json, .yaml or .yml file
+
+    Returns:
+        dict: Rule set spec
+
+    Raises:
+        ValueError: If the file can't be parsed, or is YAML and PyYAML isn't installed
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"Reading {path} needs PyYAML (pip install pyyaml); "
+                                 f"JSON rule files work without it") from None
+            try:
+                spec = yaml.safe_load(f) or {}
+            except yaml.YAMLError as e:
+                raise ValueError(f"Invalid YAML in {path}: {str(e)}") from None
+        else:
+            try:
+                spec = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON in {path}: {str(e)}") from None
+
+    if not isinstance(spec, dict):
+        raise ValueError(f"{path} must contain a mapping")
+    return spec
+
+def merge_rule_specs(base, override):
+    """
+    Apply a vendor rule file on top of a rule set.
+
+    Groups and lists are replaced as a whole, so a group's rules stay in the
+    order the override lists them.
+
+    Args:
+        base (dict): Rule set spec
+        override (dict): Spec with the groups and lists to replace
+
+    Returns:
+        dict: Merged spec
+    """
+    merged = {
+        "groups": dict(base.get("groups", {})),
+        "lists": dict(base.get("lists", {}))
+    }
+    for section in ("groups", "lists"):
+        for name, value in override.get(section, {}).items():
+            if name not in merged[section]:
+                # Nothing reads it unless the parsers are changed too
+                logger.warning("Extraction rule file adds unknown %s '%s'", section[:-1], name)
+            merged[section][name] = value
+    return merged
+
+def load_rule_set(path=EXTRACTION_RULES_PATH):
+    """
+    Load and compile the default rule set, with an optional rule file on top.
+
+    Args:
+        path (str): Rule file to apply over the defaults ("" for the defaults only)
+
+    Returns:
+        RuleSet: The compiled rule set
+
+    Raises:
+        ValueError: If a rule file is invalid
+    """
+    spec = read_rule_file(DEFAULT_RULES_PATH)
+    sources = [DEFAULT_RULES_PATH]
+    if path:
+        spec = merge_rule_specs(spec, read_rule_file(path))
+        sources.append(path)
+        logger.info("Loaded extraction rules from %s", path)
+    return RuleSet(spec, sources)
+
+_rule_set = None
+_rule_set_lock = Lock()
+
+def get_rule_set():
+    """
+    Get the process-wide rule set, compiled on first use.
+
+    Returns:
+        RuleSet: The shared rule set
+    """
+    global _rule_set
+    if _rule_set is None:
+        with _rule_set_lock:
+            if _rule_set is None:
+                _rule_set = load_rule_set()
+    return _rule_set
+
+def get_rule_stats():
+    """
+    Get the per-rule counters for the stats endpoint.
+
+    Returns:
+        dict: Rule set sources and per-rule calls, hits and time
+    """
+    return get_rule_set().get_stats()
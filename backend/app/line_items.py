@@ -0,0 +1,373 @@
+from app.extraction_rules import get_rule_set, match_value
+from app.logging_utils import debug_enabled, get_logger
+
+logger = get_logger(__name__)
+
+# Line items of a document while it's being parsed. A document can have thousands of items,
+# so instead of a dict per item and one per field, each item is a slotted LineItem holding
+# slotted FieldValues. They are converted to the nested dicts of the API's
+# "extraction_details" only when the output is built (LineItem.to_dict).
+LINE_ITEM_FIELDS = ("sku", "quantity", "price")
+FIELD_VALUE_KEYS = ("value", "confidence", "source")
+
+# Values of the fields a line item dict doesn't have
+MISSING_VALUES = {"sku": "", "quantity": 0, "price": 0}
+
+# SKU checks shared by the parsers (app/rules/default_rules.json, plus EXTRACTION_RULES_PATH)
+RULES = get_rule_set()
+BANNED_SKUS = frozenset(RULES.get_list("banned_skus"))
+INVALID_SKU_RULES = RULES.group("sku.invalid")
+VALID_SKU_RULES = RULES.group("sku.valid_format")
+
+class FieldValue:
+    """
+    Value of one line item field, with its confidence and the extractor it came from.
+
+    Reads like the dict it replaces (field["value"], field.get("confidence")), so
+    code written against the dict format keeps working.
+    """
+
+    __slots__ = ("value", "confidence", "source", "warning")
+
+    def __init__(self, value, confidence, source, warning=False):
+        self.value = value
+        self.confidence = confidence
+        self.source = source
+        # Set on values the parser filled in with a default
+        self.warning = warning
+
+    def __getitem__(self, key):
+        if key in FIELD_VALUE_KEYS or (key == "warning" and self.warning):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        if not isinstance(other, FieldValue):
+            return NotImplemented
+        return (self.value == other.value and self.confidence == other.confidence and
+                self.source == other.source and self.warning == other.warning)
+
+    def __repr__(self):
+        return f"FieldValue({self.value!r}, {self.confidence!r}, {self.source!r}{', warning=True' if self.warning else ''})"
+
+    def to_dict(self):
+        """
+        Convert to the field format of the API's extraction details.
+
+        Returns:
+            dict: {"value", "confidence", "source"}, plus "warning" for default values
+        """
+        field = {"value": self.value, "confidence": self.confidence, "source": self.source}
+        if self.warning:
+            field["warning"] = True
+        return field
+
+    @classmethod
+    def from_dict(cls, field, missing_value):
+        """
+        Read a field in the dict format.
+
+        Args:
+            field (dict): Field dict, or None
+            missing_value: Value of a field without one
+
+        Returns:
+            FieldValue: The field
+        """
+        if isinstance(field, FieldValue):
+            return field
+        field = field or {}
+        return cls(field.get("value", missing_value), field.get("confidence", 0), field.get("source", ""),
+                   bool(field.get("warning", False)))
+
+class LineItem:
+    """
+    One line item: the SKU, quantity and price FieldValues.
+
+    Fields the parser hasn't found yet are None. Like FieldValue, it can be read
+    as a dict (item["sku"]["value"], item.get("price")).
+    """
+
+    __slots__ = LINE_ITEM_FIELDS
+
+    def __init__(self, sku=None, quantity=None, price=None):
+        self.sku = sku
+        self.quantity = quantity
+        self.price = price
+
+    def __getitem__(self, key):
+        if key in LINE_ITEM_FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in LINE_ITEM_FIELDS and getattr(self, key) is not None
+
+    def __eq__(self, other):
+        if not isinstance(other, LineItem):
+            return NotImplemented
+        return self.sku == other.sku and self.quantity == other.quantity and self.price == other.price
+
+    def __repr__(self):
+        return f"LineItem({self.sku!r}, {self.quantity!r}, {self.price!r})"
+
+    def key(self):
+        """
+        Get the values that identify the item, for deduplication.
+
+        Returns:
+            tuple: (SKU, quantity, price) values
+        """
+        return (self.sku.value, self.quantity.value, self.price.value)
+
+    def is_complete(self):
+        """
+        Check whether the SKU, quantity and price were all found.
+
+        Returns:
+            bool: True if no field is missing
+        """
+        return self.sku is not None and self.quantity is not None and self.price is not None
+
+    def fill_defaults(self):
+        """
+        Fill a missing quantity and price with defaults flagged with a warning.
+        """
+        if self.quantity is None:
+            self.quantity = FieldValue(1, 0.5, "default", True)
+        if self.price is None:
+            self.price = FieldValue(0.0, 0.5, "default", True)
+
+    def to_flat(self):
+        """
+        Convert to the line item format of the API output.
+
+        Returns:
+            dict: {"sku", "quantity", "price"} values
+        """
+        return {"sku": self.sku.value, "quantity": self.quantity.value, "price": self.price.value}
+
+    def to_dict(self):
+        """
+        Convert to the line item format of the API's extraction details.
+
+        Returns:
+            dict: {"sku", "quantity", "price"} field dicts
+        """
+        return {"sku": self.sku.to_dict(), "quantity": self.quantity.to_dict(), "price": self.price.to_dict()}
+
+    @classmethod
+    def from_dict(cls, item):
+        """
+        Read a line item in the dict format, e.g. one built by a caller of postprocess_line_items.
+
+        Args:
+            item (dict): Line item dict, or a LineItem (returned as is)
+
+        Returns:
+            LineItem: The line item, with missing fields read as empty values
+        """
+        if isinstance(item, LineItem):
+            return item
+        return cls(*(FieldValue.from_dict(item.get(field), MISSING_VALUES[field]) for field in LINE_ITEM_FIELDS))
+
+def line_item(sku, quantity, price, confidence, source):
+    """
+    Create a line item whose fields share a confidence and source.
+
+    Args:
+        sku (str): SKU
+        quantity (int): Quantity
+        price (float): Unit price
+        confidence (float): Confidence of the three fields
+        source (str): Extractor the item came from
+
+    Returns:
+        LineItem: The line item
+    """
+    return LineItem(FieldValue(sku, confidence, source), FieldValue(quantity, confidence, source),
+                    FieldValue(price, confidence, source))
+
+class LineItemAssembler:
+    """
+    Build line items from lines that each hold part of one (a SKU line, then a
+    quantity line, then a price line).
+
+    Fed one line at a time, with the matches of the "line.sku", "line.quantity",
+    "line.price" and "line.part" rule groups on it, so it works the same on a
+    whole document and on a stream of lines.
+    """
+
+    def __init__(self):
+        self.current = None
+
+    def feed(self, sku_match, qty_match, price_match, part_match):
+        """
+        Read the next non-empty line.
+
+        Args:
+            sku_match, qty_match, price_match, part_match (re.Match): Matches on the line, or None
+
+        Returns:
+            LineItem: The item this line completed, or None
+        """
+        # If we found either a sku, qty, or price, we might be in a line item
+        if sku_match or qty_match or price_match or part_match:
+            # If we're not already building a line item, start a new one
+            current = self.current
+            if current is None:
+                current = self.current = LineItem()
+            
+            # Update the line item with any new information
+            if sku_match and current.sku is None:
+                current.sku = FieldValue(match_value(sku_match), 0.8, "regex-line")
+            elif part_match and current.sku is None:
+                current.sku = FieldValue(match_value(part_match), 0.9, "regex-part")
+            
+            if qty_match and current.quantity is None:
+                current.quantity = FieldValue(int(match_value(qty_match)), 0.8, "regex-line")
+            
+            if price_match and current.price is None:
+                current.price = FieldValue(float(match_value(price_match)), 0.8, "regex-line")
+            
+            # If we have a complete line item, return it and start a new one
+            if current.is_complete():
+                self.current = None
+                return current
+            return None
+        
+        # This line doesn't contain recognizable line item data, so finish the item
+        # we were building if it has a SKU (one without keeps waiting for it)
+        if self.current is not None and self.current.sku is not None:
+            return self.finish()
+        return None
+
+    def finish(self):
+        """
+        End the item being built, e.g. at the end of the document.
+
+        Returns:
+            LineItem: The item, with defaults for its missing quantity and price,
+                      or None if there was no item or it has no SKU
+        """
+        current = self.current
+        self.current = None
+        if current is None or current.sku is None:
+            return None
+        current.fill_defaults()
+        return current
+
+def is_valid_sku(sku, debug=False):
+    """
+    Check a line item SKU against the banned list and the accepted SKU formats.
+    
+    Args:
+        sku (str): SKU to check
+        debug (bool): Log why the SKU was accepted or rejected
+        
+    Returns:
+        bool: True if the SKU looks like a real one
+    """
+    # Direct check for explicitly banned SKUs (highest priority check)
+    if sku in BANNED_SKUS:
+        if debug:
+            logger.debug("Skipping explicitly banned SKU: '%s'", sku)
+        return False
+    
+    # Skip empty or very short SKUs
+    if not sku or len(sku) < 3:
+        if debug:
+            logger.debug("Skipping item with invalid SKU: '%s' (too short)", sku)
+        return False
+    
+    # Skip single letter or digit SKUs which are likely extraction errors
+    if INVALID_SKU_RULES.match(sku):
+        if debug:
+            logger.debug("Skipping definitely invalid SKU: '%s' (single letter/digit)", sku)
+        return False
+        
+    # Check if SKU matches any of our accepted formats
+    valid_format = next((rule for rule in VALID_SKU_RULES if rule.match(sku)), None)
+    
+    if valid_format:
+        if debug:
+            logger.debug("Valid %s SKU: '%s'", valid_format.description, sku)
+        return True
+    if len(sku) >= 4 and sku[0].isalpha():
+        # More lenient check for longer SKUs that start with a letter
+        if debug:
+            logger.debug("Allowing non-standard but acceptable SKU format: '%s'", sku)
+        return True
+    if debug:
+        logger.debug("Skipping invalid SKU: '%s' (format doesn't match any patterns)", sku)
+    return False
+
+def postprocess_line_items(items):
+    """
+    Postprocess line items to deduplicate and filter invalid entries.
+    
+    Runs in one pass: each distinct SKU is validated once, and duplicates
+    (same SKU, quantity and price) are found by hashing rather than comparison.
+    
+    Args:
+        items (list): Line items (LineItem, or dicts in the extraction details format)
+        
+    Returns:
+        list: Cleaned list of LineItems, in the order each one was first found
+    """
+    debug = debug_enabled(logger)
+    if debug:
+        logger.debug("Starting postprocess_line_items with %d items", len(items))
+    
+    # Best item of each (SKU, quantity, price), and whether each SKU seen so far is valid
+    unique_items = {}
+    valid_skus = {}
+    valid_count = 0
+    
+    for i, item in enumerate(items):
+        item = LineItem.from_dict(item)
+        sku = item.sku.value
+        if debug:
+            logger.debug("Item %d: SKU=%s, Confidence=%s", i, sku, item.sku.confidence)
+        
+        # Skip items with invalid SKUs
+        is_valid = valid_skus.get(sku)
+        if is_valid is None:
+            is_valid = valid_skus[sku] = is_valid_sku(sku, debug)
+        if not is_valid:
+            continue
+        valid_count += 1
+        
+        # Keep the first item of each key, unless a later one has higher confidence
+        key = item.key()
+        previous = unique_items.get(key)
+        if previous is None or item.sku.confidence > previous.sku.confidence:
+            unique_items[key] = item
+            if debug:
+                logger.debug("Added/updated unique item: '%s'", sku)
+        elif debug:
+            logger.debug("Skipped duplicate item with lower confidence: '%s'", sku)
+    
+    valid_items = list(unique_items.values())
+    
+    if debug:
+        logger.debug("Valid items after pattern filtering: %d", valid_count)
+        logger.debug("Finished postprocess_line_items with %d items", len(valid_items))
+        for i, item in enumerate(valid_items):
+            logger.debug("Result Item %d: SKU='%s'", i, item.sku.value)
+    
+    return valid_items
@@ -2,6 +2,7 @@ import os
 import json
 import requests
 import logging
+from app.confidence import overall_confidence
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -342,31 +343,7 @@ def create_structured_result(parsed_data):
     if line_items:
         structured_result["confidence"]["line_items"] = line_items_confidence / len(line_items)
     
-    # Calculate overall confidence with weighted approach
-    # Fields importance: order_id > line_items > customer > shipping_address
-    weights = {
-        "order_id": 1.5,
-        "line_items": 1.3,
-        "customer": 1.0,
-        "shipping_address": 0.8
-    }
-    
-    confidence_values = {
-        "order_id": structured_result["confidence"]["order_id"],
-        "line_items": structured_result["confidence"]["line_items"],
-        "customer": structured_result["confidence"]["customer"],
-        "shipping_address": structured_result["confidence"]["shipping_address"]
-    }
-    
-    # Calculate weighted confidence
-    weighted_sum = sum(confidence_values[field] * weights[field] for field in confidence_values)
-    total_weight = sum(weights.values())
-    
-    # Adjust confidence based on completeness
-    completeness_factor = sum(1 for field in confidence_values if confidence_values[field] > 0.6) / len(confidence_values)
-    
-    # Calculate final overall confidence
-    if sum(weights.values()) > 0:
-        structured_result["confidence"]["overall"] = (weighted_sum / total_weight) * (0.7 + (completeness_factor * 0.3))
+    # Calculate overall confidence with the calibration shared with the parser
+    structured_result["confidence"]["overall"] = overall_confidence(structured_result["confidence"])
     
     return structured_result 
\ No newline at end of file
@@ -0,0 +1,88 @@
+import os
+import random
+import logging
+import functools
+import contextvars
+
+# Level of the app's loggers. The parsers log their per-document and per-item diagnostics at
+# DEBUG, so at the default level those calls return before formatting their arguments
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Share of documents whose DEBUG diagnostics are logged when LOG_LEVEL=DEBUG (1.0 = all)
+DEBUG_SAMPLE_RATE = float(os.environ.get("DEBUG_SAMPLE_RATE", "1.0"))
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+# Parent of every app.* logger, which inherit its level
+APP_LOGGER = logging.getLogger("app")
+try:
+    APP_LOGGER.setLevel(LOG_LEVEL)
+except ValueError:
+    APP_LOGGER.setLevel(logging.INFO)
+    APP_LOGGER.warning("Invalid LOG_LEVEL %r, using INFO", LOG_LEVEL)
+
+# Whether the document being parsed in this thread was sampled for DEBUG diagnostics
+# (None outside of a sampled call, where DEBUG records are always kept)
+_debug_sampled = contextvars.ContextVar("debug_sampled", default=None)
+
+class DebugSampleFilter(logging.Filter):
+    """
+    Drop the DEBUG records of documents that weren't sampled.
+    """
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or _debug_sampled.get() is not False
+
+_sample_filter = DebugSampleFilter()
+
+def get_logger(name):
+    """
+    Get a module logger that honours DEBUG_SAMPLE_RATE.
+
+    Args:
+        name (str): Logger name, usually __name__
+
+    Returns:
+        logging.Logger: The logger
+    """
+    logger = logging.getLogger(name)
+    if _sample_filter not in logger.filters:
+        logger.addFilter(_sample_filter)
+    return logger
+
+def debug_enabled(logger):
+    """
+    Check whether DEBUG diagnostics of the current document would be logged.
+
+    Use it to skip loops that only exist to log, e.g. per-item dumps.
+
+    Args:
+        logger (logging.Logger): Logger the diagnostics go to
+
+    Returns:
+        bool: True if the logger is at DEBUG and the current document was sampled
+    """
+    return logger.isEnabledFor(logging.DEBUG) and _debug_sampled.get() is not False
+
+def sample_debug(func):
+    """
+    Decide once per call whether the DEBUG diagnostics logged during it are kept.
+
+    Wraps the parse entry points, so that DEBUG_SAMPLE_RATE picks whole documents
+    rather than single lines. Nested calls share the outer call's decision.
+
+    Args:
+        func (callable): Function to wrap
+
+    Returns:
+        callable: The wrapped function
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _debug_sampled.get() is not None or not APP_LOGGER.isEnabledFor(logging.DEBUG):
+            return func(*args, **kwargs)
+        token = _debug_sampled.set(DEBUG_SAMPLE_RATE >= 1 or random.random() < DEBUG_SAMPLE_RATE)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _debug_sampled.reset(token)
+    return wrapper
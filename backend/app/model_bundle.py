@@ -0,0 +1,208 @@
+import os
+import json
+import mmap
+import time
+import struct
+import hashlib
+
+import torch
+
+# Local directory with a snapshot of the NER tokenizer and weights (see build_model_bundle.py)
+NER_MODEL_BUNDLE_DIR = os.environ.get("NER_MODEL_BUNDLE_DIR", "")
+
+BUNDLE_MANIFEST = "bundle.json"
+SAFETENSORS_WEIGHTS = "model.safetensors"  # fp32 weights, memory-mapped at load time
+INT8_WEIGHTS = "model_int8.pt"  # state dict of the dynamically quantized model
+
+# safetensors dtype names
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool
+}
+
+def _file_sha256(path):
+    """Compute the SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_bundle(bundle_dir):
+    """
+    Check whether a directory contains a model bundle.
+
+    Args:
+        bundle_dir (str): Directory to check
+
+    Returns:
+        bool: True if the bundle manifest exists
+    """
+    return bool(bundle_dir) and os.path.exists(os.path.join(bundle_dir, BUNDLE_MANIFEST))
+
+def read_manifest(bundle_dir):
+    """
+    Read the manifest of a model bundle.
+
+    Args:
+        bundle_dir (str): Bundle directory
+
+    Returns:
+        dict: Manifest contents
+    """
+    with open(os.path.join(bundle_dir, BUNDLE_MANIFEST), "r") as f:
+        return json.load(f)
+
+def create_bundle(model_name, bundle_dir, quantize=False):
+    """
+    Snapshot a NER model's tokenizer, config and weights into a local directory.
+
+    The fp32 weights are always written as safetensors (so the bundle also works
+    as a regular Hugging Face model directory, e.g. for the ONNX export). With
+    quantize=True, the state dict of the int8 model is saved as well so workers
+    don't have to quantize at startup.
+
+    Args:
+        model_name (str): Hugging Face model name or local directory
+        bundle_dir (str): Destination directory
+        quantize (bool): Also store a pre-quantized int8 model
+
+    Returns:
+        dict: The bundle manifest
+    """
+    import transformers
+    from transformers import AutoTokenizer, AutoModelForTokenClassification
+    from app.ner_backends import quantize_int8
+
+    os.makedirs(bundle_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForTokenClassification.from_pretrained(model_name)
+    model.eval()
+
+    tokenizer.save_pretrained(bundle_dir)
+    model.save_pretrained(bundle_dir, safe_serialization=True)
+
+    weights = {"fp32": SAFETENSORS_WEIGHTS}
+    if quantize:
+        torch.save(quantize_int8(model).state_dict(), os.path.join(bundle_dir, INT8_WEIGHTS))
+        weights["int8"] = INT8_WEIGHTS
+
+    manifest = {
+        "model_name": model_name,
+        "weights": weights,
+        "sha256": {kind: _file_sha256(os.path.join(bundle_dir, name)) for kind, name in weights.items()},
+        "torch_version": torch.__version__,
+        "transformers_version": transformers.__version__,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    # Write the manifest last, so a partial bundle is never picked up by is_bundle()
+    with open(os.path.join(bundle_dir, BUNDLE_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+def mmap_safetensors(path):
+    """
+    Memory-map a safetensors file and return its tensors without copying them.
+
+    The file is mapped copy-on-write, so every process that loads the same file
+    (or inherits the mapping through fork) shares the weight pages through the
+    page cache until a page is written to.
+
+    Args:
+        path (str): Path of the .safetensors file
+
+    Returns:
+        tuple: (state_dict, mapping) where the mapping must be kept open as long
+               as the tensors are in use
+    """
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    header_size = struct.unpack("<Q", mapping[:8])[0]
+    header = json.loads(mapping[8:8 + header_size])
+    data_start = 8 + header_size
+
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        begin, end = info["data_offsets"]
+        if end == begin:
+            state_dict[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        count = (end - begin) // torch.tensor([], dtype=dtype).element_size()
+        tensor = torch.frombuffer(mapping, dtype=dtype, count=count, offset=data_start + begin)
+        state_dict[name] = tensor.reshape(info["shape"])
+
+    return state_dict, mapping
+
+def _empty_model(config):
+    """Build a token classification model without running weight initialization"""
+    from transformers import AutoModelForTokenClassification
+    from transformers.modeling_utils import no_init_weights
+
+    with no_init_weights():
+        model = AutoModelForTokenClassification.from_config(config)
+    model.eval()
+    return model
+
+def load_bundle(bundle_dir, backend):
+    """
+    Load the tokenizer and model from a bundle without touching the network.
+
+    fp32 weights are memory-mapped directly into the model. For the int8 backend
+    the pre-quantized state dict is used if the bundle has one, otherwise the
+    fp32 weights are quantized at load time.
+
+    Args:
+        bundle_dir (str): Bundle directory created by create_bundle()
+        backend (str): BACKEND_TORCH or BACKEND_TORCH_INT8
+
+    Returns:
+        tuple: (tokenizer, model)
+    """
+    from transformers import AutoConfig, AutoTokenizer
+    from app.ner_backends import BACKEND_TORCH_INT8, quantize_int8
+
+    manifest = read_manifest(bundle_dir)
+    tokenizer = AutoTokenizer.from_pretrained(bundle_dir, local_files_only=True)
+    config = AutoConfig.from_pretrained(bundle_dir, local_files_only=True)
+    model = _empty_model(config)
+
+    if backend == BACKEND_TORCH_INT8 and "int8" in manifest["weights"]:
+        # The skeleton's weights are uninitialized memory, which can hold NaNs that break the
+        # quantization observers. Zero them first: load_state_dict replaces them all anyway.
+        with torch.no_grad():
+            for param in model.parameters():
+                param.zero_()
+        model = quantize_int8(model)
+        state_dict = torch.load(os.path.join(bundle_dir, manifest["weights"]["int8"]), mmap=True)
+        model.load_state_dict(state_dict)
+        return tokenizer, model
+
+    state_dict, mapping = mmap_safetensors(os.path.join(bundle_dir, manifest["weights"]["fp32"]))
+    # Tied weights are stored once; let the model fill them in from the other copy
+    missing, unexpected = model.load_state_dict(state_dict, strict=False, assign=True)
+    tied = set(getattr(model, "_tied_weights_keys", None) or [])
+    if unexpected or set(missing) - tied:
+        raise ValueError(f"Bundle {bundle_dir} does not match the model config "
+                         f"(missing: {missing}, unexpected: {unexpected})")
+    if missing:
+        model.tie_weights()
+    # Keep the mapping alive as long as the model uses its pages
+    model._bundle_mapping = mapping
+
+    if backend == BACKEND_TORCH_INT8:
+        model = quantize_int8(model)
+    return tokenizer, model
@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+from threading import Lock
+from app.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Name or local path of the NER model shared by every parser module
+NER_MODEL_NAME = os.environ.get("NER_MODEL_NAME", "dslim/bert-base-NER")
+
+# Use a lock so concurrent first requests only trigger a single load
+_registry_lock = Lock()
+
+# Lazily populated model state
+_tokenizer = None
+_model = None
+_load_report = {}
+
+def _current_rss_bytes():
+    """
+    Get the resident set size of the current process.
+
+    Returns:
+        int: RSS in bytes, or None if it cannot be determined on this platform
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    except (ImportError, OSError):
+        return None
+
+def get_process_memory(pid="self"):
+    """
+    Get how much of a process's memory is shared with other processes.
+
+    Reads /proc/<pid>/smaps_rollup, so pages inherited copy-on-write from a
+    pre-fork parent (or mapped from the same file) count as shared until written.
+
+    Args:
+        pid (int or str): Process id, or "self" for the current process
+
+    Returns:
+        dict: rss/pss/shared/private sizes in bytes, or None if not available
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except (OSError, ValueError):
+        return None
+
+    return {
+        "rss_bytes": fields.get("Rss", 0),
+        "pss_bytes": fields.get("Pss", 0),
+        "shared_bytes": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_bytes": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+def _load_components():
+    """
+    Load the NER tokenizer and model from NER_MODEL_NAME.
+
+    Returns:
+        tuple: (tokenizer, model, report)
+    """
+    import torch
+    from transformers import AutoTokenizer
+    from app.ner_backends import NER_INFERENCE_BACKEND, BACKEND_TORCH, BACKEND_TORCH_INT8, load_inference_model, model_size_bytes
+    from app.model_bundle import NER_MODEL_BUNDLE_DIR, is_bundle, load_bundle
+    from app.runtime_config import configure_runtime, print_runtime_self_check
+
+    configure_runtime()
+
+    # Prefer the local bundle (fast, offline start) when one has been built
+    bundle_dir = NER_MODEL_BUNDLE_DIR if is_bundle(NER_MODEL_BUNDLE_DIR) else None
+    source = bundle_dir or NER_MODEL_NAME
+
+    logger.info("Loading NER model and tokenizer (%s, backend: %s)", source, NER_INFERENCE_BACKEND)
+    rss_before = _current_rss_bytes()
+    start_time = time.perf_counter()
+
+    if bundle_dir and NER_INFERENCE_BACKEND in (BACKEND_TORCH, BACKEND_TORCH_INT8):
+        tokenizer, model = load_bundle(bundle_dir, NER_INFERENCE_BACKEND)
+        backend = NER_INFERENCE_BACKEND
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(source)
+        model, backend = load_inference_model(source, NER_INFERENCE_BACKEND)
+
+    load_time = time.perf_counter() - start_time
+    rss_after = _current_rss_bytes()
+
+    parameter_bytes = model_size_bytes(model)
+    report = {
+        "model_name": NER_MODEL_NAME,
+        "bundle_dir": bundle_dir,
+        "backend": backend,
+        "load_time_seconds": round(load_time, 3),
+        "parameter_count": sum(p.numel() for p in model.parameters()) if hasattr(model, "parameters") else None,
+        "parameter_bytes": parameter_bytes,
+        "rss_before_bytes": rss_before,
+        "rss_after_bytes": rss_after,
+        "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "torch_version": torch.__version__
+    }
+    logger.info("NER model and tokenizer loaded successfully in %.2fs (%.1f MB of weights)",
+                load_time, parameter_bytes / (1024 * 1024))
+    print_runtime_self_check()
+
+    return tokenizer, model, report
+
+def get_ner_components():
+    """
+    Get the shared NER tokenizer and model, loading them on first use.
+
+    The model is loaded at most once per process, no matter how many parser
+    modules or request threads ask for it.
+
+    Returns:
+        tuple: (tokenizer, model)
+    """
+    global _tokenizer, _model, _load_report
+    if _model is None:
+        with _registry_lock:
+            # Re-check inside the lock in case another thread finished loading
+            if _model is None:
+                tokenizer, model, report = _load_components()
+                _tokenizer = tokenizer
+                _load_report = report
+                _model = model
+    return _tokenizer, _model
+
+def get_tokenizer():
+    """Get the shared NER tokenizer"""
+    return get_ner_components()[0]
+
+def get_model():
+    """Get the shared NER model"""
+    return get_ner_components()[1]
+
+def is_loaded():
+    """Check whether the NER model has been loaded in this process"""
+    return _model is not None
+
+def get_model_report():
+    """
+    Get memory and load-time information about the shared NER model.
+
+    Returns:
+        dict: Load report, with "loaded" set to False if the model is not loaded yet
+    """
+    with _registry_lock:
+        report = {"model_name": NER_MODEL_NAME, "loaded": _model is not None}
+        report.update(_load_report)
+    report["current_rss_bytes"] = _current_rss_bytes()
+    report["process_memory"] = get_process_memory()
+    return report
@@ -0,0 +1,180 @@
+import os
+import re
+from types import SimpleNamespace
+
+import torch
+from app.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Supported inference backends for the NER model
+BACKEND_TORCH = "torch"  # fp32 eager PyTorch
+BACKEND_TORCH_INT8 = "torch-int8"  # PyTorch with dynamic int8 quantization of Linear layers
+BACKEND_ONNX = "onnx"  # ONNX Runtime on CPU, exported once and cached on disk
+SUPPORTED_BACKENDS = (BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_ONNX)
+
+NER_INFERENCE_BACKEND = os.environ.get("NER_INFERENCE_BACKEND", BACKEND_TORCH).lower()
+
+# Directory for exported ONNX models
+NER_ONNX_CACHE_DIR = os.environ.get(
+    "NER_ONNX_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "onnx")
+)
+
+ONNX_INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+class OnnxTokenClassifier:
+    """
+    ONNX Runtime session exposing the parts of the transformers model API the parsers use.
+
+    Calling it with input tensors returns an object with a torch `logits` tensor,
+    and `config` holds the original model config (labels etc.).
+    """
+
+    def __init__(self, onnx_path, config):
+        """
+        Args:
+            onnx_path (str): Path to the exported ONNX model
+            config: transformers config of the exported model
+        """
+        import onnxruntime
+        from app.runtime_config import onnx_thread_counts, record_onnx_threads
+
+        self.onnx_path = onnx_path
+        self.config = config
+
+        # Keep to the worker's NER thread budget (ONNX Runtime would start a thread per core)
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads, options.inter_op_num_threads = onnx_thread_counts()
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        record_onnx_threads(options.intra_op_num_threads, options.inter_op_num_threads)
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def __call__(self, **inputs):
+        feed = {name: inputs[name].numpy() for name in self.input_names if name in inputs}
+        if "token_type_ids" in self.input_names and "token_type_ids" not in feed:
+            feed["token_type_ids"] = torch.zeros_like(inputs["input_ids"]).numpy()
+        logits = self.session.run(["logits"], feed)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+    def eval(self):
+        """No-op, kept for compatibility with torch modules"""
+        return self
+
+def quantize_int8(model):
+    """
+    Apply dynamic int8 quantization to the Linear layers of a model.
+
+    Args:
+        model: fp32 transformers model
+
+    Returns:
+        Model with int8 weights and dynamically quantized activations
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def onnx_cache_path(model_name):
+    """
+    Get the path of the cached ONNX export for a model.
+
+    Args:
+        model_name (str): Hugging Face model name or local directory
+
+    Returns:
+        str: Path of the .onnx file
+    """
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name).strip('_')
+    return os.path.join(NER_ONNX_CACHE_DIR, safe_name, "model.onnx")
+
+def export_onnx(model, onnx_path):
+    """
+    Export a token classification model to ONNX with dynamic batch and sequence axes.
+
+    Args:
+        model: fp32 transformers model
+        onnx_path (str): Destination path
+    """
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    dummy = torch.ones((1, 8), dtype=torch.long)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ONNX_INPUT_NAMES}
+    dynamic_axes["logits"] = {0: "batch", 1: "sequence"}
+
+    # Write to a temporary file first so a crashed export never leaves a broken cache
+    tmp_path = onnx_path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy, dummy, torch.zeros_like(dummy)),
+            tmp_path,
+            input_names=ONNX_INPUT_NAMES,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    os.replace(tmp_path, onnx_path)
+
+def load_inference_model(model_name, backend=NER_INFERENCE_BACKEND):
+    """
+    Load the NER model for the requested inference backend.
+
+    Falls back to fp32 PyTorch if the backend is unknown or its optional
+    dependencies (onnxruntime, plus onnx for the one-time export) are not installed.
+
+    Args:
+        model_name (str): Hugging Face model name or local directory
+        backend (str): One of SUPPORTED_BACKENDS
+
+    Returns:
+        tuple: (model, backend actually used)
+    """
+    from transformers import AutoConfig, AutoModelForTokenClassification
+
+    if backend not in SUPPORTED_BACKENDS:
+        logger.warning("Unknown NER_INFERENCE_BACKEND '%s', using '%s'", backend, BACKEND_TORCH)
+        backend = BACKEND_TORCH
+
+    if backend == BACKEND_ONNX:
+        onnx_path = onnx_cache_path(model_name)
+        try:
+            import onnxruntime  # noqa: F401
+            if not os.path.exists(onnx_path):
+                import onnx  # noqa: F401  (required by torch.onnx.export)
+        except ImportError as e:
+            logger.warning("ONNX backend unavailable (%s), falling back to the PyTorch NER backend", str(e))
+            backend = BACKEND_TORCH
+        else:
+            if not os.path.exists(onnx_path):
+                logger.info("Exporting NER model to ONNX: %s", onnx_path)
+                fp32_model = AutoModelForTokenClassification.from_pretrained(model_name)
+                fp32_model.eval()
+                export_onnx(fp32_model, onnx_path)
+                del fp32_model
+            return OnnxTokenClassifier(onnx_path, AutoConfig.from_pretrained(model_name)), backend
+
+    model = AutoModelForTokenClassification.from_pretrained(model_name)
+    model.eval()
+    if backend == BACKEND_TORCH_INT8:
+        model = quantize_int8(model)
+    return model, backend
+
+def _tensor_bytes(value):
+    """Sum the storage size of tensors in a (possibly nested) state dict value"""
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item) for item in value)
+    return 0
+
+def model_size_bytes(model):
+    """
+    Get the size of a model's weights in bytes.
+
+    Args:
+        model: torch model (fp32 or quantized) or OnnxTokenClassifier
+
+    Returns:
+        int: Size of the weights in bytes
+    """
+    if isinstance(model, OnnxTokenClassifier):
+        return os.path.getsize(model.onnx_path)
+    return sum(_tensor_bytes(value) for value in model.state_dict().values())
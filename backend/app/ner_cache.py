@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import hashlib
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from threading import Lock
+from app.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Cache of NER entity spans for texts that were already tagged
+NER_CACHE_ENABLED = os.environ.get("NER_CACHE_ENABLED", "True").lower() in ("true", "1", "yes")
+NER_CACHE_SIZE = int(os.environ.get("NER_CACHE_SIZE", "1024"))  # Max texts kept in memory
+NER_CACHE_DIR = os.environ.get("NER_CACHE_DIR", "")  # Optional on-disk tier shared by workers and restarts
+
+def normalize_text(text):
+    """
+    Normalize text for cache lookups.
+
+    The tokenizer ignores how much whitespace separates words, so texts that
+    only differ in whitespace produce the same model output.
+
+    Args:
+        text (str): Text sent to the NER model
+
+    Returns:
+        str: Text with whitespace runs collapsed to single spaces
+    """
+    return " ".join(text.split())
+
+# Runs of non-whitespace, i.e. the words normalize_text() joins with single spaces
+WORD = re.compile(r"\S+")
+
+def word_bounds(text):
+    """
+    Find the words of a text and where they start in its normalized form.
+
+    Args:
+        text (str): Text sent to the NER model
+
+    Returns:
+        tuple: (starts, ends, normalized_starts) lists of word offsets
+    """
+    starts = []
+    ends = []
+    normalized_starts = []
+    position = 0
+    for match in WORD.finditer(text):
+        start, end = match.span()
+        starts.append(start)
+        ends.append(end)
+        normalized_starts.append(position)
+        position += end - start + 1
+    return starts, ends, normalized_starts
+
+def map_spans(spans, from_starts, from_ends, to_starts, to_length):
+    """
+    Move entity spans between two texts that have the same words but different whitespace.
+
+    Offsets inside a word keep their place in that word. A span start in
+    whitespace moves to the next word, a span end to the end of the previous one.
+
+    Args:
+        spans (list): (start, end, entity_type, confidence) tuples in the first text
+        from_starts, from_ends (list): Word offsets in the first text
+        to_starts (list): Word start offsets in the second text
+        to_length (int): Length of the second text
+
+    Returns:
+        list: The spans in the second text
+    """
+    mapped = []
+    for start, end, entity_type, confidence in spans:
+        word = bisect_right(from_ends, start)
+        new_start = to_starts[word] + max(0, start - from_starts[word]) if word < len(from_starts) else to_length
+        word = bisect_left(from_starts, end) - 1
+        new_end = to_starts[word] + min(end, from_ends[word]) - from_starts[word] if word >= 0 else 0
+        mapped.append((new_start, max(new_start, new_end), entity_type, confidence))
+    return mapped
+
+def model_version():
+    """
+    Identify the model and settings the cached entities were produced with.
+
+    Returns:
+        str: Short hash over the model source, backend and windowing settings
+    """
+    from app.model_registry import NER_MODEL_NAME
+    from app.model_bundle import NER_MODEL_BUNDLE_DIR, is_bundle, read_manifest
+    from app.ner_backends import NER_INFERENCE_BACKEND
+    from app.ner_model import NER_SLIDING_WINDOW, NER_MAX_LENGTH, NER_WINDOW_STRIDE
+
+    version = {
+        "model": NER_MODEL_NAME,
+        "backend": NER_INFERENCE_BACKEND,
+        "sliding_window": NER_SLIDING_WINDOW,
+        "max_length": NER_MAX_LENGTH,
+        "stride": NER_WINDOW_STRIDE,
+        # Entries hold spans in the normalized text (earlier entries held entity strings)
+        "entry_format": "normalized_spans"
+    }
+    if is_bundle(NER_MODEL_BUNDLE_DIR):
+        # Bundles record a checksum of their weights
+        version["bundle"] = read_manifest(NER_MODEL_BUNDLE_DIR).get("sha256")
+    return hashlib.sha256(json.dumps(version, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+class NerResultCache:
+    """
+    Bounded LRU cache of NER entity spans keyed by normalized text and model version,
+    with an optional on-disk tier.
+
+    Texts that only differ in whitespace share an entry. The spans are stored
+    against the normalized text and mapped back to each caller's own text, so
+    the entities are always sliced from the text that was asked for.
+    """
+
+    def __init__(self, max_size=NER_CACHE_SIZE, cache_dir=NER_CACHE_DIR, version=None):
+        """
+        Args:
+            max_size (int): Max entries kept in memory
+            cache_dir (str): Directory for the on-disk tier ("" to disable)
+            version (str): Model version, computed from the current configuration if not given
+        """
+        self.max_size = max(1, max_size)
+        self.cache_dir = cache_dir
+        self.version = version or model_version()
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, text):
+        """Get the cache key for a text"""
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.version}-{digest}"
+
+    def _disk_path(self, key):
+        """Get the file of a key in the disk tier (sharded by the first hash characters)"""
+        digest = key.split("-", 1)[1]
+        return os.path.join(self.cache_dir, self.version, digest[:2], f"{digest}.json")
+
+    def _store(self, key, entities):
+        """Insert into the memory tier, evicting the least recently used entry if full"""
+        self._entries[key] = entities
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, text):
+        """
+        Look up the entity spans for a text.
+
+        Args:
+            text (str): Text sent to the NER model
+
+        Returns:
+            list: Cached list of (start, end, entity_type, confidence) tuples with
+                  offsets into text, or None on a miss
+        """
+        key = self.key(text)
+        spans = None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                spans = self._entries[key]
+
+        if spans is None and self.cache_dir:
+            try:
+                with open(self._disk_path(key), "r") as f:
+                    spans = [tuple(span) for span in json.load(f)]
+            except (OSError, ValueError):
+                spans = None
+            if spans is not None:
+                with self._lock:
+                    self._store(key, spans)
+                    self.disk_hits += 1
+
+        if spans is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        starts, ends, normalized_starts = word_bounds(text)
+        normalized_ends = [start + end - word_start for start, word_start, end in zip(normalized_starts, starts, ends)]
+        return map_spans(spans, normalized_starts, normalized_ends, starts, len(text))
+
+    def put(self, text, spans):
+        """
+        Store the entity spans for a text.
+
+        Args:
+            text (str): Text sent to the NER model
+            spans (list): List of (start, end, entity_type, confidence) tuples with offsets into text
+        """
+        key = self.key(text)
+        starts, ends, normalized_starts = word_bounds(text)
+        normalized_length = normalized_starts[-1] + ends[-1] - starts[-1] if starts else 0
+        spans = map_spans(spans, starts, ends, normalized_starts, normalized_length)
+        with self._lock:
+            self._store(key, spans)
+
+        if self.cache_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Write to a temporary file first so readers never see a partial entry
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(spans, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning("Error writing NER cache entry: %s", str(e))
+
+    def clear(self):
+        """Empty the memory tier and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.memory_hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def get_stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Hits per tier, misses, evictions and current size
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "enabled": True,
+                "version": self.version,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "disk_dir": self.cache_dir or None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+            }
+
+_cache = None
+_cache_lock = Lock()
+
+def get_ner_cache():
+    """
+    Get the process-wide NER result cache.
+
+    Returns:
+        NerResultCache: The shared cache, or None if NER_CACHE_ENABLED is off
+    """
+    global _cache
+    if not NER_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = NerResultCache()
+    return _cache
+
+def get_cache_stats():
+    """
+    Get the NER result cache counters for the stats endpoint.
+
+    Returns:
+        dict: Cache statistics, or {"enabled": False}
+    """
+    cache = get_ner_cache()
+    return cache.get_stats() if cache is not None else {"enabled": False}
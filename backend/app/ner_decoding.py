@@ -0,0 +1,226 @@
+import numpy as np
+import torch
+
+# Label tables are built once per label set, keyed by the id2label labels
+_label_tables = {}
+
+def get_label_tables(id2label):
+    """
+    Build lookup arrays for BIO decoding from a model's id2label mapping.
+
+    Args:
+        id2label (dict): Model label mapping, e.g. {0: "O", 1: "B-MISC", ...}
+
+    Returns:
+        tuple: (is_begin, is_inside, type_ids, type_names) where the first three are
+               NumPy arrays indexed by label id and type_ids is -1 for the O label
+    """
+    labels = tuple(id2label.values())
+    if labels not in _label_tables:
+        type_names = []
+        type_ids = []
+        for tag in labels:
+            # Tags without a B-/I- prefix are their own entity type
+            entity_type = tag[2:] if tag.startswith(("B-", "I-")) else tag
+            if tag == "O":
+                type_ids.append(-1)
+            else:
+                if entity_type not in type_names:
+                    type_names.append(entity_type)
+                type_ids.append(type_names.index(entity_type))
+        _label_tables[labels] = (
+            np.array([tag.startswith("B-") for tag in labels]),
+            np.array([tag.startswith("I-") for tag in labels]),
+            np.array(type_ids),
+            type_names
+        )
+    return _label_tables[labels]
+
+def token_predictions(logits):
+    """
+    Compute the predicted label and its softmax probability for every token.
+
+    Args:
+        logits (torch.Tensor): Logits of shape (1, num_tokens, num_labels)
+
+    Returns:
+        tuple: (predictions, confidences) as NumPy arrays of shape (num_tokens,)
+    """
+    max_probs, predictions = torch.softmax(logits[0].float(), dim=-1).max(dim=-1)
+    return predictions.numpy(), max_probs.numpy()
+
+def segment_starts(is_inside, type_ids):
+    """
+    Find where BIO segments start.
+
+    A token continues the previous segment only if it is an I- tag of the same
+    entity type as the previous token; every other token starts a new segment.
+
+    Args:
+        is_inside (np.ndarray): Per-token flag for I- tags
+        type_ids (np.ndarray): Per-token entity type id (-1 for O)
+
+    Returns:
+        np.ndarray: Indices of the first token of each segment
+    """
+    continues = np.zeros(len(type_ids), dtype=bool)
+    continues[1:] = is_inside[1:] & (type_ids[1:] == type_ids[:-1])
+    return np.flatnonzero(~continues)
+
+def decode_spans(predictions, id2label, inside_starts_entity=False):
+    """
+    Decode BIO label predictions into entity spans.
+
+    Args:
+        predictions (np.ndarray): Predicted label id per token
+        id2label (dict): Model label mapping
+        inside_starts_entity (bool): Whether a non-O tag other than B- that does not
+            continue an entity starts a new one (otherwise it is treated like O)
+
+    Returns:
+        tuple: (starts, ends, types) where token span i is starts[i]:ends[i]
+               and types[i] is its entity type name
+    """
+    is_begin, is_inside, type_ids, type_names = get_label_tables(id2label)
+    if len(predictions) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), []
+
+    token_types = type_ids[predictions]
+    starts = segment_starts(is_inside[predictions], token_types)
+    ends = np.append(starts[1:], len(predictions))
+
+    # Keep segments that open an entity
+    if inside_starts_entity:
+        keep = token_types[starts] >= 0
+    else:
+        keep = is_begin[predictions[starts]]
+    starts, ends = starts[keep], ends[keep]
+
+    return starts, ends, [type_names[t] for t in token_types[starts]]
+
+def span_means(values, starts, ends):
+    """
+    Average per-token values over each span.
+
+    Args:
+        values (np.ndarray): Per-token values
+        starts (np.ndarray): Span start indices
+        ends (np.ndarray): Span end indices (exclusive)
+
+    Returns:
+        np.ndarray: Mean value per span
+    """
+    if len(starts) == 0:
+        return np.zeros(0)
+    # reduceat over interleaved [start, end] boundaries sums each span (the result can
+    # differ from a Python sum() in the last bit); the padding element keeps an end
+    # index equal to len(values) valid
+    padded = np.append(np.asarray(values, dtype=np.float64), 0.0)
+    sums = np.add.reduceat(padded, np.ravel(np.column_stack((starts, ends))))[::2]
+    return sums / (ends - starts)
+
+def decode_entity_spans(result, id2label, min_confidence=0.3):
+    """
+    Convert token-level NER model output into character spans.
+
+    Argmax, softmax confidence, BIO transitions and span boundaries are computed
+    with array operations; Python objects are only created for the final entities.
+
+    Args:
+        result (dict): Output of run_ner_model()
+        id2label (dict): Model label mapping
+        min_confidence (float): Entities with lower average confidence are dropped
+
+    Returns:
+        list: List of tuples (start, end, entity_type, confidence) where start:end
+              are character offsets into the text the model was run on
+    """
+    predictions, confidences = token_predictions(result["logits"])
+
+    # Skip zero-width (special) tokens without breaking the surrounding entity
+    offsets = np.asarray(result["offsets"], dtype=np.int64).reshape(-1, 2)
+    real = np.flatnonzero(offsets[:, 0] != offsets[:, 1])
+    predictions, confidences = predictions[real], confidences[real]
+
+    starts, ends, types = decode_spans(predictions, id2label)
+    span_confidences = span_means(confidences, starts, ends)
+    keep = np.flatnonzero(span_confidences > min_confidence)
+
+    # An entity runs from the start of its first wordpiece to the end of its last one
+    char_starts = offsets[real[starts[keep]], 0].tolist()
+    char_ends = offsets[real[ends[keep] - 1], 1].tolist()
+    return [(start, end, types[i], confidence)
+            for start, end, i, confidence in zip(char_starts, char_ends, keep.tolist(), span_confidences[keep].tolist())]
+
+def decode_entities(text, result, id2label, min_confidence=0.3):
+    """
+    Convert token-level NER model output into entity tuples.
+
+    The entity text is sliced from the original text, so spacing and casing
+    inside multi-word entities are preserved.
+
+    Args:
+        text (str): Text the model was run on
+        result (dict): Output of run_ner_model() for text
+        id2label (dict): Model label mapping
+        min_confidence (float): Entities with lower average confidence are dropped
+
+    Returns:
+        list: List of tuples (entity, entity_type, confidence)
+    """
+    return [(text[start:end], entity_type, confidence)
+            for start, end, entity_type, confidence in decode_entity_spans(result, id2label, min_confidence)]
+
+def label_ids(tags):
+    """
+    Map a list of tag strings to label ids.
+
+    Args:
+        tags (list): Tag per token, e.g. ["B-PER", "I-PER", "O"]
+
+    Returns:
+        tuple: (ids, id2label) where ids is a NumPy array of label ids
+    """
+    labels, ids = np.unique(np.asarray(tags, dtype=str), return_inverse=True)
+    return ids.reshape(-1), dict(enumerate(labels.tolist()))
+
+def merge_wordpieces(tokens, predictions, confidences, id2label):
+    """
+    Merge "##" wordpieces into whole words.
+
+    Each word takes the tag of its first piece. Its confidence is the running
+    pairwise average over its pieces, ((c0 + c1) / 2 + c2) / 2 ..., computed in
+    closed form. Pieces before the first whole word are dropped.
+
+    Args:
+        tokens (list): Wordpiece strings (without special tokens)
+        predictions (np.ndarray): Predicted label id per token
+        confidences (np.ndarray): Confidence per token
+        id2label (dict): Model label mapping
+
+    Returns:
+        list: List of (word, tag, confidence) tuples
+    """
+    if not tokens:
+        return []
+
+    word_start = ~np.char.startswith(np.asarray(tokens, dtype=str), "##")
+    starts = np.flatnonzero(word_start)
+    if len(starts) == 0:
+        return []
+    ends = np.append(starts[1:], len(tokens))
+    first = starts[0]
+
+    # Weight of piece j in a word of n pieces: 2^-(n-1) for j = 0, otherwise 2^-(n-j)
+    lengths = ends - starts
+    word_index = np.cumsum(word_start[first:]) - 1
+    position = np.arange(first, len(tokens)) - starts[word_index]
+    n = lengths[word_index]
+    exponent = np.where(position == 0, n - 1, n - position)
+    weighted = np.asarray(confidences[first:], dtype=np.float64) * np.power(0.5, exponent)
+    word_confidences = np.add.reduceat(weighted, starts - first)
+
+    label_names = list(id2label.values())
+    tags = [label_names[p] for p in predictions[starts].tolist()]
+    words = [tokens[s] + "".join(piece[2:] for piece in tokens[s + 1:e]) for s, e in zip(starts.tolist(), ends.tolist())]
+    return list(zip(words, tags, word_confidences.tolist()))
@@ -0,0 +1,155 @@
+import torch
+from app.ner_model import run_ner_model, run_ner_model_batch, run_ner_model_many
+from app.model_registry import get_ner_components
+from app.ner_decoding import decode_entity_spans
+from app.ner_cache import get_ner_cache
+from app.parser_stats import record_ner_region_usage
+
+# NER helpers shared by the parser strategies. The model comes from the process-wide
+# registry and results go through the process-wide NER cache, so a document tagged by
+# one parser is answered from the cache when another parser asks for it.
+
+def compute_token_confidence(logits):
+    """
+    Compute confidence scores for each token using softmax.
+    
+    Args:
+        logits (torch.Tensor): Raw logits from the model
+        
+    Returns:
+        list: Confidence scores for each token
+    """
+    # Apply softmax to compute probability distributions
+    probs = torch.nn.functional.softmax(logits, dim=2)
+    
+    # Get the maximum probability for each token
+    max_probs, _ = torch.max(probs, dim=2)
+    
+    return max_probs.tolist()
+
+def extract_ner(text):
+    """
+    Extract named entities from text using the BERT NER model.
+    
+    Args:
+        text (str): Text to process
+        
+    Returns:
+        list: List of tuples (entity, entity_type, confidence)
+    """
+    return extract_ner_with_cache([text])[0]
+
+def extract_ner_spans(text):
+    """
+    Extract named entities from text as character spans.
+    
+    Args:
+        text (str): Text to process
+        
+    Returns:
+        list: List of tuples (start, end, entity_type, confidence), where
+              text[start:end] is the entity text
+    """
+    # Perform NER over the whole text (long documents use overlapping windows)
+    return decode_ner_result(run_ner_model(text))
+
+def extract_ner_batch(texts):
+    """
+    Extract named entities from several texts with batched forward passes.
+    
+    Args:
+        texts (list): Texts to process
+        
+    Returns:
+        list: One list of (entity, entity_type, confidence) tuples per text,
+              identical to calling extract_ner() on each text
+    """
+    return extract_ner_with_cache(texts, run_ner_model_batch)
+
+def extract_ner_with_cache(texts, run_model=run_ner_model_many):
+    """
+    Extract named entities from several texts, skipping the model for texts
+    already in the NER result cache.
+    
+    Args:
+        texts (list): Texts to process
+        run_model (callable): Runs the model on a list of texts (run_ner_model_many or run_ner_model_batch)
+        
+    Returns:
+        list: One list of (entity, entity_type, confidence) tuples per text
+    """
+    # The cache keeps spans, so each text's entities are sliced from that text even when
+    # the entry was stored for a text with different whitespace
+    cache = get_ner_cache()
+    spans = [cache.get(text) if cache is not None else None for text in texts]
+    
+    missing = [i for i, text_spans in enumerate(spans) if text_spans is None]
+    if missing:
+        results = run_model([texts[i] for i in missing])
+        for i, result in zip(missing, results):
+            spans[i] = decode_ner_result(result)
+            if cache is not None:
+                cache.put(texts[i], spans[i])
+    
+    return [spans_to_entities(text, text_spans) for text, text_spans in zip(texts, spans)]
+
+def extract_ner_in_regions(texts, regions):
+    """
+    Extract named entities from selected regions of several texts.
+    
+    The regions of all texts go through the model together, and regions
+    already in the NER result cache skip the model.
+    
+    Args:
+        texts (list): Texts to process
+        regions (list): List of (start, end) regions per text, from find_candidate_regions()
+        
+    Returns:
+        list: One list of (entity, entity_type, confidence) tuples per text
+    """
+    snippets = []
+    owners = []
+    for i, (text, text_regions) in enumerate(zip(texts, regions)):
+        for start, end in text_regions:
+            snippets.append(text[start:end])
+            owners.append(i)
+    
+    # Each region is tagged (or read from the cache) on its own, so the entities
+    # of a text are the entities of its regions in order
+    entities = [[] for _ in texts]
+    for i, snippet_entities in zip(owners, extract_ner_with_cache(snippets)):
+        entities[i].extend(snippet_entities)
+    
+    # Track how much of the documents actually went through the model
+    record_ner_region_usage(sum(len(snippet) for snippet in snippets), sum(len(text) for text in texts))
+    
+    return entities
+
+def decode_ner_result(result):
+    """
+    Convert token-level NER model output into entity spans.
+    
+    Args:
+        result (dict): Output of run_ner_model()
+        
+    Returns:
+        list: List of tuples (start, end, entity_type, confidence)
+    """
+    # Get the shared model (loaded once per process)
+    _, model = get_ner_components()
+    
+    # Decode BIO tags into spans, skipping those with very low confidence
+    return decode_entity_spans(result, model.config.id2label, min_confidence=0.3)
+
+def spans_to_entities(text, spans):
+    """
+    Slice entity spans out of the original text.
+    
+    Args:
+        text (str): Text the spans refer to
+        spans (list): Output of extract_ner_spans() for text
+        
+    Returns:
+        list: List of tuples (entity, entity_type, confidence)
+    """
+    return [(text[start:end], entity_type, confidence) for start, end, entity_type, confidence in spans]
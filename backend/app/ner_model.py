@@ -1,21 +1,23 @@
-from transformers import AutoTokenizer, AutoModelForTokenClassification
+import os
+import numpy as np
 import torch
-import torch.nn.functional as F
+from app.model_registry import get_ner_components
+from app.ner_decoding import token_predictions, merge_wordpieces, label_ids, decode_spans, span_means
+from app.ner_scheduler import NER_MICRO_BATCHING, get_ner_scheduler
+
+# Sliding-window inference for documents longer than the model's maximum input length
+NER_SLIDING_WINDOW = os.environ.get("NER_SLIDING_WINDOW", "True").lower() in ("true", "1", "yes")
+NER_MAX_LENGTH = int(os.environ.get("NER_MAX_LENGTH", "512"))  # Wordpieces per window, including [CLS]/[SEP]
+NER_WINDOW_STRIDE = int(os.environ.get("NER_WINDOW_STRIDE", "128"))  # Wordpieces shared by consecutive windows
+NER_WINDOW_BATCH_SIZE = int(os.environ.get("NER_WINDOW_BATCH_SIZE", "16"))  # Max windows per forward pass
 
 def load_model():
     """
-    Load the pre-trained NER model and tokenizer.
+    Get the pre-trained NER model and tokenizer from the shared model registry.
     Returns:
         tuple: (tokenizer, model)
     """
-    print("Loading NER model and tokenizer...")
-    tokenizer = AutoTokenizer.from_pretrained("dslim/bert-base-NER")
-    model = AutoModelForTokenClassification.from_pretrained("dslim/bert-base-NER")
-    print("NER model and tokenizer loaded successfully")
-    return tokenizer, model
-
-# Load the model and tokenizer
-tokenizer, model = load_model()
+    return get_ner_components()
 
 def tokenize_text(text):
     """
@@ -27,8 +29,168 @@ def tokenize_text(text):
     Returns:
         dict: Dictionary with input_ids and attention_mask tensors
     """
+    tokenizer, _ = get_ner_components()
     return tokenizer(text, return_tensors="pt", truncation=True, padding=True)
 
+def encode_windows(texts, tokenizer):
+    """
+    Tokenize texts into model-sized windows (unpadded).
+    
+    With NER_SLIDING_WINDOW enabled, a text longer than NER_MAX_LENGTH wordpieces
+    is split into overlapping windows that share NER_WINDOW_STRIDE wordpieces.
+    Otherwise each text is truncated to a single window.
+    
+    Args:
+        texts (list): Raw texts to tokenize
+        tokenizer: Fast tokenizer from the model registry
+        
+    Returns:
+        tuple: (encoding, sample_mapping) where sample_mapping[i] is the index
+               of the text that window i belongs to
+    """
+    if not NER_SLIDING_WINDOW:
+        encoding = tokenizer(texts, truncation=True, max_length=NER_MAX_LENGTH)
+        return encoding, list(range(len(texts)))
+    
+    # The overlap must leave room for new tokens in every window
+    stride = max(0, min(NER_WINDOW_STRIDE, NER_MAX_LENGTH // 2))
+    encoding = tokenizer(texts, truncation=True, max_length=NER_MAX_LENGTH, stride=stride,
+                         return_overflowing_tokens=True)
+    return encoding, encoding.pop("overflow_to_sample_mapping")
+
+def merge_windows(windows, window_logits, num_labels):
+    """
+    Merge the predictions of one document's windows into a single token sequence.
+    
+    Tokens that appear in more than one window are identified by their character
+    offsets, and the prediction from the window where the token has the most
+    context on both sides is kept. Special and padding tokens are dropped.
+    
+    Args:
+        windows (list): tokenizers.Encoding for each window of the document
+        window_logits (list): Logits tensor of shape (window_len, num_labels) per window
+        num_labels (int): Number of model labels
+        
+    Returns:
+        tuple: (tokens, offsets, logits) where logits has shape (1, num_tokens, num_labels)
+    """
+    best = {}
+    for window_index, window in enumerate(windows):
+        positions = [i for i, seq_id in enumerate(window.sequence_ids) if seq_id is not None]
+        last = len(positions) - 1
+        
+        for j, position in enumerate(positions):
+            key = tuple(window.offsets[position])
+            context = min(j, last - j)
+            if key not in best or context > best[key][0]:
+                best[key] = (context, window_index, position, window.tokens[position])
+    
+    ordered = sorted(best.items())
+    tokens = [token for _, (_, _, _, token) in ordered]
+    offsets = [key for key, _ in ordered]
+    
+    if not ordered:
+        return tokens, offsets, torch.zeros((1, 0, num_labels))
+    
+    logits = torch.stack([window_logits[window_index][position] for _, (_, window_index, position, _) in ordered])
+    return tokens, offsets, logits.unsqueeze(0)
+
+def run_ner_model_batch(texts):
+    """
+    Run the NER model over several texts, using sliding windows for long documents.
+    
+    The windows of all texts are sorted by length and padded into buckets of up
+    to NER_WINDOW_BATCH_SIZE windows, with a single forward pass per bucket.
+    
+    Args:
+        texts (list): Raw texts to analyze
+        
+    Returns:
+        list: One dict per text: {
+                  'tokens': list of wordpiece strings,
+                  'offsets': list of (start, end) character offsets into the text,
+                  'logits': tensor of shape (1, num_tokens, num_labels)
+              }
+    """
+    if not texts:
+        return []
+    
+    tokenizer, model = get_ner_components()
+    encoding, sample_mapping = encode_windows(list(texts), tokenizer)
+    windows = encoding.encodings
+    input_names = [name for name in ("input_ids", "token_type_ids", "attention_mask") if name in encoding]
+    
+    # Sort windows by length so each bucket is padded as little as possible
+    order = sorted(range(len(windows)), key=lambda i: len(windows[i].ids))
+    batch_size = max(1, NER_WINDOW_BATCH_SIZE)
+    window_logits = [None] * len(windows)
+    
+    with torch.no_grad():
+        for start in range(0, len(order), batch_size):
+            bucket = order[start:start + batch_size]
+            width = len(windows[bucket[-1]].ids)  # Longest window in the bucket
+            batch = {}
+            for name in input_names:
+                pad_value = tokenizer.pad_token_id if name == "input_ids" else 0
+                batch[name] = torch.tensor([encoding[name][i] + [pad_value] * (width - len(encoding[name][i]))
+                                            for i in bucket])
+            logits = model(**batch).logits
+            for row, i in enumerate(bucket):
+                window_logits[i] = logits[row, :len(windows[i].ids)]
+    
+    # Group windows by the text they came from, keeping their original order
+    text_windows = [[] for _ in texts]
+    for i, text_index in enumerate(sample_mapping):
+        text_windows[text_index].append(i)
+    
+    results = []
+    for indices in text_windows:
+        tokens, offsets, logits = merge_windows([windows[i] for i in indices],
+                                                [window_logits[i] for i in indices],
+                                                model.config.num_labels)
+        results.append({"tokens": tokens, "offsets": offsets, "logits": logits})
+    return results
+
+def run_ner_model(text):
+    """
+    Run the NER model over the full text, using sliding windows for long documents.
+    
+    With NER_MICRO_BATCHING enabled, the text is queued on the shared batch
+    scheduler and run together with other concurrent requests.
+    
+    Args:
+        text (str): Raw text to analyze
+        
+    Returns:
+        dict: {
+                  'tokens': list of wordpiece strings,
+                  'offsets': list of (start, end) character offsets into text,
+                  'logits': tensor of shape (1, num_tokens, num_labels)
+              }
+    """
+    if NER_MICRO_BATCHING:
+        return get_ner_scheduler().submit(text).result()
+    return run_ner_model_batch([text])[0]
+
+def run_ner_model_many(texts):
+    """
+    Run the NER model over several texts from a single caller.
+    
+    With NER_MICRO_BATCHING enabled, all texts are queued on the shared batch
+    scheduler at once; otherwise they run through run_ner_model_batch().
+    
+    Args:
+        texts (list): Raw texts to analyze
+        
+    Returns:
+        list: One run_ner_model() result per text
+    """
+    if NER_MICRO_BATCHING:
+        scheduler = get_ner_scheduler()
+        futures = [scheduler.submit(text) for text in texts]
+        return [future.result() for future in futures]
+    return run_ner_model_batch(texts)
+
 def predict_entities(text):
     """
     Predict named entities in the given text with confidence scores.
@@ -39,36 +201,21 @@ def predict_entities(text):
     Returns:
         list: List of (token, tag, confidence) tuples
     """
-    inputs = tokenize_text(text)
-    with torch.no_grad():
-        outputs = model(**inputs).logits
+    _, model = get_ner_components()
+    result = run_ner_model(text)
     
-    # Apply softmax to get probabilities
-    probs = F.softmax(outputs, dim=2)
-    
-    # Get the highest probability and its index
-    max_probs, predictions = torch.max(probs, dim=2)
-    
-    # Get the tokens and their predicted tags
-    token_ids = inputs["input_ids"][0]
-    tokens = tokenizer.convert_ids_to_tokens(token_ids)
-    tags = [model.config.id2label[p.item()] for p in predictions[0]]
-    confidences = [prob.item() for prob in max_probs[0]]
+    # Softmax, argmax and max probability for all tokens at once
+    predictions, confidences = token_predictions(result["logits"])
     
     # Filter out special tokens like [CLS], [SEP], [PAD]
-    entity_pairs = []
-    for token, tag, confidence in zip(tokens, tags, confidences):
-        if token.startswith("##"):  # Handle wordpiece tokenization
-            if entity_pairs:
-                # Merge with previous token if it exists
-                prev_token, prev_tag, prev_conf = entity_pairs[-1]
-                # Average the confidences
-                avg_conf = (prev_conf + confidence) / 2
-                entity_pairs[-1] = (prev_token + token[2:], prev_tag, avg_conf)
-        elif not (token == "[CLS]" or token == "[SEP]" or token == "[PAD]"):
-            entity_pairs.append((token, tag, confidence))
-    
-    return entity_pairs
+    tokens = result["tokens"]
+    keep = [i for i, token in enumerate(tokens) if token not in ("[CLS]", "[SEP]", "[PAD]")]
+    if len(keep) < len(tokens):
+        tokens = [tokens[i] for i in keep]
+        predictions, confidences = predictions[keep], confidences[keep]
+    
+    # Handle wordpiece tokenization by merging "##" pieces into words
+    return merge_wordpieces(tokens, predictions, confidences, model.config.id2label)
 
 def group_entities(entity_pairs):
     """
@@ -80,55 +227,17 @@ def group_entities(entity_pairs):
     Returns:
         list: List of (entity_text, entity_type, confidence) triplets
     """
-    grouped_entities = []
-    current_entity = []
-    current_confidences = []
-    current_type = "O"
+    if not entity_pairs:
+        return []
     
-    for item in entity_pairs:
-        token, tag = item[0], item[1]
-        confidence = item[2] if len(item) > 2 else 1.0  # Default confidence if not provided
-        
-        # Extract the entity type without B- or I- prefix
-        if tag != "O":
-            entity_type = tag[2:] if tag.startswith("B-") or tag.startswith("I-") else tag
-        else:
-            entity_type = "O"
-        
-        # Check if we're starting a new entity or continuing the current one
-        if tag.startswith("B-"):  # Beginning of a new entity
-            if current_entity:  # Save the previous entity if it exists
-                avg_confidence = sum(current_confidences) / len(current_confidences)
-                grouped_entities.append((" ".join(current_entity), current_type, avg_confidence))
-                current_entity = []
-                current_confidences = []
-            current_entity.append(token)
-            current_confidences.append(confidence)
-            current_type = entity_type
-        elif tag.startswith("I-") and current_type == entity_type:  # Inside the current entity
-            current_entity.append(token)
-            current_confidences.append(confidence)
-        elif tag == "O":  # Outside any entity
-            if current_entity:  # Save the previous entity if it exists
-                avg_confidence = sum(current_confidences) / len(current_confidences)
-                grouped_entities.append((" ".join(current_entity), current_type, avg_confidence))
-                current_entity = []
-                current_confidences = []
-                current_type = "O"
-        else:  # Tag is different from current entity or doesn't follow expected pattern
-            if current_entity:  # Save the previous entity if it exists
-                avg_confidence = sum(current_confidences) / len(current_confidences)
-                grouped_entities.append((" ".join(current_entity), current_type, avg_confidence))
-                current_entity = []
-                current_confidences = []
-            if tag != "O":  # Start a new entity if the tag is not O
-                current_entity.append(token)
-                current_confidences.append(confidence)
-                current_type = entity_type
-    
-    # Don't forget the last entity if there is one
-    if current_entity:
-        avg_confidence = sum(current_confidences) / len(current_confidences)
-        grouped_entities.append((" ".join(current_entity), current_type, avg_confidence))
-    
-    return grouped_entities 
\ No newline at end of file
+    tokens = [item[0] for item in entity_pairs]
+    # Default confidence if not provided
+    confidences = np.array([item[2] if len(item) > 2 else 1.0 for item in entity_pairs], dtype=np.float64)
+    predictions, id2label = label_ids([item[1] for item in entity_pairs])
+    
+    # I- tags that don't continue the current entity start a new one here
+    starts, ends, types = decode_spans(predictions, id2label, inside_starts_entity=True)
+    span_confidences = span_means(confidences, starts, ends)
+    
+    return [(" ".join(tokens[s:e]), entity_type, confidence)
+            for s, e, entity_type, confidence in zip(starts.tolist(), ends.tolist(), types, span_confidences.tolist())]
@@ -0,0 +1,118 @@
+import os
+import re
+
+# Skip the NER model for fields the regex pass already filled with high confidence
+NER_SKIP_WHEN_CONFIDENT = os.environ.get("NER_SKIP_WHEN_CONFIDENT", "True").lower() in ("true", "1", "yes")
+NER_SKIP_CONFIDENCE = float(os.environ.get("NER_SKIP_CONFIDENCE", "0.9"))
+
+# Only run the model on the lines around the fields that need it
+NER_REGION_RESTRICT = os.environ.get("NER_REGION_RESTRICT", "True").lower() in ("true", "1", "yes")
+NER_HEADER_LINES = int(os.environ.get("NER_HEADER_LINES", "5"))  # Leading lines searched for the customer
+
+# Structured fields NER can fill, and the entity types that fill them
+NER_FIELD_TYPES = {
+    "customer": ("PER", "ORG"),
+    "order_id": ("MISC",),
+    "shipping_address": ("LOC",)
+}
+
+def plan_ner_fields(structured_data):
+    """
+    Decide which fields still need the NER model after the regex pass.
+
+    A field is left to NER unless the regex pass found a value with confidence
+    of at least NER_SKIP_CONFIDENCE. Line items never need NER.
+
+    Args:
+        structured_data (dict): Structured data produced by the regex pass
+
+    Returns:
+        list: Names of the fields NER should fill, empty if the model can be skipped
+    """
+    if not NER_SKIP_WHEN_CONFIDENT:
+        return list(NER_FIELD_TYPES)
+
+    return [
+        field for field in NER_FIELD_TYPES
+        if not structured_data[field]["value"] or structured_data[field]["confidence"] < NER_SKIP_CONFIDENCE
+    ]
+
+def ner_entity_types(fields):
+    """
+    Get the entity types that are relevant for a set of planned fields.
+
+    Args:
+        fields (list): Output of plan_ner_fields()
+
+    Returns:
+        set: Entity types (e.g. "PER", "LOC") to use from the NER output
+    """
+    return {entity_type for field in fields for entity_type in NER_FIELD_TYPES[field]}
+
+# Lines that can hold (or introduce) each field, and how many following lines belong to it
+FIELD_REGION_PATTERNS = {
+    "customer": re.compile(r'\b(?:customer|client|bill(?:ed)?\s*to|sold\s*to|buyer|company|attn|attention|contact|from)\b', re.IGNORECASE),
+    "order_id": re.compile(r'\b(?:order|po|purchase|ref(?:erence)?)\b', re.IGNORECASE),
+    "shipping_address": re.compile(r'\b(?:ship(?:ping)?|deliver(?:y)?|address|send\s*to)\b', re.IGNORECASE)
+}
+FIELD_CONTEXT_LINES = {
+    "customer": 1,
+    "order_id": 1,
+    "shipping_address": 4
+}
+
+def find_candidate_regions(text, fields):
+    """
+    Find the parts of a document where NER can fill the planned fields.
+
+    A region is a keyword line for one of the fields plus the lines that follow
+    it (stopping at a blank line), and for the customer also the header block.
+    Adjacent lines are merged into one region. If nothing matches, or region
+    restriction is disabled, the whole text is a single region.
+
+    Args:
+        text (str): Document text
+        fields (list): Output of plan_ner_fields()
+
+    Returns:
+        list: Sorted, non-overlapping (start, end) character offsets into text
+    """
+    if not NER_REGION_RESTRICT:
+        return [(0, len(text))] if text else []
+
+    # Character span and blank flag for every line
+    lines = []
+    position = 0
+    for line in text.splitlines(keepends=True):
+        content = line.rstrip("\r\n")
+        lines.append((position, position + len(content), not content.strip()))
+        position += len(line)
+
+    selected = set()
+    if "customer" in fields:
+        header = [i for i, (_, _, blank) in enumerate(lines) if not blank][:NER_HEADER_LINES]
+        selected.update(header)
+
+    for i, (start, end, blank) in enumerate(lines):
+        if blank:
+            continue
+        for field in fields:
+            if FIELD_REGION_PATTERNS[field].search(text, start, end):
+                selected.add(i)
+                # Values often sit on the lines after a label like "Ship To:"
+                for j in range(i + 1, min(i + 1 + FIELD_CONTEXT_LINES[field], len(lines))):
+                    if lines[j][2]:
+                        break
+                    selected.add(j)
+
+    if not selected:
+        return [(0, len(text))] if text else []
+
+    regions = []
+    for i in sorted(selected):
+        start, end, _ = lines[i]
+        if regions and i - 1 in selected:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
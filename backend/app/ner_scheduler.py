@@ -0,0 +1,177 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+# Dynamic micro-batching of NER requests arriving concurrently (e.g. parallel /parse calls)
+NER_MICRO_BATCHING = os.environ.get("NER_MICRO_BATCHING", "False").lower() in ("true", "1", "yes")
+NER_BATCH_MAX_SIZE = int(os.environ.get("NER_BATCH_MAX_SIZE", "8"))  # Max documents per batch
+NER_BATCH_MAX_WAIT_MS = float(os.environ.get("NER_BATCH_MAX_WAIT_MS", "10"))  # Max time to wait for a batch to fill
+NER_BATCH_MAX_QUEUE = int(os.environ.get("NER_BATCH_MAX_QUEUE", "256"))  # Callers block when the queue is full
+
+class _Request:
+    """A single queued document waiting for inference"""
+    __slots__ = ("text", "future", "enqueued_at")
+
+    def __init__(self, text):
+        self.text = text
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+class NerBatchScheduler:
+    """
+    Background inference queue that groups concurrent NER requests into batches.
+
+    Requests are collected until max_batch_size documents are waiting or the
+    oldest one has waited max_wait_ms, then run together through batch_func on
+    a single worker thread. Each caller gets a Future for its own result.
+    """
+
+    def __init__(self, batch_func, max_batch_size=NER_BATCH_MAX_SIZE,
+                 max_wait_ms=NER_BATCH_MAX_WAIT_MS, max_queue_size=NER_BATCH_MAX_QUEUE):
+        """
+        Args:
+            batch_func (callable): Takes a list of texts and returns a list of results
+            max_batch_size (int): Maximum number of documents per batch
+            max_wait_ms (float): Maximum time the first request of a batch waits for more
+            max_queue_size (int): Maximum number of waiting requests (0 for unbounded)
+        """
+        self.batch_func = batch_func
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue(maxsize=max(0, max_queue_size))
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._max_batch_seen = 0
+        self._total_wait = 0.0
+        self._total_inference = 0.0
+        self._max_queue_depth = 0
+
+    def _ensure_worker(self):
+        """Start the worker thread on first use"""
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="ner-batch-scheduler", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text):
+        """
+        Queue a document for inference.
+
+        Args:
+            text (str): Raw text to analyze
+
+        Returns:
+            Future: Resolves to batch_func's result for this text
+        """
+        self._ensure_worker()
+        request = _Request(text)
+        self._queue.put(request)
+
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return request.future
+
+    def _collect_batch(self):
+        """Block for the next request, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Worker loop: run queued requests through the model in batches"""
+        while True:
+            batch = self._collect_batch()
+            started_at = time.monotonic()
+
+            try:
+                results = self.batch_func([request.text for request in batch])
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                results = None
+
+            finished_at = time.monotonic()
+            if results is not None:
+                for request, result in zip(batch, results):
+                    request.future.set_result(result)
+
+            with self._stats_lock:
+                self._requests += len(batch)
+                self._batches += 1
+                self._max_batch_seen = max(self._max_batch_seen, len(batch))
+                self._total_wait += sum(started_at - request.enqueued_at for request in batch)
+                self._total_inference += finished_at - started_at
+
+    def get_stats(self):
+        """
+        Get batching and queue metrics.
+
+        Returns:
+            dict: Configuration, queue depth and batch statistics
+        """
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "requests": self._requests,
+                "batches": self._batches,
+                "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "max_batch_size_seen": self._max_batch_seen,
+                "avg_queue_wait_ms": 1000.0 * self._total_wait / self._requests if self._requests else 0.0,
+                "avg_batch_inference_ms": 1000.0 * self._total_inference / self._batches if self._batches else 0.0
+            }
+
+# Process-wide scheduler; recreated after fork since threads don't survive it
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+def get_ner_scheduler():
+    """
+    Get the process-wide NER batch scheduler, creating it on first use.
+
+    Returns:
+        NerBatchScheduler: Scheduler running batches through run_ner_model_batch
+    """
+    global _scheduler, _scheduler_pid
+    if _scheduler is None or _scheduler_pid != os.getpid():
+        with _scheduler_lock:
+            if _scheduler is None or _scheduler_pid != os.getpid():
+                from app.ner_model import run_ner_model_batch
+                _scheduler = NerBatchScheduler(run_ner_model_batch)
+                _scheduler_pid = os.getpid()
+    return _scheduler
+
+def get_scheduler_stats():
+    """
+    Get metrics for the NER batch scheduler.
+
+    Returns:
+        dict: Scheduler metrics, or {"enabled": False} when micro-batching is off
+    """
+    if not NER_MICRO_BATCHING:
+        return {"enabled": False}
+    stats = get_ner_scheduler().get_stats()
+    stats["enabled"] = True
+    return stats
@@ -4,6 +4,12 @@ from PIL import Image, ImageOps, UnidentifiedImageError
 import os
 import sys
 from app.utils import detect_file_type
+from app.logging_utils import get_logger, sample_debug
+
+logger = get_logger(__name__)
+
+# Bytes read from the start of a text file to pick its encoding when streaming it
+TXT_ENCODING_SAMPLE_BYTES = 64 * 1024
 
 # Set Tesseract path for Windows
 if sys.platform.startswith('win'):
@@ -43,7 +49,7 @@ def extract_text_from_image(image_path):
         str: Extracted text from the image
     """
     try:
-        print(f"Processing image: {image_path}")
+        logger.debug("Processing image: %s", image_path)
         
         # Check if file exists
         if not os.path.exists(image_path):
@@ -51,7 +57,7 @@ def extract_text_from_image(image_path):
         
         # Check file size to detect non-image files
         file_size = os.path.getsize(image_path)
-        print(f"Image file size: {file_size} bytes")
+        logger.debug("Image file size: %d bytes", file_size)
         
         if file_size < 100:
             # Try to read the file as text if it's suspiciously small for an image
@@ -59,11 +65,11 @@ def extract_text_from_image(image_path):
                 with open(image_path, 'r', encoding='utf-8') as f:
                     content = f.read()
                     if content and len(content) > 0:
-                        print("File appears to be text, not an image. Returning content as is.")
+                        logger.info("File appears to be text, not an image. Returning content as is.")
                         return content
             except UnicodeDecodeError:
                 # Not a text file, continue with image processing
-                print("Not a text file, continuing with image processing")
+                logger.debug("Not a text file, continuing with image processing")
                 pass
         
         # Try a more robust way to open the image
@@ -72,9 +78,7 @@ def extract_text_from_image(image_path):
             img = Image.open(image_path).convert('RGB')
             
             # Get image details for debugging
-            print(f"Image format: {img.format}")
-            print(f"Image size: {img.size}")
-            print(f"Image mode: {img.mode}")
+            logger.debug("Image format: %s, size: %s, mode: %s", img.format, img.size, img.mode)
             
             # Enhance image for better OCR
             img = ImageOps.autocontrast(img)
@@ -87,7 +91,7 @@ def extract_text_from_image(image_path):
             
             if not text or text.strip() == '':
                 # Try a different psm mode
-                print("No text found with first OCR attempt, trying different settings...")
+                logger.debug("No text found with first OCR attempt, trying different settings")
                 text = pytesseract.image_to_string(
                     img,
                     config='--psm 6 --oem 3'  # Page segmentation mode 6 (assume a single block of text)
@@ -99,14 +103,14 @@ def extract_text_from_image(image_path):
             return text
             
         except UnidentifiedImageError:
-            print("UnidentifiedImageError: Cannot identify image format")
+            logger.warning("Cannot identify image format: %s", image_path)
             
             # Check if this is actually a text file with wrong extension
             try:
                 with open(image_path, 'r', encoding='utf-8') as f:
                     content = f.read()
                     if content and len(content) > 0:
-                        print("File appears to be text, not an image. Returning content as is.")
+                        logger.info("File appears to be text, not an image. Returning content as is.")
                         return content
             except UnicodeDecodeError:
                 # Not a text file
@@ -118,7 +122,7 @@ def extract_text_from_image(image_path):
         return "Error: Tesseract OCR is not installed or not in PATH. Please install Tesseract OCR."
     except Exception as e:
         # Handle any exceptions that might occur during OCR
-        print(f"Error extracting text from image: {str(e)}")
+        logger.error("Error extracting text from image: %s", str(e))
         return f"Error extracting text from image: {str(e)}"
 
 def extract_text_from_txt(txt_path):
@@ -145,6 +149,93 @@ def extract_text_from_txt(txt_path):
         # Handle any exceptions that might occur when reading the file
         return f"Error reading text file: {str(e)}"
 
+def iter_pdf_lines(pdf_path):
+    """
+    Read the text of a PDF file a page at a time.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        
+    Yields:
+        str: Lines of text, with an empty line after each page
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            yield from (page.extract_text() or "").splitlines()
+            yield ""
+            # Drop the page's parsed layout, which pdfplumber otherwise keeps until the file is closed
+            page.flush_cache()
+
+def iter_txt_lines(txt_path):
+    """
+    Read a plain text file a line at a time.
+    
+    The encoding is picked from the start of the file: UTF-8 if it decodes, otherwise
+    latin-1. Bytes that don't decode further on are replaced.
+    
+    Args:
+        txt_path (str): Path to the text file
+        
+    Yields:
+        str: Lines of text, without line endings
+    """
+    with open(txt_path, 'rb') as file:
+        start = file.read(TXT_ENCODING_SAMPLE_BYTES)
+    try:
+        # A multi-byte character may be cut at the end of the sample
+        start.decode('utf-8')
+        encoding = 'utf-8'
+    except UnicodeDecodeError as e:
+        encoding = 'utf-8' if e.start >= len(start) - 3 else 'latin-1'
+    
+    with open(txt_path, 'r', encoding=encoding, errors='replace') as file:
+        for line in file:
+            yield line.rstrip('\r\n')
+
+def iter_image_lines(image_path):
+    """
+    Read the text of an image file, which is OCR'd whole.
+    
+    Args:
+        image_path (str): Path to the image file
+        
+    Yields:
+        str: Lines of text
+        
+    Raises:
+        ValueError: If OCR fails
+    """
+    text = extract_text_from_image(image_path)
+    if text.startswith('Error'):
+        raise ValueError(text)
+    yield from text.splitlines()
+
+def iter_text_lines(file_path):
+    """
+    Streaming counterpart of extract_text(): read a file's text line by line, without
+    holding all of it in memory, e.g. for parser_v2.parse_order_stream().
+    
+    Args:
+        file_path (str): Path to the file to extract text from
+        
+    Returns:
+        tuple: (file type, iterator of lines)
+        
+    Raises:
+        ValueError: If the file doesn't exist, is empty or isn't a supported type
+    """
+    if not os.path.exists(file_path):
+        raise ValueError(f"File not found: {file_path}")
+    if os.path.getsize(file_path) == 0:
+        raise ValueError(f"File is empty: {file_path}")
+    
+    file_type = detect_file_type(file_path)
+    readers = {'pdf': iter_pdf_lines, 'image': iter_image_lines, 'txt': iter_txt_lines}
+    if file_type not in readers:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    return file_type, readers[file_type](file_path)
+
+@sample_debug
 def extract_text(file_path):
     """
     Unified text extraction pipeline - determines file type and uses the appropriate extraction method.
@@ -0,0 +1,293 @@
+import os
+import zlib
+import importlib
+from threading import Lock
+from app.logging_utils import get_logger
+from app.parser_stats import record_strategy_run
+
+logger = get_logger(__name__)
+
+# Opt-in development mode: reload the parser module when its source file changes.
+# Never enable this in production - the NER model itself is never reloaded, but
+# the parser module is re-executed on the next request after every edit.
+PARSER_DEV_RELOAD = os.environ.get("PARSER_DEV_RELOAD", "False").lower() in ("true", "1", "yes")
+
+# Parsing strategies: name -> (module, parse function). They all live in one process and share
+# its compiled extraction rules, vendor templates, NER model and NER result cache (each a
+# process-wide singleton), so running several of them costs no extra copy of any of these.
+STRATEGIES = {
+    "v1": ("app.parser", "parse_order_document"),      # NER-augmented
+    "v2": ("app.parser_v2", "parse_order_document"),   # Regex-first
+    "llm": ("app.llm_fallback", "parse_with_llm"),     # LLM only
+}
+
+# Strategy used by the API routes
+PARSER_STRATEGY = os.environ.get("PARSER_STRATEGY", "v2")
+
+# A/B testing: share of documents (0-1) parsed with PARSER_AB_STRATEGY instead. Documents are
+# assigned by a hash of their text, so the same document always goes to the same strategy.
+PARSER_AB_STRATEGY = os.environ.get("PARSER_AB_STRATEGY", "")
+PARSER_AB_SHARE = float(os.environ.get("PARSER_AB_SHARE", "0"))
+
+class ParserModule:
+    """
+    One parser module imported for the engine, reloaded in dev reload mode.
+
+    The module is imported once and reused for every request. When dev_reload
+    is enabled, it is reloaded only if its source file's modification time has
+    changed since the last import.
+    """
+
+    def __init__(self, module_name, function_name, dev_reload=False):
+        """
+        Args:
+            module_name (str): Dotted name of the parser module
+            function_name (str): Name of the module's parse function
+            dev_reload (bool): Whether to reload the module when its file changes
+        """
+        self.module_name = module_name
+        self.function_name = function_name
+        self.dev_reload = dev_reload
+        self._lock = Lock()
+        self._module = importlib.import_module(module_name)
+        self._mtime = self._source_mtime()
+        self.reload_count = 0
+
+    def _source_mtime(self):
+        """Get the modification time of the parser module's source file"""
+        try:
+            return os.path.getmtime(self._module.__file__)
+        except (OSError, TypeError, AttributeError):
+            return None
+
+    def _reload_if_changed(self):
+        """Reload the parser module if its source file changed on disk"""
+        mtime = self._source_mtime()
+        if mtime is None or mtime == self._mtime:
+            return
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            if mtime == self._mtime:
+                return
+            logger.info("Parser source changed, reloading %s (dev reload mode)", self.module_name)
+            self._module = importlib.reload(self._module)
+            self._mtime = mtime
+            self.reload_count += 1
+
+    @property
+    def module(self):
+        """The current parser module"""
+        if self.dev_reload:
+            self._reload_if_changed()
+        return self._module
+
+    @property
+    def parse(self):
+        """The current parse function"""
+        return getattr(self.module, self.function_name)
+
+class ParserEngine:
+    """
+    Long-lived document parser used by the API routes and batch scripts.
+
+    Runs any of the parsing strategies in STRATEGIES, importing each strategy's
+    module on first use. With ab_strategy and ab_share set, that share of the
+    documents is parsed with ab_strategy instead of the default strategy.
+    """
+
+    def __init__(self, module_name=None, dev_reload=PARSER_DEV_RELOAD, strategy=None,
+                 ab_strategy=None, ab_share=None):
+        """
+        Args:
+            module_name (str): Dotted name of a parser module to use as the default
+                               strategy, instead of one of STRATEGIES
+            dev_reload (bool): Whether to reload the modules when their files change
+            strategy (str): Default strategy (default: PARSER_STRATEGY)
+            ab_strategy (str): Strategy for the A/B share of documents (default: PARSER_AB_STRATEGY)
+            ab_share (float): Share of documents, 0-1, parsed with ab_strategy (default: PARSER_AB_SHARE)
+
+        Raises:
+            ValueError: If a strategy is unknown or ab_share is out of range
+        """
+        self.strategies = dict(STRATEGIES)
+        if module_name is not None:
+            self.strategies[module_name] = (module_name, "parse_order_document")
+        self.strategy = strategy or module_name or PARSER_STRATEGY
+        self.ab_strategy = (ab_strategy if ab_strategy is not None else PARSER_AB_STRATEGY) or None
+        self.ab_share = ab_share if ab_share is not None else PARSER_AB_SHARE
+        self.dev_reload = dev_reload
+        self._lock = Lock()
+        self._modules = {}
+
+        if not 0 <= self.ab_share <= 1:
+            raise ValueError(f"A/B share must be between 0 and 1, got {self.ab_share}")
+        for name in (self.strategy, self.ab_strategy):
+            if name is not None:
+                self._check_strategy(name)
+        # Load the default strategy up front, so a bad configuration fails at startup
+        self._module(self.strategy)
+
+    def _check_strategy(self, name):
+        """Raise ValueError for an unknown strategy name"""
+        if name not in self.strategies:
+            raise ValueError(f"Unknown parser strategy '{name}', expected one of: {', '.join(self.strategies)}")
+
+    def _module(self, name):
+        """Get the ParserModule of a strategy, importing it on first use"""
+        parser_module = self._modules.get(name)
+        if parser_module is None:
+            self._check_strategy(name)
+            with self._lock:
+                parser_module = self._modules.get(name)
+                if parser_module is None:
+                    module_name, function_name = self.strategies[name]
+                    logger.info("Loading parser strategy %s (%s)", name, module_name)
+                    parser_module = self._modules[name] = ParserModule(module_name, function_name, self.dev_reload)
+        return parser_module
+
+    @property
+    def module_name(self):
+        """Dotted name of the default strategy's module"""
+        return self.strategies[self.strategy][0]
+
+    @property
+    def module(self):
+        """The default strategy's current module"""
+        return self._module(self.strategy).module
+
+    @property
+    def reload_count(self):
+        """Number of dev mode reloads across the loaded strategies"""
+        return sum(parser_module.reload_count for parser_module in self._modules.values())
+
+    def strategy_module(self, strategy):
+        """
+        Get the current module of a strategy, e.g. for its batch helpers.
+
+        Args:
+            strategy (str): Strategy name
+
+        Returns:
+            module: The strategy's parser module
+
+        Raises:
+            ValueError: If the strategy is unknown
+        """
+        return self._module(strategy).module
+
+    def pick_strategy(self, text, strategy=None):
+        """
+        Choose the strategy that parses a document.
+
+        Args:
+            text (str): Raw text from a document
+            strategy (str): Strategy asked for by the caller, if any
+
+        Returns:
+            str: The requested strategy, else the A/B strategy for its share of
+                 documents, else the default one
+
+        Raises:
+            ValueError: If the requested strategy is unknown
+        """
+        if strategy is not None:
+            self._check_strategy(strategy)
+            return strategy
+        if self.ab_strategy and self.ab_share > 0:
+            # Stable across processes and restarts, unlike hash()
+            bucket = zlib.crc32(text.encode("utf-8", "replace")) % 10000
+            if bucket < self.ab_share * 10000:
+                return self.ab_strategy
+        return self.strategy
+
+    def parse(self, text, strategy=None, **options):
+        """
+        Parse an order document.
+
+        Args:
+            text (str): Raw text from a document
+            strategy (str): Strategy to use (default: chosen by pick_strategy())
+            **options: Extra arguments for the strategy's parse function,
+                       e.g. ner_entities for v1
+
+        Returns:
+            dict: Structured order data
+
+        Raises:
+            ValueError: If the strategy is unknown
+        """
+        strategy = self.pick_strategy(text, strategy)
+        result = self._module(strategy).parse(text, **options)
+        confidence = result.get("confidence") if isinstance(result, dict) else None
+        record_strategy_run(strategy, confidence.get("overall", 0) if isinstance(confidence, dict) else 0)
+        return result
+
+    def has_streaming_mode(self, strategy=None):
+        """
+        Check whether a strategy can parse a document line by line with stream().
+        
+        Args:
+            strategy (str): Strategy name (default: the default strategy)
+            
+        Returns:
+            bool: Whether the strategy's module has a parse_order_stream() function
+            
+        Raises:
+            ValueError: If the strategy is unknown
+        """
+        return hasattr(self._module(strategy or self.strategy).module, "parse_order_stream")
+    
+    def stream(self, lines, strategy=None):
+        """
+        Parse an order document read line by line, yielding results as they're found.
+
+        Args:
+            lines (iterable): Lines of text
+            strategy (str): Strategy to use (default: the default strategy)
+
+        Returns:
+            iterator: Result records, see parser_v2.parse_order_stream()
+
+        Raises:
+            ValueError: If the strategy is unknown or has no streaming mode
+        """
+        strategy = strategy or self.strategy
+        parser_module = self._module(strategy)
+        module = parser_module.module
+        if not hasattr(module, "parse_order_stream"):
+            raise ValueError(f"Parser module {parser_module.module_name} has no streaming mode")
+        return module.parse_order_stream(lines)
+
+    def report(self):
+        """
+        Describe the engine's configuration for the stats endpoint.
+
+        Returns:
+            dict: Default strategy, A/B strategy and share, and the loaded strategies
+        """
+        return {
+            "strategy": self.strategy,
+            "ab_strategy": self.ab_strategy,
+            "ab_share": self.ab_share if self.ab_strategy else 0,
+            "loaded_strategies": sorted(self._modules),
+            "dev_reload": self.dev_reload
+        }
+
+# Process-wide engine instance
+_engine = None
+_engine_lock = Lock()
+
+def get_parser_engine():
+    """
+    Get the process-wide parser engine, creating it on first use.
+
+    Returns:
+        ParserEngine: The shared parser engine
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = ParserEngine()
+    return _engine
@@ -1,6 +1,9 @@
 import os
 import json
 from threading import Lock
+from app.logging_utils import get_logger
+
+logger = get_logger(__name__)
 
 # Use a lock to ensure thread-safety for counter updates
 _stats_lock = Lock()
@@ -9,6 +12,16 @@ _stats_lock = Lock()
 _ner_used = 0
 _llm_fallback_used = 0  # when NER confidence is low
 _llm_forced = 0  # when USE_LLM_PARSER=true
+_ner_model_runs = 0  # documents that needed a NER forward pass
+_ner_model_skipped = 0  # documents where the regex pass made NER unnecessary
+_ner_fields_requested = {}  # how often each field was left to NER
+_ner_region_chars = 0  # characters sent to the NER model
+_ner_document_chars = 0  # characters in the documents those regions came from
+_regex_budget_exceeded = 0  # documents whose regex extraction ran out of time
+_template_used = 0  # documents read by a vendor template
+_template_matches = {}  # documents read by each vendor template
+_template_fallthroughs = {}  # documents that matched a template layout but failed its extractor
+_strategy_runs = {}  # documents parsed by each parser engine strategy, with their total confidence
 
 def increment_ner_counter():
     """Increment the counter for NER parser usage"""
@@ -28,6 +41,79 @@ def increment_llm_forced_counter():
     with _stats_lock:
         _llm_forced += 1
 
+def increment_ner_model_run_counter(fields):
+    """
+    Record a document that needed the NER model.
+    
+    Args:
+        fields (list): Fields NER was asked to fill
+    """
+    global _ner_model_runs
+    with _stats_lock:
+        _ner_model_runs += 1
+        for field in fields:
+            _ner_fields_requested[field] = _ner_fields_requested.get(field, 0) + 1
+
+def increment_ner_model_skipped_counter():
+    """Record a document where the NER model was skipped"""
+    global _ner_model_skipped
+    with _stats_lock:
+        _ner_model_skipped += 1
+
+def record_ner_region_usage(region_chars, document_chars):
+    """
+    Record how much text went through the NER model.
+    
+    Args:
+        region_chars (int): Characters in the regions sent to the model
+        document_chars (int): Characters in the full documents
+    """
+    global _ner_region_chars, _ner_document_chars
+    with _stats_lock:
+        _ner_region_chars += region_chars
+        _ner_document_chars += document_chars
+
+def increment_regex_budget_exceeded_counter():
+    """Record a document whose regex extraction was stopped by the time budget"""
+    global _regex_budget_exceeded
+    with _stats_lock:
+        _regex_budget_exceeded += 1
+
+def increment_template_counter(name):
+    """
+    Record a document read by a vendor template.
+    
+    Args:
+        name (str): Template name
+    """
+    global _template_used
+    with _stats_lock:
+        _template_used += 1
+        _template_matches[name] = _template_matches.get(name, 0) + 1
+
+def increment_template_fallthrough_counter(name):
+    """
+    Record a document whose layout matched a vendor template that couldn't read it.
+    
+    Args:
+        name (str): Template name
+    """
+    with _stats_lock:
+        _template_fallthroughs[name] = _template_fallthroughs.get(name, 0) + 1
+
+def record_strategy_run(name, confidence):
+    """
+    Record a document parsed by a parser engine strategy, for comparing strategies.
+    
+    Args:
+        name (str): Strategy name
+        confidence (float): Overall confidence of the result
+    """
+    with _stats_lock:
+        runs = _strategy_runs.setdefault(name, {"documents": 0, "confidence_total": 0.0})
+        runs["documents"] += 1
+        runs["confidence_total"] += confidence
+
 def get_usage_stats():
     """
     Get current parser usage statistics
@@ -40,16 +126,37 @@ def get_usage_stats():
             "ner_used": _ner_used,
             "llm_fallback_used": _llm_fallback_used,
             "llm_forced": _llm_forced,
-            "total_documents_processed": _ner_used + _llm_fallback_used + _llm_forced
+            "template_used": _template_used,
+            "total_documents_processed": _ner_used + _llm_fallback_used + _llm_forced + _template_used,
+            "ner_model_runs": _ner_model_runs,
+            "ner_model_skipped": _ner_model_skipped,
+            "ner_fields_requested": dict(_ner_fields_requested),
+            "ner_region_chars": _ner_region_chars,
+            "ner_document_chars": _ner_document_chars,
+            "regex_budget_exceeded": _regex_budget_exceeded,
+            "template_matches": dict(_template_matches),
+            "template_fallthroughs": dict(_template_fallthroughs),
+            "strategy_runs": {name: dict(runs) for name, runs in _strategy_runs.items()}
         }
 
 def reset_stats():
     """Reset all statistics counters to zero"""
-    global _ner_used, _llm_fallback_used, _llm_forced
+    global _ner_used, _llm_fallback_used, _llm_forced, _ner_model_runs, _ner_model_skipped
+    global _ner_region_chars, _ner_document_chars, _regex_budget_exceeded, _template_used
     with _stats_lock:
         _ner_used = 0
         _llm_fallback_used = 0
         _llm_forced = 0
+        _ner_model_runs = 0
+        _ner_model_skipped = 0
+        _ner_fields_requested.clear()
+        _ner_region_chars = 0
+        _ner_document_chars = 0
+        _regex_budget_exceeded = 0
+        _template_used = 0
+        _template_matches.clear()
+        _template_fallthroughs.clear()
+        _strategy_runs.clear()
 
 def save_stats_to_file(filepath="parser_stats.json"):
     """
@@ -64,7 +171,7 @@ def save_stats_to_file(filepath="parser_stats.json"):
             json.dump(stats, f, indent=2)
         return True
     except Exception as e:
-        print(f"Error saving stats to file: {str(e)}")
+        logger.error("Error saving stats to file: %s", str(e))
         return False
 
 def load_stats_from_file(filepath="parser_stats.json"):
@@ -77,7 +184,8 @@ def load_stats_from_file(filepath="parser_stats.json"):
     Returns:
         bool: True if loading was successful, False otherwise
     """
-    global _ner_used, _llm_fallback_used, _llm_forced
+    global _ner_used, _llm_fallback_used, _llm_forced, _ner_model_runs, _ner_model_skipped
+    global _ner_region_chars, _ner_document_chars, _regex_budget_exceeded, _template_used
     try:
         if os.path.exists(filepath):
             with open(filepath, 'r') as f:
@@ -86,8 +194,22 @@ def load_stats_from_file(filepath="parser_stats.json"):
                     _ner_used = stats.get("ner_used", 0)
                     _llm_fallback_used = stats.get("llm_fallback_used", 0)
                     _llm_forced = stats.get("llm_forced", 0)
+                    _ner_model_runs = stats.get("ner_model_runs", 0)
+                    _ner_model_skipped = stats.get("ner_model_skipped", 0)
+                    _ner_fields_requested.clear()
+                    _ner_fields_requested.update(stats.get("ner_fields_requested", {}))
+                    _ner_region_chars = stats.get("ner_region_chars", 0)
+                    _ner_document_chars = stats.get("ner_document_chars", 0)
+                    _regex_budget_exceeded = stats.get("regex_budget_exceeded", 0)
+                    _template_used = stats.get("template_used", 0)
+                    _template_matches.clear()
+                    _template_matches.update(stats.get("template_matches", {}))
+                    _template_fallthroughs.clear()
+                    _template_fallthroughs.update(stats.get("template_fallthroughs", {}))
+                    _strategy_runs.clear()
+                    _strategy_runs.update(stats.get("strategy_runs", {}))
             return True
         return False
     except Exception as e:
-        print(f"Error loading stats from file: {str(e)}")
+        logger.error("Error loading stats from file: %s", str(e))
         return False 
\ No newline at end of file
@@ -1,229 +1,130 @@
 import re
-import torch
-from transformers import AutoTokenizer, AutoModelForTokenClassification
-import numpy as np
-from app.ner_model import predict_entities, group_entities
+import itertools
+import collections
 import os
-from app.parser_stats import increment_llm_forced_counter, increment_ner_counter, increment_llm_fallback_counter
+from app.ner_extraction import compute_token_confidence, extract_ner
+from app.parser_stats import (increment_llm_forced_counter, increment_ner_counter, increment_llm_fallback_counter,
+                              increment_regex_budget_exceeded_counter, increment_template_counter,
+                              increment_template_fallthrough_counter)
+from app.regex_engine import RegexTimeBudgetExceeded, check_deadline, regex_deadline
+from app.extraction_rules import get_rule_set, match_value
+from app.vendor_templates import get_template_registry
+from app.confidence import overall_confidence
+from app.line_items import FieldValue, LineItem, LineItemAssembler, is_valid_sku, line_item, postprocess_line_items
+from app.logging_utils import debug_enabled, get_logger, sample_debug
+
+logger = get_logger(__name__)
 
 # Constants
 CONFIDENCE_THRESHOLD = 0.7  # Confidence threshold for warnings
+# Streaming mode (parse_order_stream): lines read ahead for the order ID, customer and shipping
+# address, and number of recent line items remembered to drop duplicates (0 = all of them)
+STREAM_HEADER_LINES = int(os.environ.get("STREAM_HEADER_LINES", "200"))
+STREAM_DEDUP_WINDOW = int(os.environ.get("STREAM_DEDUP_WINDOW", "10000"))
+# Max time the regex extraction of one document may take before it stops with the fields found so far (0 = no limit)
+REGEX_TIME_BUDGET_MS = float(os.environ.get("REGEX_TIME_BUDGET_MS", "1000"))
+
+# Extraction rules (app/rules/default_rules.json, plus EXTRACTION_RULES_PATH), compiled once per process
+RULES = get_rule_set()
+
+# Document-level rule groups. The text is scanned for all of their keywords once,
+# and each rule is only tried where one of its keywords starts.
+PO_DIRECT_RULES = RULES.group("order_id.po_direct")
+ORDER_ID_RULES = RULES.group("order_id.general")
+PREFIXED_ORDER_ID_RULES = RULES.group("order_id.prefixed")
+FALLBACK_ORDER_ID_RULES = RULES.group("order_id.fallback")  # Tried in order
+CUSTOMER_RULES = RULES.group("customer.label")
+SHIP_TO_SECTION_RULES = RULES.group("shipping_address.section")
+ADDRESS_RULES = RULES.group("shipping_address.label")
+PART_ITEM_RULES = RULES.group("line_items.part_table")
+SKU_ITEM_RULES = RULES.group("line_items.sku_qty_price")
+INFORMAL_ITEM_RULES = RULES.group("line_items.informal")
+KEYWORD_SCANNER = RULES.keyword_scanner([
+    "order_id.po_direct", "order_id.general", "order_id.prefixed", "order_id.fallback", "customer.label",
+    "shipping_address.section", "shipping_address.label", "line_items.part_table", "line_items.sku_qty_price",
+    "line_items.informal"
+])
+
+# Per-line line item rule groups, in the order classify_line() returns their matches
+LINE_RULE_GROUPS = ("line.sku", "line.quantity", "line.price", "line.part")
+# Streaming mode also reads the single-line item patterns line by line, sharing the keyword prefilter
+STREAM_RULE_GROUPS = LINE_RULE_GROUPS + ("line_items.part_table", "line_items.sku_qty_price", "line_items.informal")
+
+# Informal customer references, tried when no customer label was found
+SHIP_TO_CUSTOMER_RULES = RULES.group("customer.ship_to")
+WAREHOUSE_CUSTOMER_RULES = RULES.group("customer.warehouse")
 
-# Load NER model and tokenizer
-print("Loading NER model and tokenizer for parser_v2...")
-tokenizer = AutoTokenizer.from_pretrained("dslim/bert-base-NER")
-model = AutoModelForTokenClassification.from_pretrained("dslim/bert-base-NER")
-print("NER model and tokenizer loaded successfully")
+# SKU validation (is_valid_sku and postprocess_line_items are shared with parser.py, in app/line_items.py)
+OUTPUT_BANNED_SKUS = frozenset(RULES.get_list("output_banned_skus"))  # Final safety check on the output
 
-def postprocess_line_items(items):
+# Known vendor layouts (VENDOR_TEMPLATES_PATH), read directly by parse_order_document
+TEMPLATES = get_template_registry()
+
+# Shipping address cleanup
+ADDRESS_LINE_START = re.compile(r"^[A-Z0-9]")
+ADDRESS_STOP_LINES = RULES.get_list("address_stop_lines")
+ADDRESS_STOP_PHRASES = RULES.get_list("address_stop_phrases")  # Lowercase
+LINE_ITEM_INDICATORS = RULES.get_list("line_item_indicators")
+HAS_LETTER = re.compile(r'[A-Z]')
+HAS_DIGIT = re.compile(r'[0-9]')
+
+def part_row_item(match):
     """
-    Postprocess line items to deduplicate and filter invalid entries.
+    Create a line item from a "line_items.part_table" match (Part #XXX-1234 | Qty: 2 | Unit Price: $10.00).
     
     Args:
-        items (list): List of line item dictionaries
+        match (re.Match): Match with the SKU, quantity and price groups
         
     Returns:
-        list: Cleaned list of line items
+        LineItem: The line item
     """
-    print("\n===== CRITICAL DEBUG: Starting postprocess_line_items =====")
-    print(f"Input items count: {len(items)}")
-    for i, item in enumerate(items):
-        sku = item.get("sku", {}).get("value", "NONE")
-        print(f"Item {i}: SKU={sku}, Confidence={item.get('sku', {}).get('confidence', 'NONE')}")
-    
-    # Dictionary to track unique items
-    unique_items = {}
-    valid_items = []
-    
-    # Define more flexible SKU patterns to match real-world variations
-    # Primary pattern: 2+ letters followed by hyphen and 2+ digits (e.g., AXL-9920)
-    primary_pattern = re.compile(r'^[A-Za-z]{2,}-\d{2,}$')
-    
-    # Secondary patterns for exceptions
-    alpha_num_pattern = re.compile(r'^[A-Za-z]{2,}\d{2,}$')  # e.g., AXL9920
-    triple_alpha_pattern = re.compile(r'^[A-Za-z]{3,}-[A-Za-z0-9]{3,}$')  # e.g., ABC-X10
-    
-    # Invalid patterns - single characters
-    invalid_pattern = re.compile(r'^[a-zA-Z]{1}$|^\d{1,2}$')  # Single letters or 1-2 digits
-    
-    # Explicitly banned SKUs (direct matches)
-    banned_skus = ['s', 'S', 'x', 'X', '1', '2', '12', '123']
-    
-    # Store all valid items before processing
-    all_valid_items = []
-    
-    for item in items:
-        # Skip items with invalid SKUs
-        sku = item.get("sku", {}).get("value", "")
-        
-        # Direct check for explicitly banned SKUs (highest priority check)
-        if sku in banned_skus:
-            print(f"CRITICAL DEBUG: Skipping explicitly banned SKU: '{sku}'")
-            continue
-        
-        # Skip empty or very short SKUs
-        if not sku or len(sku) < 3:
-            print(f"DEBUG: Skipping item with invalid SKU: '{sku}' (too short)")
-            continue
-        
-        # Skip single letter or digit SKUs which are likely extraction errors
-        if invalid_pattern.match(sku):
-            print(f"DEBUG: Skipping definitely invalid SKU: '{sku}' (single letter/digit)")
-            continue
-            
-        # Check if SKU matches any of our accepted patterns
-        is_valid = False
-        
-        if primary_pattern.match(sku):
-            print(f"DEBUG: Valid primary format SKU: '{sku}'")
-            is_valid = True
-        elif alpha_num_pattern.match(sku):
-            print(f"DEBUG: Valid alphanumeric SKU: '{sku}'")
-            is_valid = True
-        elif triple_alpha_pattern.match(sku):
-            print(f"DEBUG: Valid triple alpha format SKU: '{sku}'")
-            is_valid = True
-        elif len(sku) >= 4 and sku[0].isalpha():
-            # More lenient check for longer SKUs that start with a letter
-            print(f"DEBUG: Allowing non-standard but acceptable SKU format: '{sku}'")
-            is_valid = True
-        else:
-            print(f"DEBUG: Skipping invalid SKU: '{sku}' (format doesn't match any patterns)")
-            continue
-        
-        # Add to valid items list if it passed all checks
-        all_valid_items.append(item)
-    
-    # Print all valid items after filtering
-    print(f"Valid items after pattern filtering: {len(all_valid_items)}")
-    for i, item in enumerate(all_valid_items):
-        print(f"Valid Item {i}: SKU={item.get('sku', {}).get('value', 'NONE')}")
+    return LineItem(FieldValue(match.group(1).strip(), 0.95, "regex-part"),
+                    FieldValue(int(match.group(2)), 0.95, "regex"),
+                    FieldValue(float(match.group(3)), 0.95, "regex"))
+
+def sku_row_item(match):
+    """
+    Create a line item from a "line_items.sku_qty_price" match (SKU: XXX-1234 ... Qty: 2 ... Price: $10.00).
     
-    # Process valid items for deduplication
-    for item in all_valid_items:
-        sku = item.get("sku", {}).get("value", "")
-        
-        # Create a unique key for this item
-        key = (sku, item.get("quantity", {}).get("value", 0), item.get("price", {}).get("value", 0))
+    Args:
+        match (re.Match): Match with the SKU, quantity and price groups
         
-        # If this is a new unique item, or it has higher confidence than a previous one
-        if key not in unique_items or item.get("sku", {}).get("confidence", 0) > unique_items[key].get("sku", {}).get("confidence", 0):
-            unique_items[key] = item
-            print(f"DEBUG: Added/updated unique item: '{sku}'")
-        else:
-            print(f"DEBUG: Skipped duplicate item with lower confidence: '{sku}'")
-    
-    # Convert back to list
-    valid_items = list(unique_items.values())
-    
-    print(f"Final output items count: {len(valid_items)}")
-    print("Final SKUs in output:")
-    for i, item in enumerate(valid_items):
-        sku = item.get("sku", {}).get("value", "NONE")
-        print(f"Result Item {i}: SKU='{sku}'")
-    print("===== CRITICAL DEBUG: Finished postprocess_line_items =====\n")
-    
-    return valid_items
+    Returns:
+        LineItem: The line item
+    """
+    return line_item(match.group(1).strip(), int(match.group(2)), float(match.group(3)), 0.9, "regex")
 
-def compute_token_confidence(logits):
+def informal_item(match):
     """
-    Compute confidence scores for each token using softmax.
+    Create a line item from a "line_items.informal" match (12x of HTR-1204 @ $32.00).
     
     Args:
-        logits (torch.Tensor): Raw logits from the model
+        match (re.Match): Match with the quantity, SKU and price groups
         
     Returns:
-        list: Confidence scores for each token
+        LineItem: The line item
     """
-    # Apply softmax to compute probability distributions
-    probs = torch.nn.functional.softmax(logits, dim=2)
-    
-    # Get the maximum probability for each token
-    max_probs, _ = torch.max(probs, dim=2)
-    
-    return max_probs.tolist()
+    qty, sku, price = match.groups()
+    # Calculate dynamic confidence based on SKU complexity
+    # Longer SKUs with mixed characters are more likely to be valid
+    sku_complexity = min(0.95, 0.75 + (len(sku.strip()) * 0.02) + (0.05 if HAS_LETTER.search(sku) and HAS_DIGIT.search(sku) else 0))
+    logger.debug("Found informal line item: %sx of %s @ $%s (confidence: %.2f)", qty, sku, price, sku_complexity)
+    return line_item(sku.strip(), int(qty), float(price), sku_complexity, "regex-informal")
 
-def extract_ner(text):
+def classify_line(line):
     """
-    Extract named entities from text using the BERT NER model.
+    Find the line item fields on one line of text.
+    
+    The rules only run when the line contains one of their keywords, so
+    lines without any (most lines of a long invoice) cost a few substring checks.
     
     Args:
-        text (str): Text to process
+        line (str): Stripped line of text
         
     Returns:
-        list: List of tuples (entity, entity_type, confidence)
+        tuple: (sku_match, qty_match, price_match, part_match), each a re.Match or None
     """
-    # Tokenize the text
-    inputs = tokenizer(text, truncation=True, return_tensors="pt", return_offsets_mapping=True, padding=True)
-    tokens = inputs.tokens()
-    offset_mapping = inputs["offset_mapping"][0].tolist()
-    
-    # Perform NER
-    with torch.no_grad():
-        outputs = model(**{k: v for k, v in inputs.items() if k != "offset_mapping"})
-    
-    # Get the predictions and confidence scores
-    predictions = torch.argmax(outputs.logits, dim=2)[0].tolist()
-    confidences = compute_token_confidence(outputs.logits)[0]
-    
-    # Map predictions to named entities
-    idx2tag = {i: tag for i, tag in enumerate(model.config.id2label.values())}
-    
-    entities = []
-    current_entity = None
-    current_entity_type = None
-    current_confidences = []
-    
-    for i, (pred, token, offset, conf) in enumerate(zip(predictions, tokens, offset_mapping, confidences)):
-        # Skip special tokens like [CLS], [SEP]
-        if offset[0] == offset[1]:  # Special token
-            continue
-        
-        tag = idx2tag[pred]
-        
-        # Handle B- (beginning of entity) tags
-        if tag.startswith("B-"):
-            # If we were building an entity, add it to the list
-            if current_entity is not None:
-                avg_confidence = sum(current_confidences) / len(current_confidences)
-                entities.append((current_entity, current_entity_type, avg_confidence))
-            
-            # Start a new entity
-            current_entity = token.replace("##", "")
-            current_entity_type = tag[2:]
-            current_confidences = [conf]
-        
-        # Handle I- (inside entity) tags
-        elif tag.startswith("I-") and current_entity is not None and current_entity_type == tag[2:]:
-            # Continue building the entity
-            current_entity += token.replace("##", "")
-            current_confidences.append(conf)
-        
-        # Handle O (outside) tags
-        else:
-            # If we were building an entity, add it to the list
-            if current_entity is not None:
-                avg_confidence = sum(current_confidences) / len(current_confidences)
-                entities.append((current_entity, current_entity_type, avg_confidence))
-                current_entity = None
-                current_entity_type = None
-                current_confidences = []
-    
-    # Add the last entity if we were building one
-    if current_entity is not None:
-        avg_confidence = sum(current_confidences) / len(current_confidences)
-        entities.append((current_entity, current_entity_type, avg_confidence))
-    
-    # Post-process entities
-    processed_entities = []
-    for entity, entity_type, confidence in entities:
-        # Clean the entity text
-        entity = entity.replace("##", "")
-        # Skip entities with very low confidence
-        if confidence > 0.3:
-            processed_entities.append((entity, entity_type, confidence))
-    
-    return processed_entities
+    return RULES.search_line(line, LINE_RULE_GROUPS)
 
 def extract_entities(text):
     """
@@ -236,50 +137,108 @@ def extract_entities(text):
         dict: Dictionary with structured order information
     """
     # Initialize structured data with confidence
-    structured_data = {
+    structured_data = new_structured_data()
+    
+    # Stop pathological documents (e.g. huge OCR dumps) from holding the worker for seconds
+    try:
+        fill_regex_fields(text, structured_data, regex_deadline(REGEX_TIME_BUDGET_MS))
+    except RegexTimeBudgetExceeded:
+        record_regex_budget_exceeded(REGEX_TIME_BUDGET_MS)
+    
+    return structured_data
+
+def new_structured_data():
+    """Create empty structured order data, with a value, confidence and source per field"""
+    return {
         "customer": {"value": "", "confidence": 0.0, "source": ""},
         "order_id": {"value": "", "confidence": 0.0, "source": ""},
         "line_items": [],
         "shipping_address": {"value": "", "confidence": 0.0, "source": ""}
     }
+
+def record_regex_budget_exceeded(budget_ms):
+    """Log and count a document whose regex extraction ran out of its budget_ms time budget"""
+    logger.warning("Regex extraction exceeded its %.0f ms budget, keeping the fields found so far", budget_ms)
+    increment_regex_budget_exceeded_counter()
+
+def fill_regex_fields(text, structured_data, deadline=None):
+    """
+    Fill structured data with the fields found by the extraction patterns.
+    
+    Args:
+        text (str): Raw text to process
+        structured_data (dict): Structured order information, updated in place
+        deadline (float): Optional output of regex_deadline()
+        
+    Raises:
+        RegexTimeBudgetExceeded: If the deadline passes, with the fields found so far already filled in
+    """
+    # Find where every pattern's keywords start in one scan of the text
+    positions = KEYWORD_SCANNER.scan(text)
+    
+    fill_header_fields(text, structured_data, positions, deadline)
+    fill_line_items(text, structured_data, deadline)
+    fill_fallback_order_id(text, structured_data, positions, deadline)
+    
+    # Add informal line item regex pattern
+    # Example: "12x of HTR-1204 @ $32.00"
+    informal_items = INFORMAL_ITEM_RULES.iter_matches(text, positions, deadline)
+    structured_data["line_items"].extend(informal_item(match) for match in informal_items)
+
+def fill_header_fields(text, structured_data, positions=None, deadline=None):
+    """
+    Fill the order ID, customer, shipping address and table line items found by the
+    document-level patterns. This is the regex pass parser.py runs before NER.
+    
+    Args:
+        text (str): Raw text to process
+        structured_data (dict): Structured order information, updated in place
+        positions (dict): Output of KEYWORD_SCANNER.scan(text) (default: scan it)
+        deadline (float): Optional output of regex_deadline()
+        
+    Raises:
+        RegexTimeBudgetExceeded: If the deadline passes, with the fields found so far already filled in
+    """
+    if positions is None:
+        positions = KEYWORD_SCANNER.scan(text)
     
     # CRITICAL FIX: First pass to check for PO-XXXXX format order ID
-    po_id_match = re.search(r'order\s*(?:id|number|#|)?\s*[\:\#\s]\s*(PO-\d+)', text, re.IGNORECASE)
+    po_id_match = PO_DIRECT_RULES.first_match(text, positions, deadline)
     if po_id_match:
-        structured_data["order_id"]["value"] = po_id_match.group(1).strip().upper()
+        structured_data["order_id"]["value"] = match_value(po_id_match).strip().upper()
         structured_data["order_id"]["confidence"] = 0.99  # Highest confidence for direct PO match
         structured_data["order_id"]["source"] = "regex-po-direct"
-        print(f"Direct PO match found: {structured_data['order_id']['value']}")
+        logger.debug("Direct PO match found: %s", structured_data["order_id"]["value"])
     
     # If no direct PO match, try other order ID patterns
     if not structured_data["order_id"]["value"]:
         # Extract Order ID - General pattern
-        order_id_match = re.search(r'order\s*(?:id|number|#)?\s*[\:\#]?\s*([a-zA-Z0-9\-\_]+)', text, re.IGNORECASE)
+        order_id_match = ORDER_ID_RULES.first_match(text, positions, deadline)
         if order_id_match:
-            structured_data["order_id"]["value"] = order_id_match.group(1).strip().upper()
+            structured_data["order_id"]["value"] = match_value(order_id_match).strip().upper()
             structured_data["order_id"]["confidence"] = 0.95
             structured_data["order_id"]["source"] = "regex"
         
         # Additional pattern for PO or similar prefixed order IDs
-        alt_po_match = re.search(r'(?:PO|order)[\s\-]*(?:id|number|#)?[\s\:\#]*([a-zA-Z0-9\-\_]+)', text, re.IGNORECASE)
-        if alt_po_match and (not structured_data["order_id"]["value"] or len(alt_po_match.group(1)) > len(structured_data["order_id"]["value"])):
-            structured_data["order_id"]["value"] = alt_po_match.group(1).strip().upper()
+        alt_po_match = PREFIXED_ORDER_ID_RULES.first_match(text, positions, deadline)
+        if alt_po_match and (not structured_data["order_id"]["value"] or len(match_value(alt_po_match)) > len(structured_data["order_id"]["value"])):
+            structured_data["order_id"]["value"] = match_value(alt_po_match).strip().upper()
             structured_data["order_id"]["confidence"] = 0.98
             structured_data["order_id"]["source"] = "regex-po"
     
     # Extract Customer
-    customer_match = re.search(r'customer\s*[\:\#]?\s*([a-zA-Z0-9\s]+(?:$|\n))', text, re.IGNORECASE)
+    customer_match = CUSTOMER_RULES.first_match(text, positions, deadline)
     if customer_match:
-        structured_data["customer"]["value"] = customer_match.group(1).strip()
+        structured_data["customer"]["value"] = (match_value(customer_match) or "").strip()
         structured_data["customer"]["confidence"] = 0.95
         structured_data["customer"]["source"] = "regex"
     
     # Enhanced Shipping Address extraction with multi-line support
     # First try to find a shipping address section
-    ship_to_section = re.search(r'ship\s*to\s*:?\s*([\s\S]+?)(?=\n\s*\n|\n[A-Za-z]+\s*:|\Z)', text, re.IGNORECASE)
+    ship_to_section = SHIP_TO_SECTION_RULES.first_match(text, positions, deadline)
     if ship_to_section:
         # Get all lines from the Ship To section
-        address_lines = ship_to_section.group(1).strip().split('\n')
+        address_lines = match_value(ship_to_section).strip().split('\n')
         
         # Skip the first line if it's just a company name (already captured in customer)
         if len(address_lines) > 1 and structured_data["customer"]["value"] and address_lines[0].strip() == structured_data["customer"]["value"]:
@@ -290,10 +249,10 @@ def extract_entities(text):
         for line in address_lines:
             line_strip = line.strip()
             # Only include lines that start with capital letters or numbers
-            if line_strip and re.match(r"^[A-Z0-9]", line_strip):
+            if line_strip and ADDRESS_LINE_START.match(line_strip):
                 filtered_address_lines.append(line_strip)
             # Stop at indicators like "Ref #:" or "Thanks"
-            elif line_strip.startswith(("Ref #:", "Thanks")):
+            elif line_strip.startswith(ADDRESS_STOP_LINES):
                 break
         
         # Join the filtered lines
@@ -303,19 +262,19 @@ def extract_entities(text):
         structured_data["shipping_address"]["source"] = "regex-multi"
     else:
         # Fallback to basic address pattern if no section found
-        address_match = re.search(r'(?:shipping|delivery)?\s*address\s*[\:\#]?\s*([a-zA-Z0-9\s\,\-\.]+(?:$|\n))', text, re.IGNORECASE)
+        address_match = ADDRESS_RULES.first_match(text, positions, deadline)
         if address_match:
             # Extract the address and filter it
-            address_text = address_match.group(1).strip()
+            address_text = (match_value(address_match) or "").strip()
             address_lines = address_text.split('\n')
             
             # Filter to only include lines starting with capital letters or numbers
             filtered_address_lines = []
             for line in address_lines:
                 line_strip = line.strip()
-                if line_strip and re.match(r"^[A-Z0-9]", line_strip):
+                if line_strip and ADDRESS_LINE_START.match(line_strip):
                     filtered_address_lines.append(line_strip)
-                elif line_strip.startswith(("Ref #:", "Thanks")):
+                elif line_strip.startswith(ADDRESS_STOP_LINES):
                     break
                 
             structured_data["shipping_address"]["value"] = ', '.join(filtered_address_lines)
@@ -325,228 +284,183 @@ def extract_entities(text):
     # Enhanced SKU extraction
     # Extract line items using regex patterns
     # Look for Part #XXX-XXXX pattern
-    part_matches = re.finditer(r'(?:part|item)\s*\#([a-zA-Z0-9\-]+)\s*\|\s*(?:qty|quantity)\s*:\s*(\d+)\s*\|\s*(?:(?:unit\s*)?price)\s*:\s*\$?(\d+(?:\.\d+)?)', text, re.IGNORECASE)
+    part_matches = PART_ITEM_RULES.iter_matches(text, positions, deadline)
     
-    for match in part_matches:
-        sku = match.group(1).strip()
-        quantity = int(match.group(2))
-        price = float(match.group(3))
-        
-        line_item = {
-            "sku": {"value": sku, "confidence": 0.95, "source": "regex-part"},
-            "quantity": {"value": quantity, "confidence": 0.95, "source": "regex"},
-            "price": {"value": price, "confidence": 0.95, "source": "regex"}
-        }
-        
-        structured_data["line_items"].append(line_item)
+    structured_data["line_items"].extend(part_row_item(match) for match in part_matches)
     
     # If we didn't find line items with the enhanced pattern, try the original pattern
     if not structured_data["line_items"]:
-        sku_matches = re.finditer(r'(?:sku|item|product)\s*:?\s*([a-zA-Z0-9\-]+).*?(?:qty|quantity)\s*:?\s*(\d+).*?(?:price)\s*:?\s*\$?(\d+(?:\.\d+)?)', text, re.IGNORECASE)
-        
-        for match in sku_matches:
-            sku = match.group(1).strip()
-            quantity = int(match.group(2))
-            price = float(match.group(3))
-            
-            line_item = {
-                "sku": {"value": sku, "confidence": 0.9, "source": "regex"},
-                "quantity": {"value": quantity, "confidence": 0.9, "source": "regex"},
-                "price": {"value": price, "confidence": 0.9, "source": "regex"}
-            }
-            
-            structured_data["line_items"].append(line_item)
+        sku_matches = SKU_ITEM_RULES.iter_matches(text, positions, deadline)
+        structured_data["line_items"].extend(sku_row_item(match) for match in sku_matches)
+
+def fill_line_items(text, structured_data, deadline=None):
+    """
+    Add the line items assembled from consecutive SKU, quantity and price lines.
     
+    Args:
+        text (str): Raw text to process
+        structured_data (dict): Structured order information, updated in place
+        deadline (float): Optional output of regex_deadline()
+        
+    Raises:
+        RegexTimeBudgetExceeded: If the deadline passes, with the items found so far already added
+    """
     # Process the text line by line to extract structured line items
-    current_line_item = None
+    assembler = LineItemAssembler()
     
-    for line in text.splitlines():
-        line = line.strip()
-        
-        # Skip empty lines
-        if not line:
-            continue
-        
-        # Check if the line could be part of a line item
-        sku_match = re.search(r'(?:sku|part|item)\s*(?:\#|number)?[:\s]*\s*([a-zA-Z0-9\-]+)', line, re.IGNORECASE)
-        qty_match = re.search(r'(?:qty|quantity)[:\s]*\s*(\d+)', line, re.IGNORECASE)
-        price_match = re.search(r'(?:price|cost)[:\s]*\s*\$?(\d+(?:\.\d+)?)', line, re.IGNORECASE)
-        
-        # Additional regex pattern for line items with Part #XXX-XXXX format
-        part_match = re.search(r'(?:part|item)\s*\#([a-zA-Z0-9\-]+)', line, re.IGNORECASE)
+    # Skip empty lines
+    lines = [line for line in (line.strip() for line in text.splitlines()) if line]
+    
+    # Check if each line could be part of a line item
+    line_matches = RULES.search_lines(lines, LINE_RULE_GROUPS)
+    
+    for line_number, matches in enumerate(line_matches):
+        if line_number % 256 == 0:
+            check_deadline(deadline)
         
-        # If we found either a sku, qty, or price, we might be in a line item
-        if sku_match or qty_match or price_match or part_match:
-            # If we're not already building a line item, start a new one
-            if not current_line_item:
-                current_line_item = {}
-            
-            # Update the line item with any new information
-            if sku_match and "sku" not in current_line_item:
-                current_line_item["sku"] = {
-                    "value": sku_match.group(1),
-                    "confidence": 0.8,
-                    "source": "regex-line"
-                }
-            elif part_match and "sku" not in current_line_item:
-                current_line_item["sku"] = {
-                    "value": part_match.group(1),
-                    "confidence": 0.9,
-                    "source": "regex-part"
-                }
-            
-            if qty_match and "quantity" not in current_line_item:
-                current_line_item["quantity"] = {
-                    "value": int(qty_match.group(1)),
-                    "confidence": 0.8,
-                    "source": "regex-line"
-                }
-            
-            if price_match and "price" not in current_line_item:
-                current_line_item["price"] = {
-                    "value": float(price_match.group(1)),
-                    "confidence": 0.8,
-                    "source": "regex-line"
-                }
-            
-            # If we have a complete line item, add it to our results and start a new one
-            if "sku" in current_line_item and "quantity" in current_line_item and "price" in current_line_item:
-                structured_data["line_items"].append(current_line_item)
-                current_line_item = None
-        else:
-            # This line doesn't contain recognizable line item data
-            # If we were building a line item, finish it up
-            if current_line_item and "sku" in current_line_item:
-                # Add defaults for missing fields
-                if "quantity" not in current_line_item:
-                    current_line_item["quantity"] = {
-                        "value": 1,
-                        "confidence": 0.5,
-                        "source": "default",
-                        "warning": True
-                    }
-                if "price" not in current_line_item:
-                    current_line_item["price"] = {
-                        "value": 0.0,
-                        "confidence": 0.5,
-                        "source": "default",
-                        "warning": True
-                    }
-                structured_data["line_items"].append(current_line_item)
-                current_line_item = None
-    
-    # Add the last line item if it's not empty and has at least a SKU
-    if current_line_item and "sku" in current_line_item:
-        if "quantity" not in current_line_item:
-            current_line_item["quantity"] = {
-                "value": 1,
-                "confidence": 0.5,
-                "source": "default",
-                "warning": True
-            }
-        if "price" not in current_line_item:
-            current_line_item["price"] = {
-                "value": 0.0,
-                "confidence": 0.5,
-                "source": "default",
-                "warning": True
-            }
-        if current_line_item not in structured_data["line_items"]:
-            structured_data["line_items"].append(current_line_item)
+        item = assembler.feed(*matches)
+        if item:
+            structured_data["line_items"].append(item)
     
+    # Add the last line item if it has at least a SKU
+    # (an identical earlier item is dropped by postprocess_line_items)
+    item = assembler.finish()
+    if item:
+        structured_data["line_items"].append(item)
+
+def fill_fallback_order_id(text, structured_data, positions=None, deadline=None):
+    """
+    Try the fallback order ID patterns when no order ID (or just "ORDER") was found.
+    
+    Args:
+        text (str): Raw text to process
+        structured_data (dict): Structured order information, updated in place
+        positions (dict): Output of KEYWORD_SCANNER.scan(text) (default: scan it)
+        deadline (float): Optional output of regex_deadline()
+        
+    Raises:
+        RegexTimeBudgetExceeded: If the deadline passes
+    """
     # Override "ORDER" with regex extraction if needed
     if structured_data["order_id"]["value"] == "ORDER" or structured_data["order_id"]["value"] == "":
-        print("Attempting to extract order ID with additional fallback patterns...")
+        logger.debug("Attempting to extract order ID with additional fallback patterns")
+        if positions is None:
+            positions = KEYWORD_SCANNER.scan(text)
         
         # Try different patterns to extract PO numbers
-        po_patterns = [
-            r'Order\s*ID[:\s]*([A-Z0-9\-]+)',  # Order ID: ABC-1234
-            r'PO\s*(?:ID|Number|#)?[:\s]*([A-Z0-9\-]+)',  # PO Number: ABC-1234
-            r'(?:Order|Purchase)\s*(?:Number|#)[:\s]*([A-Z0-9\-]+)',  # Order Number: ABC-1234
-            r'(?:Order|PO)[:\s]*([A-Z0-9\-]+)',  # Order: ABC-1234
-            r'(?:Order|PO)[:\s\#]*([A-Z0-9\-]+)',  # PO# ABC-1234
-            r'(?<![a-zA-Z])(?:PO|ORDER)[:\s\-]*([A-Z0-9\-]+)',  # ORDER-ABC-1234
-            r'(?:^|\n)(?:PO|Order)[\:\s\-\#]*([A-Za-z0-9\-]+)',  # Beginning of line: Order ABC-1234
-            r'Ref\s*#[:\s]*([A-Z0-9\-]+)'  # Ref #: ABC-1234
-        ]
-        
-        for pattern in po_patterns:
-            order_id_match = re.search(pattern, text, re.IGNORECASE)
+        for rule in FALLBACK_ORDER_ID_RULES:
+            order_id_match = rule.first_match(text, positions, deadline)
             if order_id_match:
-                new_order_id = order_id_match.group(1).strip()
-                print(f"Found order ID: '{new_order_id}' using pattern: {pattern}")
+                new_order_id = match_value(order_id_match).strip()
+                logger.debug("Found order ID: '%s' using pattern: %s", new_order_id, rule.pattern.pattern)
                 structured_data["order_id"]["value"] = new_order_id
                 structured_data["order_id"]["source"] = "regex-fallback"
                 structured_data["order_id"]["confidence"] = 0.9
                 break
-    
-    # Add informal line item regex pattern
-    # Example: "12x of HTR-1204 @ $32.00"
-    informal_items = re.findall(r"(\d+)[xX]\s+of\s+([A-Z0-9\-]+)\s+@\s+\$?(\d+\.?\d*)", text, re.IGNORECASE)
-    for qty, sku, price in informal_items:
-        # Calculate dynamic confidence based on SKU complexity
-        # Longer SKUs with mixed characters are more likely to be valid
-        sku_complexity = min(0.95, 0.75 + (len(sku.strip()) * 0.02) + (0.05 if re.search(r'[A-Z]', sku) and re.search(r'[0-9]', sku) else 0))
-        
-        # Create line item from informal pattern
-        line_item = {
-            "sku": {"value": sku.strip(), "confidence": sku_complexity, "source": "regex-informal"},
-            "quantity": {"value": int(qty), "confidence": sku_complexity, "source": "regex-informal"},
-            "price": {"value": float(price), "confidence": sku_complexity, "source": "regex-informal"}
-        }
-        structured_data["line_items"].append(line_item)
-        print(f"Found informal line item: {qty}x of {sku} @ ${price} (confidence: {sku_complexity:.2f})")
-    
-    return structured_data
 
-def parse_order_document(text):
+def flatten_structured_data(structured_data):
     """
-    Main function to parse an order document text.
+    Flatten structured order data into the output format, with confidence scores.
     
     Args:
-        text (str): Raw text from a document
+        structured_data (dict): Structured order data with per-field values, confidences and sources
         
     Returns:
-        dict: Structured order data
+        dict: Flat order data with "confidence" and "extraction_details"
     """
-    print("\n===== DEBUG: Starting parse_order_document (PARSER_V2) =====")
+    flat_output = {
+        "customer": structured_data["customer"]["value"],
+        "order_id": structured_data["order_id"]["value"],
+        "shipping_address": structured_data["shipping_address"]["value"],
+        "line_items": []
+    }
     
-    # Check if we should use LLM parser directly
-    try:
-        from app.llm_fallback import USE_LLM_PARSER, parse_with_llm
-        
-        # Get confidence threshold from environment (default 0.6)
-        CONFIDENCE_THRESHOLD = float(os.environ.get("CONFIDENCE_THRESHOLD", "0.6"))
+    # Flatten line items with a final safety check
+    for item in structured_data["line_items"]:
+        sku = item.sku.value
         
-        if USE_LLM_PARSER:
-            print("USE_LLM_PARSER flag is enabled, using LLM parser directly")
-            increment_llm_forced_counter()  # Track forced LLM usage
-            return parse_with_llm(text)
-    except ImportError:
-        print("LLM fallback module not available, continuing with standard parsing")
-        CONFIDENCE_THRESHOLD = 0.6  # Default if module not available
-    except ValueError:
-        print("Invalid CONFIDENCE_THRESHOLD value in environment, using default 0.6")
-        CONFIDENCE_THRESHOLD = 0.6  # Default if value is invalid
+        # Skip banned SKUs in final flattening step
+        if sku in OUTPUT_BANNED_SKUS:
+            logger.debug("Final safety check blocked banned SKU: '%s'", sku)
+            continue
+            
+        # Skip single character SKUs 
+        if len(sku) <= 1:
+            logger.debug("Final safety check blocked single character SKU: '%s'", sku)
+            continue
+            
+        flat_output["line_items"].append(item.to_flat())
     
-    # Extract structured data from text
-    structured_data = extract_entities(text)
+    # Calculate confidence scores
+    confidence = {
+        "customer": structured_data["customer"]["confidence"],
+        "order_id": structured_data["order_id"]["confidence"],
+        "shipping_address": structured_data["shipping_address"]["confidence"],
+        "line_items": sum(item.sku.confidence for item in structured_data["line_items"]) / max(1, len(structured_data["line_items"]))
+    }
     
-    print(f"Before postprocessing: {len(structured_data['line_items'])} line items")
-    print("Calling postprocess_line_items...")
+    # Add overall confidence - using weighted calculation for more accuracy
+    confidence["overall"] = overall_confidence(confidence)
     
-    # Deduplicate and filter line items
-    structured_data["line_items"] = postprocess_line_items(structured_data["line_items"])
+    # Add confidence scores to the output
+    flat_output["confidence"] = confidence
     
-    print(f"After postprocessing: {len(structured_data['line_items'])} line items")
+    # Add detailed extraction data
+    flat_output["extraction_details"] = {
+        "customer": structured_data["customer"],
+        "order_id": structured_data["order_id"],
+        "shipping_address": structured_data["shipping_address"],
+        "line_items": [item.to_dict() for item in structured_data["line_items"]]
+    }
+    
+    return flat_output
+
+def clean_header_fields(structured_data, text):
+    """
+    Normalize the order ID, customer and shipping address of a document, in place.
+    
+    Flags unsure fields, trims line items off the shipping address, and falls
+    back to informal customer references when no customer was found.
+    
+    Args:
+        structured_data (dict): Structured order data, as from extract_entities()
+        text (str): Document text the fields were read from
+    """
+    normalize_header_fields(structured_data)
     
+    # Add fallback for customer name based on "Ship to" or "warehouse:"
+    if not structured_data["customer"]["value"] or structured_data["customer"]["confidence"] < 0.7:
+        # Look for informal customer references like "Ship to" or "warehouse:"
+        ship_to_match = SHIP_TO_CUSTOMER_RULES.first_match(text)
+        warehouse_match = WAREHOUSE_CUSTOMER_RULES.first_match(text)
+        
+        if ship_to_match:
+            structured_data["customer"]["value"] = (match_value(ship_to_match) or "").strip()
+            structured_data["customer"]["confidence"] = 0.8
+            structured_data["customer"]["source"] = "regex-ship-to"
+            logger.debug("Found customer name from 'Ship to': %s", structured_data["customer"]["value"])
+        elif warehouse_match:
+            structured_data["customer"]["value"] = (match_value(warehouse_match) or "").strip()
+            structured_data["customer"]["confidence"] = 0.75
+            structured_data["customer"]["source"] = "regex-warehouse"
+            logger.debug("Found customer name from warehouse reference: %s", structured_data["customer"]["value"])
+
+def normalize_header_fields(structured_data):
+    """
+    Normalize whitespace in the order ID, customer and shipping address, flag
+    unsure fields and trim line items off the shipping address, in place.
+    This is the header cleanup parser.py shares.
+    
+    Args:
+        structured_data (dict): Structured order data, as from extract_entities()
+    """
     # Normalize whitespace in text fields
     for field in ["customer", "order_id", "shipping_address"]:
         if structured_data[field]["value"]:
             # Normalize whitespace: replace multiple spaces with single space
             value = re.sub(r'\s+', ' ', structured_data[field]["value"])
-            # Remove trailing commas and whitespace
-            value = re.sub(r'[,\s]+$', '', value)
+            # Remove trailing commas and whitespace (only single spaces are left)
+            value = value.rstrip(", ")
             structured_data[field]["value"] = value
     
     # Flag and exclude fields with very low confidence
@@ -557,40 +471,26 @@ def parse_order_document(text):
     # Extract shipping address up to Line Items section
     if structured_data["shipping_address"]["value"]:
         address = structured_data["shipping_address"]["value"]
-        print(f"Original shipping address: '{address}'")
-        
-        # Define patterns that indicate the beginning of line items
-        line_item_indicators = [
-            "Line Items:", 
-            "Items:", 
-            "Products:", 
-            "Order Details:", 
-            "Part #", 
-            "SKU", 
-            "Quantity",
-            "Item #",
-            "Ref #:",  # Added indicator for "Ref #"
-            "Thanks"   # Added indicator for "Thanks"
-        ]
+        logger.debug("Original shipping address: '%s'", address)
         
         # Find where any line item indicator starts
         cutoff_idx = len(address)
-        for indicator in line_item_indicators:
+        for indicator in LINE_ITEM_INDICATORS:
             idx = address.find(indicator)
             if idx > 0 and idx < cutoff_idx:
                 cutoff_idx = idx
-                print(f"Found line item indicator '{indicator}' at position {idx}")
+                logger.debug("Found line item indicator '%s' at position %d", indicator, idx)
         
         # Also check for numbered items that might indicate line items
         numbered_item_idx = re.search(r',\s*\d+\.', address)
         if numbered_item_idx and numbered_item_idx.start() < cutoff_idx:
             cutoff_idx = numbered_item_idx.start()
-            print(f"Found numbered item indicator at position {cutoff_idx}")
+            logger.debug("Found numbered item indicator at position %d", cutoff_idx)
             
         # Trim address if line items were found
         if cutoff_idx < len(address):
             address = address[:cutoff_idx].strip()
-            print(f"Trimmed address at index {cutoff_idx}")
+            logger.debug("Trimmed address at index %d", cutoff_idx)
         
         # Additional filtering for properly formatted address lines
         address_parts = [part.strip() for part in address.split(',')]
@@ -601,111 +501,85 @@ def parse_order_document(text):
             if part and re.match(r"^[A-Z0-9]", part):
                 filtered_parts.append(part)
             # Stop at blank lines or informal phrases
-            elif part.lower().startswith(("our warehouse", "your warehouse", "ref #", "thanks", "reference")):
-                print(f"Stopping at informal phrase: '{part}'")
+            elif part.lower().startswith(ADDRESS_STOP_PHRASES):
+                logger.debug("Stopping at informal phrase: '%s'", part)
                 break
         
         # Cleanup: remove trailing commas and normalize whitespace
         address = ', '.join(filtered_parts)
         address = re.sub(r',\s*$', '', address)
         address = re.sub(r'\s+', ' ', address).strip()
-        print(f"Cleaned shipping address: '{address}'")
+        logger.debug("Cleaned shipping address: '%s'", address)
         
         structured_data["shipping_address"]["value"] = address
+
+@sample_debug
+def parse_order_document(text):
+    """
+    Main function to parse an order document text.
     
-    # Add fallback for customer name based on "Ship to" or "warehouse:"
-    if not structured_data["customer"]["value"] or structured_data["customer"]["confidence"] < 0.7:
-        # Look for informal customer references like "Ship to" or "warehouse:"
-        ship_to_match = re.search(r'ship\s+to\s*[:\s]*([A-Za-z0-9\s\,]+?)(?=\n|\r|$)', text, re.IGNORECASE)
-        warehouse_match = re.search(r'(?:our|your)\s+warehouse[:\s]*([A-Za-z0-9\s\,]+?)(?=\n|\r|$)', text, re.IGNORECASE)
+    Args:
+        text (str): Raw text from a document
         
-        if ship_to_match:
-            structured_data["customer"]["value"] = ship_to_match.group(1).strip()
-            structured_data["customer"]["confidence"] = 0.8
-            structured_data["customer"]["source"] = "regex-ship-to"
-            print(f"Found customer name from 'Ship to': {structured_data['customer']['value']}")
-        elif warehouse_match:
-            structured_data["customer"]["value"] = warehouse_match.group(1).strip()
-            structured_data["customer"]["confidence"] = 0.75
-            structured_data["customer"]["source"] = "regex-warehouse"
-            print(f"Found customer name from warehouse reference: {structured_data['customer']['value']}")
-    
-    # Flatten the output for backward compatibility
-    flat_output = {
-        "customer": structured_data["customer"]["value"],
-        "order_id": structured_data["order_id"]["value"],
-        "shipping_address": structured_data["shipping_address"]["value"],
-        "line_items": []
-    }
-    
-    # FINAL SAFETY CHECK: Define banned SKUs
-    banned_skus = ['s', 'S', 'x', 'X', '1', '2', '12', '123', '0']
+    Returns:
+        dict: Structured order data
+    """
+    logger.debug("Starting parse_order_document (PARSER_V2)")
     
-    # Flatten line items with a final safety check
-    for item in structured_data["line_items"]:
-        sku = item["sku"]["value"]
+    # Check if we should use LLM parser directly
+    try:
+        from app.llm_fallback import USE_LLM_PARSER, parse_with_llm
         
-        # Skip banned SKUs in final flattening step
-        if sku in banned_skus:
-            print(f"FINAL SAFETY: Blocked banned SKU: '{sku}' from output")
-            continue
-            
-        # Skip single character SKUs 
-        if len(sku) <= 1:
-            print(f"FINAL SAFETY: Blocked single character SKU: '{sku}' from output")
-            continue
-            
-        flat_item = {
-            "sku": sku,
-            "quantity": item["quantity"]["value"],
-            "price": item["price"]["value"]
-        }
-        flat_output["line_items"].append(flat_item)
-    
-    print(f"Final line items count after safety check: {len(flat_output['line_items'])}")
-    print("Final output SKUs:")
-    for i, item in enumerate(flat_output["line_items"]):
-        print(f"Final Item {i}: SKU='{item['sku']}'")
+        # Get confidence threshold from environment (default 0.6)
+        CONFIDENCE_THRESHOLD = float(os.environ.get("CONFIDENCE_THRESHOLD", "0.6"))
+        
+        if USE_LLM_PARSER:
+            logger.info("USE_LLM_PARSER flag is enabled, using LLM parser directly")
+            increment_llm_forced_counter()  # Track forced LLM usage
+            return parse_with_llm(text)
+    except ImportError:
+        logger.warning("LLM fallback module not available, continuing with standard parsing")
+        CONFIDENCE_THRESHOLD = 0.6  # Default if module not available
+    except ValueError:
+        logger.warning("Invalid CONFIDENCE_THRESHOLD value in environment, using default 0.6")
+        CONFIDENCE_THRESHOLD = 0.6  # Default if value is invalid
     
-    # Calculate confidence scores
-    confidence = {
-        "customer": structured_data["customer"]["confidence"],
-        "order_id": structured_data["order_id"]["confidence"],
-        "shipping_address": structured_data["shipping_address"]["confidence"],
-        "line_items": sum(item["sku"]["confidence"] for item in structured_data["line_items"]) / max(1, len(structured_data["line_items"]))
-    }
+    # Documents in a known vendor layout are read directly, without the regex cascade, NER or LLM fallback
+    template = TEMPLATES.match(text)
+    if template:
+        structured_data = template.extract(text)
+        if structured_data:
+            logger.debug("Read with vendor template '%s'", template.name)
+            increment_template_counter(template.name)
+            flat_output = flatten_structured_data(structured_data)
+            flat_output["source"] = "template"
+            return flat_output
+        logger.info("Vendor template '%s' matched the layout but couldn't read the document, "
+                    "using the generic parser", template.name)
+        increment_template_fallthrough_counter(template.name)
     
-    # Add overall confidence - using weighted calculation for more accuracy
-    # Fields importance: order_id > line_items > customer > shipping_address
-    weights = {
-        "order_id": 1.5,
-        "line_items": 1.3,
-        "customer": 1.0,
-        "shipping_address": 0.8
-    }
+    # Extract structured data from text
+    structured_data = extract_entities(text)
     
-    # Calculate weighted confidence
-    weighted_sum = sum(confidence[field] * weights[field] for field in confidence)
-    total_weight = sum(weights.values())
+    logger.debug("Before postprocessing: %d line items", len(structured_data["line_items"]))
     
-    # Adjust confidence based on completeness
-    completeness_factor = sum(1 for field in confidence if confidence[field] > 0.6) / len(confidence)
+    # Deduplicate and filter line items
+    structured_data["line_items"] = postprocess_line_items(structured_data["line_items"])
     
-    # Final confidence calculation
-    confidence["overall"] = (weighted_sum / total_weight) * (0.7 + (completeness_factor * 0.3))
+    logger.debug("After postprocessing: %d line items", len(structured_data["line_items"]))
     
-    # Add confidence scores to the output
-    flat_output["confidence"] = confidence
+    clean_header_fields(structured_data, text)
     
-    # Add detailed extraction data
-    flat_output["extraction_details"] = {
-        "customer": structured_data["customer"],
-        "order_id": structured_data["order_id"],
-        "shipping_address": structured_data["shipping_address"],
-        "line_items": structured_data["line_items"]
-    }
+    # Flatten the output for backward compatibility
+    flat_output = flatten_structured_data(structured_data)
+    confidence = flat_output["confidence"]
     
-    print("===== DEBUG: Finished parse_order_document (PARSER_V2) =====\n")
+    if debug_enabled(logger):
+        logger.debug("Final line items count after safety check: %d", len(flat_output["line_items"]))
+        for i, item in enumerate(flat_output["line_items"]):
+            logger.debug("Final Item %d: SKU='%s'", i, item["sku"])
+    
+    logger.debug("Finished parse_order_document (PARSER_V2)")
     
     # Check if we should use LLM fallback based on confidence threshold
     try:
@@ -714,34 +588,147 @@ def parse_order_document(text):
         from app.parser_stats import increment_llm_fallback_counter
         
         if confidence["overall"] < CONFIDENCE_THRESHOLD:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"LLM fallback parser used due to low confidence: {confidence['overall']:.2f} (threshold: {CONFIDENCE_THRESHOLD})")
+            logger.info("LLM fallback parser used due to low confidence: %.2f (threshold: %s)",
+                        confidence["overall"], CONFIDENCE_THRESHOLD)
             
             # Call LLM parser
             llm_result = parse_with_llm(text)
             
             # Use LLM result if it was successful (no error in result)
             if llm_result and "error" not in llm_result:
-                print(f"Using LLM fallback parser result due to low confidence ({confidence['overall']:.2f} < {CONFIDENCE_THRESHOLD})")
+                logger.info("Using LLM fallback parser result due to low confidence (%.2f < %s)",
+                            confidence["overall"], CONFIDENCE_THRESHOLD)
                 increment_llm_fallback_counter()  # Track LLM fallback usage
                 return llm_result
             else:
                 # Log the error but use original result
-                print(f"LLM fallback parser failed. Using original result despite low confidence.")
+                logger.warning("LLM fallback parser failed. Using original result despite low confidence.")
                 if llm_result and "error" in llm_result:
                     error_msg = llm_result["error"]
                     if "rate limit" in error_msg.lower() or "429" in error_msg:
-                        logger.warning(f"OpenAI API rate limit error: {error_msg}. Continuing with standard parser results.")
+                        logger.warning("OpenAI API rate limit error: %s. Continuing with standard parser results.", error_msg)
                     else:
-                        logger.error(f"LLM fallback error: {error_msg}")
+                        logger.error("LLM fallback error: %s", error_msg)
     except ImportError:
-        print("LLM fallback module not available for confidence check")
+        logger.warning("LLM fallback module not available for confidence check")
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error using LLM fallback parser: {str(e)}")
+        logger.error("Error using LLM fallback parser: %s", str(e))
     
     # If we reach here, we're using NER/regex parser results
     increment_ner_counter()  # Track NER usage
-    return flat_output 
\ No newline at end of file
+    return flat_output
+
+def iter_line_items(lines):
+    """
+    Read line items from lines of text as they come, one line at a time.
+    
+    Finds the items of parse_order_document() that fit on one line (part and SKU
+    tables, informal items) plus the items spread over consecutive lines, in
+    document order. Items aren't validated or deduplicated.
+    
+    Args:
+        lines (iterable): Lines of text
+        
+    Yields:
+        LineItem: Line items, as soon as the line that completes them is read
+    """
+    assembler = LineItemAssembler()
+    # Skip empty lines; the rule search reads its own copy of the stream one line ahead at most
+    lines, search = itertools.tee(line for line in (line.strip() for line in lines) if line)
+    
+    for line, matches in zip(lines, RULES.search_lines(search, STREAM_RULE_GROUPS)):
+        part_row, sku_row, informal_row = matches[4:]
+        # Rows matched by the table patterns come first, so that their more confident
+        # items are kept over the same items built by the assembler
+        if part_row:
+            yield from (part_row_item(match) for match in PART_ITEM_RULES.iter_matches(line))
+        elif sku_row:
+            yield from (sku_row_item(match) for match in SKU_ITEM_RULES.iter_matches(line))
+        if informal_row:
+            yield from (informal_item(match) for match in INFORMAL_ITEM_RULES.iter_matches(line))
+        
+        item = assembler.feed(*matches[:4])
+        if item:
+            yield item
+    
+    item = assembler.finish()
+    if item:
+        yield item
+
+def parse_order_stream(lines, header_lines=None, dedup_window=None):
+    """
+    Parse an order document read line by line, yielding results as they're found.
+    
+    For very large documents (EDI dumps, long PDFs) that shouldn't be held in memory
+    whole. The order ID, customer and shipping address are read from the first
+    header_lines lines only; line items are then validated and yielded as the rest
+    of the document is read, so memory stays flat however long it is. Vendor
+    templates and the LLM fallback aren't used in this mode.
+    
+    Args:
+        lines (iterable): Lines of text, e.g. from ocr.iter_text_lines()
+        header_lines (int): Lines read ahead for the header fields, default STREAM_HEADER_LINES
+        dedup_window (int): Recent line items a duplicate is looked for in (0 = all),
+                            default STREAM_DEDUP_WINDOW
+        
+    Yields:
+        dict: {"type": "header"} with the order ID, customer, shipping address and their
+              extraction details, then {"type": "line_item"} with the SKU, quantity, price
+              and extraction details of each valid line item, then {"type": "summary"}
+              with the line item count and the confidence scores
+    """
+    header_lines = STREAM_HEADER_LINES if header_lines is None else header_lines
+    dedup_window = STREAM_DEDUP_WINDOW if dedup_window is None else dedup_window
+    logger.debug("Starting parse_order_stream (PARSER_V2)")
+    
+    # Header fields, from a bounded lookahead
+    lines = iter(lines)
+    head = list(itertools.islice(lines, header_lines))
+    head_text = "\n".join(line.rstrip("\r\n") for line in head)
+    structured_data = extract_entities(head_text)
+    clean_header_fields(structured_data, head_text)
+    header_fields = ("customer", "order_id", "shipping_address")
+    header = {"type": "header"}
+    header.update((field, structured_data[field]["value"]) for field in header_fields)
+    header["extraction_details"] = {field: structured_data[field] for field in header_fields}
+    yield header
+    
+    # Line items, validated and deduplicated on the fly
+    valid_skus = {}
+    seen = set()
+    recent = collections.deque()
+    count = 0
+    confidence_sum = 0.0
+    for item in iter_line_items(itertools.chain(head, lines)):
+        sku = item.sku.value
+        is_valid = valid_skus.get(sku)
+        if is_valid is None:
+            # Keep the SKU cache as bounded as the duplicate window
+            if dedup_window and len(valid_skus) >= dedup_window:
+                valid_skus.clear()
+            is_valid = valid_skus[sku] = is_valid_sku(sku) and sku not in OUTPUT_BANNED_SKUS
+        if not is_valid:
+            continue
+        
+        key = item.key()
+        if key in seen:
+            continue
+        seen.add(key)
+        if dedup_window:
+            recent.append(key)
+            if len(recent) > dedup_window:
+                seen.discard(recent.popleft())
+        
+        count += 1
+        confidence_sum += item.sku.confidence
+        record = {"type": "line_item"}
+        record.update(item.to_flat())
+        record["extraction_details"] = item.to_dict()
+        yield record
+    
+    confidence = {field: structured_data[field]["confidence"] for field in header_fields}
+    confidence["line_items"] = confidence_sum / max(1, count)
+    confidence["overall"] = overall_confidence(confidence)
+    logger.debug("Finished parse_order_stream (PARSER_V2) with %d line items", count)
+    increment_ner_counter()  # Track NER usage
+    yield {"type": "summary", "line_items": count, "confidence": confidence}
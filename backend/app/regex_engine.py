@@ -0,0 +1,186 @@
+import re
+import time
+
+class RegexTimeBudgetExceeded(Exception):
+    """Raised when the regex extraction of a document runs past its time budget"""
+
+def regex_deadline(budget_ms):
+    """
+    Get the deadline for a document's regex extraction.
+
+    Args:
+        budget_ms (float): Time budget in milliseconds (0 or less for no budget)
+
+    Returns:
+        float: time.perf_counter() value to stop at, or None for no budget
+    """
+    if budget_ms <= 0:
+        return None
+    return time.perf_counter() + budget_ms / 1000
+
+def check_deadline(deadline):
+    """
+    Stop the extraction if its deadline has passed.
+
+    Args:
+        deadline (float): Output of regex_deadline()
+
+    Raises:
+        RegexTimeBudgetExceeded: If the deadline has passed
+    """
+    if deadline is not None and time.perf_counter() > deadline:
+        raise RegexTimeBudgetExceeded("Regex extraction exceeded its time budget")
+
+class KeywordScanner:
+    """
+    Finds where every keyword of a set of extraction patterns starts, in one
+    pass over the text.
+
+    Each extraction pattern is then only tried at the starts of its own
+    keywords (see first_match() and iter_matches()) instead of searching the
+    whole text once per pattern.
+    """
+
+    def __init__(self, keywords):
+        """
+        Args:
+            keywords (dict): Keyword name -> literal keyword (lowercase, matched case-insensitively).
+                             No keyword may be a prefix of another.
+        """
+        for name, literal in keywords.items():
+            if any(other != literal and other.startswith(literal) for other in keywords.values()):
+                raise ValueError(f"Keyword '{name}' is a prefix of another keyword")
+
+        self.names = list(keywords)
+        self.literals = {literal: name for name, literal in keywords.items()}
+        self.folded = [(name, re.compile(re.escape(literal), re.IGNORECASE)) for name, literal in keywords.items()]
+
+        # Only literals, so the regex engine can skip ahead to the possible first characters
+        combined = "|".join(re.escape(literal) for literal in keywords.values())
+        # ASCII text is lowercased and scanned case-sensitively, which is several times
+        # faster than IGNORECASE and finds the same matches
+        self.lower_scanner = re.compile(combined)
+        # Other text is scanned with IGNORECASE to get the same Unicode case folding as the patterns
+        self.scanner = re.compile(combined, re.IGNORECASE)
+
+        # Offsets inside each keyword where another keyword can start (e.g. "po" in "shipo"),
+        # which the non-overlapping scan would skip
+        self.overlaps = {}
+        for name, literal in keywords.items():
+            offsets = [offset for offset in range(1, len(literal))
+                       if any(literal[offset:].startswith(other) or other.startswith(literal[offset:])
+                              for other in keywords.values())]
+            if offsets:
+                self.overlaps[name] = offsets
+
+    def _classify(self, keyword):
+        """Get the name of the keyword a scanner match is for"""
+        name = self.literals.get(keyword)
+        if name is not None:
+            return name
+        # Case-folded literals like "ſhip" (only in non-ASCII text)
+        for name, pattern in self.folded:
+            if pattern.fullmatch(keyword):
+                return name
+        return None
+
+    def scan(self, text):
+        """
+        Find every position where a keyword starts.
+
+        Args:
+            text (str): Text to scan
+
+        Returns:
+            dict: Keyword name -> sorted list of start positions
+        """
+        positions = {name: [] for name in self.names}
+        if text.isascii():
+            scanned, scanner = text.lower(), self.lower_scanner
+        else:
+            scanned, scanner = text, self.scanner
+
+        classify = self._classify
+        overlaps = self.overlaps
+        for match in scanner.finditer(scanned):
+            start = match.start()
+            name = classify(match.group())
+            positions[name].append(start)
+
+            for offset in overlaps.get(name, ()):
+                inner = scanner.match(scanned, start + offset)
+                if inner:
+                    positions[classify(inner.group())].append(start + offset)
+        return positions
+
+def anchor_positions(positions, anchors):
+    """
+    Merge the positions of the keywords a pattern can start with.
+
+    Args:
+        positions (dict): Output of KeywordScanner.scan()
+        anchors (tuple): Keyword names
+
+    Returns:
+        list: Sorted start positions
+    """
+    if len(anchors) == 1:
+        return positions[anchors[0]]
+    return sorted(pos for name in anchors for pos in positions[name])
+
+def first_match(pattern, text, starts, deadline=None):
+    """
+    Find the leftmost match of a pattern, trying only the given start positions.
+
+    Equivalent to pattern.search(text) when every match of the pattern starts
+    at one of the positions.
+
+    Args:
+        pattern (re.Pattern): Compiled pattern
+        text (str): Text to match
+        starts (list): Sorted candidate start positions
+        deadline (float): Optional output of regex_deadline(), checked before each attempt
+
+    Returns:
+        re.Match: The first match, or None
+
+    Raises:
+        RegexTimeBudgetExceeded: If the deadline passes
+    """
+    match = pattern.match
+    for pos in starts:
+        check_deadline(deadline)
+        result = match(text, pos)
+        if result:
+            return result
+    return None
+
+def iter_matches(pattern, text, starts, deadline=None):
+    """
+    Find non-overlapping matches of a pattern, trying only the given start positions.
+
+    Equivalent to pattern.finditer(text) when every match of the pattern starts
+    at one of the positions.
+
+    Args:
+        pattern (re.Pattern): Compiled pattern
+        text (str): Text to match
+        starts (list): Sorted candidate start positions
+        deadline (float): Optional output of regex_deadline(), checked before each attempt
+
+    Yields:
+        re.Match: Matches in order
+
+    Raises:
+        RegexTimeBudgetExceeded: If the deadline passes
+    """
+    match = pattern.match
+    last_end = 0
+    for pos in starts:
+        if pos < last_end:
+            continue
+        check_deadline(deadline)
+        result = match(text, pos)
+        if result:
+            yield result
+            last_end = result.end()
@@ -1,15 +1,22 @@
 from app import app
-from flask import jsonify, request, send_from_directory, render_template_string
+from flask import Response, jsonify, request, send_from_directory, render_template_string
 import os
 import uuid
 import json
 import datetime
 import werkzeug
-import importlib
-from app.ocr import extract_text
+from app.ocr import extract_text, iter_text_lines
 from flask_cors import CORS
 from app.parser_stats import get_usage_stats, save_stats_to_file
-# Import parser only when needed to avoid circular imports
+from app.model_registry import get_model_report
+from app.ner_scheduler import get_scheduler_stats
+from app.runtime_config import get_runtime_report
+from app.ner_cache import get_cache_stats
+from app.extraction_rules import get_rule_stats
+from app.parser_engine import get_parser_engine
+from app.logging_utils import get_logger
+
+logger = get_logger(__name__)
 
 # Create necessary directories for uploaded files and parsed results
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'temp')
@@ -222,19 +229,19 @@ def index():
 def upload_file():
     # Check if the post request has the file part
     if 'file' not in request.files:
-        print("No file part in request")
+        logger.info("No file part in request")
         return jsonify({"error": "No file part"}), 400
     
     file = request.files['file']
     
     # If user does not select file, browser also submits an empty part without filename
     if file.filename == '':
-        print("No selected filename")
+        logger.info("No selected filename")
         return jsonify({"error": "No selected file"}), 400
     
     if file and allowed_file(file.filename):
         try:
-            print(f"Processing file: {file.filename}")
+            logger.debug("Processing file: %s", file.filename)
             
             # Read file content, but allow empty files
             file_content = file.read(1024)  # Read only the first 1024 bytes to check
@@ -248,11 +255,11 @@ def upload_file():
             file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
             file.save(file_path)
             
-            print(f"File saved to: {file_path}")
+            logger.debug("File saved to: %s", file_path)
             
             # Extract text from the uploaded file
             extraction_result = extract_text(file_path)
-            print(f"Extraction result: {extraction_result['success']}")
+            logger.debug("Extraction result: %s", extraction_result["success"])
             
             return jsonify({
                 "message": "File uploaded successfully",
@@ -268,10 +275,10 @@ def upload_file():
             }), 201
             
         except Exception as e:
-            print(f"Error processing file: {str(e)}")
+            logger.error("Error processing file: %s", str(e))
             return jsonify({"error": f"Error processing file: {str(e)}"}), 500
     
-    print(f"File type not allowed: {file.filename}")
+    logger.info("File type not allowed: %s", file.filename)
     return jsonify({"error": "File type not allowed"}), 400
 
 @app.route('/parse', methods=['GET'])
@@ -308,17 +315,14 @@ def parse_document():
             # Use default from config
             os.environ.pop("USE_LLM_PARSER", None)
         
-        # Import parser module to ensure latest code is used
-        print("Importing and reloading parser_v2 module... FORCED RELOAD")
-        import sys
-        if 'app.parser_v2' in sys.modules:
-            del sys.modules['app.parser_v2']
-        import app.parser_v2
-        importlib.reload(app.parser_v2)
-        from app.parser_v2 import parse_order_document
-        
-        # Parse the extracted text using NER
-        parsed_data = parse_order_document(extraction_result['text'])
+        # Parse the extracted text with the long-lived parser engine, with the strategy
+        # asked for via query parameter (e.g. ?strategy=v1), else the configured one
+        engine = get_parser_engine()
+        try:
+            strategy = engine.pick_strategy(extraction_result['text'], request.args.get('strategy'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        parsed_data = engine.parse(extraction_result['text'], strategy)
         
         # Save the parsed result to the parsed folder
         save_parsed_result(parsed_data, os.path.basename(latest_file))
@@ -329,6 +333,7 @@ def parse_document():
             "file_type": extraction_result['file_type'],
             "text": extraction_result['text'],
             "parsed_data": parsed_data,
+            "parser_strategy": strategy,
             "timestamp": datetime.datetime.now().isoformat()  # Add timestamp to ensure it's fresh
         })
         
@@ -339,9 +344,64 @@ def parse_document():
         
         return response
     except Exception as e:
-        logger.error(f"Error parsing document: {str(e)}")
+        logger.error("Error parsing document: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
+@app.route('/parse/stream', methods=['GET'])
+def parse_document_stream():
+    """
+    Parse the latest uploaded file as it's read, streaming the results as
+    newline-delimited JSON: a "file" record, then the parser's "header",
+    "line_item" and "summary" records (an "error" record if parsing fails midway).
+    For very large documents; the result isn't saved to the parsed folder.
+    Uses the strategy asked for via query parameter (e.g. ?strategy=v2), else the configured one.
+    """
+    # Only some strategies can parse a document as it's read (v1 and the LLM need the whole text)
+    engine = get_parser_engine()
+    strategy = request.args.get('strategy') or engine.strategy
+    try:
+        if not engine.has_streaming_mode(strategy):
+            return jsonify({
+                "error": f"Streaming isn't available for parser strategy '{strategy}'",
+                "details": "Use GET /parse, or a strategy with a streaming mode such as ?strategy=v2"
+            }), 501
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        files = os.listdir(UPLOAD_FOLDER)
+        if not files:
+            return jsonify({"error": "No uploaded files found"}), 404
+        
+        # Sort files by modification time (newest first)
+        latest_file = sorted(
+            [os.path.join(UPLOAD_FOLDER, f) for f in files],
+            key=lambda x: os.path.getmtime(x),
+            reverse=True
+        )[0]
+        
+        file_type, lines = iter_text_lines(latest_file)
+        records = engine.stream(lines, strategy)
+    except ValueError as e:
+        return jsonify({"error": "Text extraction failed", "details": str(e)}), 500
+    except Exception as e:
+        logger.error("Error parsing document: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+    
+    def generate():
+        yield json.dumps({"type": "file", "file": os.path.basename(latest_file), "file_type": file_type}) + "\n"
+        try:
+            for record in records:
+                yield json.dumps(record) + "\n"
+        except Exception as e:
+            logger.error("Error streaming parsed document: %s", str(e))
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+    
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the stream
+    return response
+
 def save_parsed_result(parsed_data, original_filename):
     """
     Save the parsed result to a JSON file in the parsed folder.
@@ -392,17 +452,8 @@ def download_result():
                 "details": extraction_result['error']
             }), 500
         
-        # Import parser module to ensure latest code is used
-        print("Importing and reloading parser_v2 module... FORCED RELOAD")
-        import sys
-        if 'app.parser_v2' in sys.modules:
-            del sys.modules['app.parser_v2']
-        import app.parser_v2
-        importlib.reload(app.parser_v2)
-        from app.parser_v2 import parse_order_document
-        
-        # Parse the extracted text using NER
-        parsed_data = parse_order_document(extraction_result['text'])
+        # Parse the extracted text with the long-lived parser engine
+        parsed_data = get_parser_engine().parse(extraction_result['text'])
         
         # Save the parsed result
         output_path = save_parsed_result(parsed_data, os.path.basename(latest_file))
@@ -501,8 +552,16 @@ def get_parser_stats():
         # Save stats to file for persistence
         save_stats_to_file(os.path.join(PARSED_FOLDER, 'parser_stats.json'))
         
+        # Include memory and load-time information for the shared NER model
+        stats["ner_model"] = get_model_report()
+        stats["ner_scheduler"] = get_scheduler_stats()
+        stats["runtime"] = get_runtime_report()
+        stats["ner_cache"] = get_cache_stats()
+        stats["extraction_rules"] = get_rule_stats()
+        stats["parser_engine"] = get_parser_engine().report()
+        
         # Return stats as JSON
         return jsonify(stats)
     except Exception as e:
-        logger.error(f"Error getting parser stats: {str(e)}")
+        logger.error("Error getting parser stats: %s", str(e))
         return jsonify({"error": str(e)}), 500 
\ No newline at end of file
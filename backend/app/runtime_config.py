@@ -0,0 +1,226 @@
+import os
+import glob
+from app.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Threads for NER inference in each worker process (0 keeps torch's default of one per core)
+NER_INTRA_OP_THREADS = int(os.environ.get("NER_INTRA_OP_THREADS", "0"))
+NER_INTER_OP_THREADS = int(os.environ.get("NER_INTER_OP_THREADS", "0"))
+
+# CPU pinning: "" (off), "auto" (a separate, NUMA-local slice of cores per worker) or a list like "0-3,8"
+NER_CPU_AFFINITY = os.environ.get("NER_CPU_AFFINITY", "").strip().lower()
+
+# OpenMP threads per Tesseract subprocess (0 leaves Tesseract's default)
+OCR_THREAD_LIMIT = int(os.environ.get("OCR_THREAD_LIMIT", "0"))
+
+# Process the runtime was last configured in (forked workers configure themselves again)
+_configured_pid = None
+_pinned_cpus = None
+# (intra-op, inter-op) threads of the ONNX Runtime session in this process, once one is created
+_onnx_threads = None
+
+def parse_cpu_list(spec):
+    """
+    Parse a CPU list like "0-3,8,10-11".
+
+    Args:
+        spec (str): CPU list in Linux cpulist format
+
+    Returns:
+        list: Sorted CPU ids
+    """
+    cpus = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+def available_cpus():
+    """Get the CPUs this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def numa_cpu_order(cpus):
+    """
+    Order CPUs so that the cores of each NUMA node are contiguous.
+
+    Args:
+        cpus (list): CPU ids
+
+    Returns:
+        list: The same CPU ids, grouped by NUMA node (unchanged if there is no NUMA information)
+    """
+    node_of = {}
+    for node_path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*")):
+        try:
+            with open(os.path.join(node_path, "cpulist"), "r") as f:
+                node_cpus = parse_cpu_list(f.read())
+        except (OSError, ValueError):
+            continue
+        node = int(os.path.basename(node_path)[4:])
+        for cpu in node_cpus:
+            node_of[cpu] = node
+    return sorted(cpus, key=lambda cpu: (node_of.get(cpu, 0), cpu))
+
+# CPUs available before any pinning, so forked workers can pick cores outside the parent's slice
+_initial_cpus = available_cpus()
+
+def worker_cpus(worker_index, worker_count, threads=NER_INTRA_OP_THREADS):
+    """
+    Pick the cores for one worker when NER_CPU_AFFINITY is "auto".
+
+    Workers get consecutive slices of the NUMA-ordered cores, so a worker's
+    threads stay on one node where possible.
+
+    Args:
+        worker_index (int): Index of the worker (0-based)
+        worker_count (int): Number of workers sharing the machine
+        threads (int): Cores per worker (0 to split the cores evenly)
+
+    Returns:
+        list: CPU ids for the worker
+    """
+    cpus = numa_cpu_order(_initial_cpus)
+    per_worker = threads if threads > 0 else max(1, len(cpus) // max(1, worker_count))
+    per_worker = min(per_worker, len(cpus))
+    start = (worker_index * per_worker) % len(cpus)
+    return [cpus[(start + i) % len(cpus)] for i in range(per_worker)]
+
+def configure_runtime(worker_index=None, worker_count=None):
+    """
+    Apply the CPU affinity, torch thread and OCR thread settings to this process.
+
+    Safe to call more than once; it only does work the first time in each
+    process (a forked worker configures itself again).
+
+    Args:
+        worker_index (int): Worker index for "auto" affinity, from PREFORK_WORKER_INDEX if not given
+        worker_count (int): Number of workers, from PREFORK_WORKERS if not given
+    """
+    global _configured_pid, _pinned_cpus
+    if _configured_pid == os.getpid():
+        return
+    _configured_pid = os.getpid()
+
+    if worker_index is None:
+        worker_index = int(os.environ.get("PREFORK_WORKER_INDEX", "0"))
+    if worker_count is None:
+        worker_count = int(os.environ.get("PREFORK_WORKERS", "1"))
+
+    # Pin before torch sizes its thread pool
+    _pinned_cpus = None
+    if NER_CPU_AFFINITY and hasattr(os, "sched_setaffinity"):
+        try:
+            if NER_CPU_AFFINITY == "auto":
+                cpus = worker_cpus(worker_index, worker_count)
+            else:
+                cpus = parse_cpu_list(NER_CPU_AFFINITY)
+            os.sched_setaffinity(0, cpus)
+            _pinned_cpus = cpus
+        except (OSError, ValueError) as e:
+            logger.warning("Could not apply NER_CPU_AFFINITY '%s': %s", NER_CPU_AFFINITY, str(e))
+
+    if OCR_THREAD_LIMIT > 0:
+        # Read by Tesseract's OpenMP runtime in every OCR subprocess
+        os.environ["OMP_THREAD_LIMIT"] = str(OCR_THREAD_LIMIT)
+
+    import torch
+
+    if NER_INTRA_OP_THREADS > 0:
+        torch.set_num_threads(NER_INTRA_OP_THREADS)
+    elif _pinned_cpus:
+        # Don't start more threads than the cores this worker is pinned to
+        torch.set_num_threads(len(_pinned_cpus))
+
+    if NER_INTER_OP_THREADS > 0 and torch.get_num_interop_threads() != NER_INTER_OP_THREADS:
+        try:
+            torch.set_num_interop_threads(NER_INTER_OP_THREADS)
+        except RuntimeError as e:
+            # Can only be set once, before any inter-op work (e.g. already set in a pre-fork parent)
+            logger.warning("Could not set NER_INTER_OP_THREADS: %s", str(e))
+
+def onnx_thread_counts():
+    """
+    Get the thread counts for an ONNX Runtime session in this process.
+
+    ONNX Runtime sizes its own thread pools (one intra-op thread per core by
+    default), so the torch settings don't reach it. The session gets the same
+    intra-op budget as torch: NER_INTRA_OP_THREADS, else the pinned core count,
+    else torch's default.
+
+    Returns:
+        tuple: (intra_op_threads, inter_op_threads), inter-op 0 for ONNX Runtime's default
+    """
+    import torch
+
+    configure_runtime()
+    return torch.get_num_threads(), max(NER_INTER_OP_THREADS, 0)
+
+def record_onnx_threads(intra_op_threads, inter_op_threads):
+    """
+    Record the thread counts of this process's ONNX Runtime session for the runtime report.
+
+    Args:
+        intra_op_threads (int): Intra-op threads of the session
+        inter_op_threads (int): Inter-op threads of the session (0 for ONNX Runtime's default)
+    """
+    global _onnx_threads
+    _onnx_threads = (intra_op_threads, inter_op_threads)
+
+def get_runtime_report():
+    """
+    Get the effective parallelism of this process.
+
+    Returns:
+        dict: CPU, affinity, torch thread and OCR thread information
+    """
+    import torch
+
+    cpus = available_cpus()
+    return {
+        "pid": os.getpid(),
+        "cpu_count": os.cpu_count(),
+        "affinity": NER_CPU_AFFINITY or None,
+        "pinned_cpus": _pinned_cpus,
+        "available_cpus": len(cpus),
+        "torch_intra_op_threads": torch.get_num_threads(),
+        "torch_inter_op_threads": torch.get_num_interop_threads(),
+        # Only set with the onnx backend, whose session has its own thread pools
+        "onnx_intra_op_threads": _onnx_threads[0] if _onnx_threads else None,
+        "onnx_inter_op_threads": _onnx_threads[1] if _onnx_threads else None,
+        "ocr_thread_limit": os.environ.get("OMP_THREAD_LIMIT")
+    }
+
+def print_runtime_self_check(worker_count=None):
+    """
+    Print the effective parallelism and warn about core oversubscription.
+
+    Args:
+        worker_count (int): Number of worker processes on this machine, from PREFORK_WORKERS if not given
+    """
+    if worker_count is None:
+        worker_count = int(os.environ.get("PREFORK_WORKERS", "1"))
+    report = get_runtime_report()
+
+    if report["onnx_intra_op_threads"] is not None:
+        logger.info("ONNX Runtime session (pid %s): intra-op threads: %s, inter-op threads: %s",
+                    report["pid"], report["onnx_intra_op_threads"], report["onnx_inter_op_threads"] or "default")
+    logger.info("Runtime self-check (pid %s): %s/%s CPUs available, torch intra-op threads: %s, "
+                "inter-op threads: %s, pinned CPUs: %s, OCR thread limit: %s",
+                report["pid"], report["available_cpus"], report["cpu_count"], report["torch_intra_op_threads"],
+                report["torch_inter_op_threads"], report["pinned_cpus"] or "none", report["ocr_thread_limit"] or "default")
+
+    # Unpinned workers share all cores, so their thread pools add up
+    if not report["pinned_cpus"]:
+        total_threads = report["torch_intra_op_threads"] * worker_count
+        if total_threads > (report["cpu_count"] or 1):
+            logger.warning("%d worker(s) x %d torch threads oversubscribe %s CPUs; set NER_INTRA_OP_THREADS or "
+                           "NER_CPU_AFFINITY=auto", worker_count, report["torch_intra_op_threads"], report["cpu_count"])
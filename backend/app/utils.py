@@ -1,5 +1,8 @@
 import os
 import mimetypes
+from app.logging_utils import get_logger
+
+logger = get_logger(__name__)
 
 def detect_file_type(file_path):
     """
@@ -25,11 +28,11 @@ def detect_file_type(file_path):
             with open(file_path, 'rb') as f:
                 header = f.read(4)
                 if header == b'%PDF':
-                    print(f"Confirmed PDF file by content check: {file_path}")
+                    logger.debug("Confirmed PDF file by content check: %s", file_path)
                 else:
-                    print(f"Warning: File has .pdf extension but doesn't start with %PDF: {file_path}")
+                    logger.warning("File has .pdf extension but doesn't start with %%PDF: %s", file_path)
         except Exception as e:
-            print(f"Warning: Could not check PDF content: {str(e)}")
+            logger.warning("Could not check PDF content: %s", str(e))
         return 'pdf'
     
     # Check for image (png, jpg, jpeg)
@@ -43,9 +46,9 @@ def detect_file_type(file_path):
         try:
             with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                 f.read(100)  # Just read a bit to check if it's text
-                print(f"Confirmed text file: {file_path}")
+                logger.debug("Confirmed text file: %s", file_path)
         except Exception as e:
-            print(f"Warning: File has .txt extension but might not be a text file: {str(e)}")
+            logger.warning("File has .txt extension but might not be a text file: %s", str(e))
         return 'txt'
     
     # Try to guess based on file content for unknown extensions
@@ -54,7 +57,7 @@ def detect_file_type(file_path):
         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
             content = f.read(100)
             if all(c.isprintable() or c.isspace() for c in content):
-                print(f"File appears to be text based on content: {file_path}")
+                logger.debug("File appears to be text based on content: %s", file_path)
                 return 'txt'
     except Exception:
         pass
@@ -64,11 +67,11 @@ def detect_file_type(file_path):
         with open(file_path, 'rb') as f:
             header = f.read(4)
             if header == b'%PDF':
-                print(f"File appears to be PDF based on content: {file_path}")
+                logger.debug("File appears to be PDF based on content: %s", file_path)
                 return 'pdf'
     except Exception:
         pass
     
     # Unknown file type
-    print(f"Unknown file type: {file_path} with extension {extension}")
+    logger.info("Unknown file type: %s with extension %s", file_path, extension)
     return 'unknown' 
\ No newline at end of file
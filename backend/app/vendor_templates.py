@@ -0,0 +1,353 @@
+import os
+import re
+from threading import Lock
+from app.extraction_rules import read_rule_file
+from app.line_items import line_item
+from app.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Vendor templates read documents from suppliers whose layout never changes. A document is
+# fingerprinted by the labels of its first lines; when they match a template's header, the
+# template's positional extractor reads it directly instead of the generic regex/NER/LLM
+# path. Anything the extractor doesn't recognise falls through to the generic parser.
+VENDOR_TEMPLATES_PATH = os.environ.get("VENDOR_TEMPLATES_PATH", "")
+EXAMPLE_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules",
+                                      "vendor_templates.example.json")
+
+# Confidence of the fields a template reads, unless the template sets its own
+DEFAULT_TEMPLATE_CONFIDENCE = 0.98
+DEFAULT_REQUIRED_FIELDS = ("order_id", "line_items")
+
+TEMPLATE_KEYS = {"name", "description", "header", "fields", "line_items", "required", "confidence"}
+TEMPLATE_FIELDS = ("customer", "order_id", "shipping_address")
+FIELD_KEYS = {"label", "block", "max_lines"}
+LINE_ITEM_KEYS = {"start", "end", "delimiter", "columns"}
+LINE_ITEM_COLUMNS = ("sku", "quantity", "price")
+
+DIGIT_RUN = re.compile(r"\d+")
+
+# Cell values a template accepts; any other value makes the document fall through
+SKU_VALUE = re.compile(r"[A-Za-z0-9][A-Za-z0-9\-_./]*")
+QUANTITY_VALUE = re.compile(r"\d+")
+PRICE_VALUE = re.compile(r"\d+(?:\.\d+)?")
+CURRENCY_CHARS = "$€£"
+
+def line_label(line):
+    """
+    Get the layout label of a document line.
+
+    Args:
+        line (str): Document line
+
+    Returns:
+        str: Text before the first ":" (the whole line if it has none), lowercased,
+             with whitespace collapsed and runs of digits replaced by "#"
+    """
+    label, _, _ = line.partition(":")
+    return DIGIT_RUN.sub("#", " ".join(label.lower().split()))
+
+def line_value(line):
+    """
+    Get the value after a line's label.
+
+    Args:
+        line (str): Stripped document line
+
+    Returns:
+        str: Text after the first ":", or "" if the line has none
+    """
+    _, _, value = line.partition(":")
+    return value.strip()
+
+def cell_value(cell):
+    """
+    Get the value of a line item cell, e.g. "Qty: 25" or "Part #AXL-9920".
+
+    Args:
+        cell (str): Cell text
+
+    Returns:
+        str: Text after the first ":" (or "#" if there is none), stripped
+    """
+    for separator in (":", "#"):
+        if separator in cell:
+            return cell.split(separator, 1)[1].strip()
+    return cell.strip()
+
+def leading_lines(text, count):
+    """
+    Get the first non-empty lines of a text without splitting all of it.
+
+    Args:
+        text (str): Document text
+        count (int): Number of lines wanted
+
+    Returns:
+        list: Up to count stripped, non-empty lines
+    """
+    lines = []
+    start = 0
+    while len(lines) < count:
+        end = text.find("\n", start)
+        line = (text[start:] if end < 0 else text[start:end]).strip()
+        if line:
+            lines.append(line)
+        if end < 0:
+            break
+        start = end + 1
+    return lines
+
+class VendorTemplate:
+    """
+    A known document layout and the positional extractor that reads it.
+    """
+
+    def __init__(self, spec):
+        """
+        Compile a template spec.
+
+        Args:
+            spec (dict): Template spec (see app/rules/vendor_templates.example.json)
+
+        Raises:
+            ValueError: If the spec is invalid
+        """
+        if not isinstance(spec, dict) or not isinstance(spec.get("name"), str) or not spec["name"]:
+            raise ValueError(f"Vendor template {spec!r} needs a \"name\"")
+        self.name = spec["name"]
+        unknown = set(spec) - TEMPLATE_KEYS
+        if unknown:
+            raise ValueError(f"Vendor template '{self.name}' has unknown keys: {', '.join(sorted(unknown))}")
+        self.description = spec.get("description", "")
+
+        header = spec.get("header")
+        if not isinstance(header, list) or not header or not all(isinstance(line, str) and line.strip() for line in header):
+            raise ValueError(f"Vendor template '{self.name}' needs a \"header\" list of non-empty lines")
+        # The fingerprint is hashed as a dict key, so matching a document costs one lookup per header length
+        self.fingerprint = tuple(line_label(line) for line in header)
+
+        fields = spec.get("fields", {})
+        if not isinstance(fields, dict) or set(fields) - set(TEMPLATE_FIELDS):
+            raise ValueError(f"Vendor template '{self.name}' can only read the fields {', '.join(TEMPLATE_FIELDS)}")
+        self.fields = {}
+        for field, field_spec in fields.items():
+            if (not isinstance(field_spec, dict) or set(field_spec) - FIELD_KEYS or
+                    not isinstance(field_spec.get("label"), str) or not field_spec["label"].strip()):
+                raise ValueError(f"Vendor template '{self.name}' field '{field}' needs a \"label\" "
+                                 f"and may set {', '.join(sorted(FIELD_KEYS - {'label'}))}")
+            max_lines = field_spec.get("max_lines")
+            if max_lines is not None and (not isinstance(max_lines, int) or max_lines < 1):
+                raise ValueError(f"Vendor template '{self.name}' field '{field}' has an invalid \"max_lines\"")
+            self.fields[field] = (line_label(field_spec["label"]), bool(field_spec.get("block", False)), max_lines)
+
+        line_items = spec.get("line_items")
+        if (not isinstance(line_items, dict) or set(line_items) - LINE_ITEM_KEYS or
+                not isinstance(line_items.get("start"), str) or not isinstance(line_items.get("delimiter"), str) or
+                not line_items["delimiter"]):
+            raise ValueError(f"Vendor template '{self.name}' needs \"line_items\" with a \"start\" label and a \"delimiter\"")
+        columns = line_items.get("columns")
+        named = [column for column in columns if column is not None] if isinstance(columns, list) else []
+        if len(named) != len(LINE_ITEM_COLUMNS) or set(map(str, named)) != set(LINE_ITEM_COLUMNS):
+            raise ValueError(f"Vendor template '{self.name}' line item \"columns\" must name "
+                             f"{', '.join(LINE_ITEM_COLUMNS)} once each (null for other columns)")
+        self.start_label = line_label(line_items["start"])
+        self.end_labels = frozenset(line_label(line) for line in line_items.get("end", []))
+        self.delimiter = line_items["delimiter"]
+        self.sku_index = columns.index("sku")
+        self.quantity_index = columns.index("quantity")
+        self.price_index = columns.index("price")
+        self.column_count = len(columns)
+
+        self.required = tuple(spec.get("required", DEFAULT_REQUIRED_FIELDS))
+        unknown = set(self.required) - set(TEMPLATE_FIELDS) - {"line_items"}
+        if unknown:
+            raise ValueError(f"Vendor template '{self.name}' requires unknown fields: {', '.join(sorted(unknown))}")
+        if set(self.required) - set(self.fields) - {"line_items"}:
+            raise ValueError(f"Vendor template '{self.name}' requires fields it doesn't read")
+        self.confidence = float(spec.get("confidence", DEFAULT_TEMPLATE_CONFIDENCE))
+        self.source = f"template:{self.name}"
+
+        # Labels whose line ends a block field
+        self.section_labels = frozenset(label for label, _, _ in self.fields.values()) | {self.start_label}
+
+    def read_row(self, row):
+        """
+        Read one line item row.
+
+        Args:
+            row (str): Stripped row text
+
+        Returns:
+            LineItem: The line item, or None if the row doesn't fit the template
+        """
+        cells = row.split(self.delimiter)
+        if len(cells) != self.column_count:
+            return None
+
+        sku = cell_value(cells[self.sku_index])
+        quantity = cell_value(cells[self.quantity_index]).replace(",", "")
+        price = cell_value(cells[self.price_index]).lstrip(CURRENCY_CHARS).replace(",", "").strip()
+        if not (SKU_VALUE.fullmatch(sku) and QUANTITY_VALUE.fullmatch(quantity) and PRICE_VALUE.fullmatch(price)):
+            return None
+        return line_item(sku, int(quantity), float(price), self.confidence, self.source)
+
+    def extract(self, text):
+        """
+        Read a document in this template's layout.
+
+        Args:
+            text (str): Document text whose header matched the fingerprint
+
+        Returns:
+            dict: Structured order data in the format of parser_v2.extract_entities, or None
+                  if a required field is missing or a line item row doesn't fit the template
+        """
+        structured_data = {
+            field: {"value": "", "confidence": 0.0, "source": ""} for field in TEMPLATE_FIELDS
+        }
+        structured_data["line_items"] = []
+        lines = [line.strip() for line in text.splitlines()]
+
+        # One pass for the label lines, stopping at the line items
+        wanted = {label: field for field, (label, _, _) in self.fields.items()}
+        found = {}
+        start = None
+        for index, line in enumerate(lines):
+            if not line:
+                continue
+            label = line_label(line)
+            if label == self.start_label:
+                start = index
+                break
+            if label in wanted and wanted[label] not in found:
+                found[wanted[label]] = index
+
+        for field, index in found.items():
+            _, block, max_lines = self.fields[field]
+            value = line_value(lines[index])
+            if block:
+                # The field continues on the following lines, up to a blank line or the next section
+                parts = [value] if value else []
+                for line in lines[index + 1:]:
+                    if not line or (max_lines and len(parts) >= max_lines) or line_label(line) in self.section_labels:
+                        break
+                    parts.append(line)
+                value = ", ".join(parts)
+            if value:
+                structured_data[field] = {"value": value, "confidence": self.confidence, "source": self.source}
+
+        if start is not None:
+            for line in lines[start + 1:]:
+                if not line:
+                    # Blank lines may separate the table from its heading, but end it once rows started
+                    if structured_data["line_items"]:
+                        break
+                    continue
+                item = self.read_row(line)
+                if item is None:
+                    # Rows run up to the end label, any other line breaks the layout
+                    if line_label(line) in self.end_labels:
+                        break
+                    return None
+                structured_data["line_items"].append(item)
+
+        for field in self.required:
+            if field == "line_items" and not structured_data["line_items"]:
+                return None
+            if field != "line_items" and not structured_data[field]["value"]:
+                return None
+        return structured_data
+
+class TemplateRegistry:
+    """
+    Vendor templates indexed by the fingerprint of their headers.
+    """
+
+    def __init__(self, templates=(), sources=()):
+        """
+        Index compiled templates.
+
+        Args:
+            templates (iterable): VendorTemplate instances
+            sources (iterable): Files the templates were loaded from
+
+        Raises:
+            ValueError: If two templates have the same fingerprint or name
+        """
+        self.templates = {}
+        self.sources = list(sources)
+        self._by_length = {}
+        for template in templates:
+            if template.name in self.templates:
+                raise ValueError(f"Vendor template '{template.name}' is defined twice")
+            bucket = self._by_length.setdefault(len(template.fingerprint), {})
+            if template.fingerprint in bucket:
+                raise ValueError(f"Vendor templates '{bucket[template.fingerprint].name}' and '{template.name}' "
+                                 f"have the same header")
+            bucket[template.fingerprint] = template
+            self.templates[template.name] = template
+        # Longer headers are more specific, so they are tried first
+        self._lengths = sorted(self._by_length, reverse=True)
+
+    def __len__(self):
+        return len(self.templates)
+
+    def match(self, text):
+        """
+        Find the template whose header the document starts with.
+
+        Args:
+            text (str): Document text
+
+        Returns:
+            VendorTemplate: The matching template, or None
+        """
+        if not self._lengths:
+            return None
+        labels = [line_label(line) for line in leading_lines(text, self._lengths[0])]
+        for length in self._lengths:
+            if len(labels) >= length:
+                template = self._by_length[length].get(tuple(labels[:length]))
+                if template is not None:
+                    return template
+        return None
+
+def load_template_registry(path=VENDOR_TEMPLATES_PATH):
+    """
+    Load and compile the vendor templates.
+
+    Args:
+        path (str): Template file (.json, or .yaml/.yml with PyYAML), "" for no templates
+
+    Returns:
+        TemplateRegistry: The compiled templates
+
+    Raises:
+        ValueError: If the template file is invalid
+    """
+    if not path:
+        return TemplateRegistry()
+    spec = read_rule_file(path)
+    if not isinstance(spec.get("templates"), list):
+        raise ValueError(f"Template file {path} must contain a \"templates\" list")
+    registry = TemplateRegistry([VendorTemplate(template) for template in spec["templates"]], [path])
+    logger.info("Loaded %d vendor templates from %s", len(registry), path)
+    return registry
+
+_registry = None
+_registry_lock = Lock()
+
+def get_template_registry():
+    """
+    Get the process-wide vendor template registry, compiled on first use.
+
+    Returns:
+        TemplateRegistry: The shared registry
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = load_template_registry()
+    return _registry
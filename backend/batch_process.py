@@ -27,7 +27,7 @@ def process_file(file_path):
     """Process a single file using the document parser"""
     try:
         # Import only when needed to ensure environment variables are loaded first
-        from app.parser_v2 import parse_order_document
+        from app.parser_engine import get_parser_engine
         from app.ocr import extract_text_from_file
         
         logger.info(f"Processing file: {file_path}")
@@ -38,8 +38,8 @@ def process_file(file_path):
             logger.error(f"Failed to extract text from {file_path}")
             return None
             
-        # Parse the document
-        result = parse_order_document(text)
+        # Parse the document with the configured strategy (PARSER_STRATEGY)
+        result = get_parser_engine().parse(text)
         
         logger.info(f"Successfully processed {file_path}")
         
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the regex-first parser (app/parser_v2.py).
+
+Generates large synthetic invoices and times the extraction passes, so
+changes to the patterns can be checked for linear scaling.
+
+Usage:
+    python benchmark_parser.py lines [--sizes 1000 5000 20000] [--repeat 3]
+    python benchmark_parser.py pathological [--sizes 1000 10000 100000] [--repeat 3]
+    python benchmark_parser.py templates [--sizes 5 50 500] [--repeat 3]
+    python benchmark_parser.py logging [--sizes 100 1000 5000] [--repeat 3]
+    python benchmark_parser.py memory [--sizes 1000 5000 20000]
+    python benchmark_parser.py postprocess [--sizes 1000 10000 100000] [--repeat 3]
+    python benchmark_parser.py stream [--sizes 10000 50000 200000]
+    python benchmark_parser.py confidence [--sizes 1000 10000 100000] [--repeat 3]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+INVOICE_HEADER = """Customer: Acme Corporation
+Order ID: ORD-55555
+Ship To:
+Acme Corporation
+123 Main Street
+Austin, TX 78701
+
+Line Items:
+"""
+
+def synthetic_invoice(line_count, seed=0):
+    """
+    Build an invoice with the given number of body lines.
+
+    About a third of the lines are line items in the formats the parser knows,
+    the rest are descriptions, notes and totals without line item keywords.
+
+    Args:
+        line_count (int): Number of body lines
+        seed (int): Random seed
+
+    Returns:
+        str: Invoice text
+    """
+    rng = random.Random(seed)
+    lines = []
+    for i in range(line_count):
+        kind = rng.random()
+        if kind < 0.12:
+            lines.append(f"Part #HTR-{i:05d} | Qty: {rng.randint(1, 50)} | Unit Price: ${rng.randint(1, 500)}.{rng.randint(0, 99):02d}")
+        elif kind < 0.24:
+            lines.append(f"SKU: WID-{i:05d}")
+            lines.append(f"Quantity: {rng.randint(1, 50)}")
+            lines.append(f"Price: ${rng.randint(1, 500)}.00")
+        elif kind < 0.3:
+            lines.append(f"{rng.randint(1, 50)}x of BLT-{i:05d} @ ${rng.randint(1, 500)}.00")
+        elif kind < 0.8:
+            lines.append(f"Heavy duty fastener assembly, zinc plated, batch {i} - handle with care")
+        elif kind < 0.95:
+            lines.append("")
+        else:
+            lines.append(f"Subtotal carried forward: {rng.randint(100, 99999)}.{rng.randint(0, 99):02d}")
+    return INVOICE_HEADER + "\n".join(lines) + "\n"
+
+# Inputs that made the previous patterns backtrack polynomially: long whitespace runs after
+# a keyword, keywords repeated without a value, and long runs inside a line item
+PATHOLOGICAL_INPUTS = {
+    "order + spaces": lambda size: "Order" + " " * size + "!",
+    "po + spaces": lambda size: "PO" + " " * size + "!",
+    "customer + spaces": lambda size: "Customer" + " " * size + "!",
+    "customer repeated": lambda size: "customer " * (size // 9) + "!",
+    "address + spaces": lambda size: "Address" + " " * size + "!",
+    "address repeated": lambda size: "address " * (size // 8) + "!",
+    "ship to + spaces": lambda size: "Ship to" + " " * size + "!",
+    "warehouse + spaces": lambda size: "Our warehouse" + " " * size + "!",
+    "sku line + spaces": lambda size: "SKU" + " " * size + "!",
+    "item + long sku": lambda size: "Item " + "A" * size,
+    "item repeated": lambda size: "item " * (size // 5),
+    "item + many qty": lambda size: "Item A " + "qty 1 " * (size // 6)
+}
+
+def time_call(func, repeat):
+    """Run func repeat times with its output suppressed and return the best time in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start_time = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start_time)
+    return best
+
+def benchmark_lines(sizes, repeat):
+    """Time the per-line classifier against running all four line patterns on every line"""
+    from app.parser_v2 import extract_entities, RULES, LINE_RULE_GROUPS
+
+    patterns = [rule.pattern for name in LINE_RULE_GROUPS for rule in RULES.group(name)]
+
+    def search_every_pattern(lines):
+        for line in lines:
+            for pattern in patterns:
+                pattern.search(line)
+
+    def classify_every_line(lines):
+        for _ in RULES.search_lines(lines, LINE_RULE_GROUPS):
+            pass
+
+    print(f"{'lines':>8} {'4 searches ms':>14} {'classifier ms':>14} {'speedup':>8} "
+          f"{'extract ms':>11} {'us/line':>8}")
+    for size in sizes:
+        text = synthetic_invoice(size)
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+        baseline = time_call(lambda: search_every_pattern(lines), repeat)
+        classifier = time_call(lambda: classify_every_line(lines), repeat)
+        extract = time_call(lambda: extract_entities(text), repeat)
+
+        print(f"{size:>8} {baseline * 1000:>14.1f} {classifier * 1000:>14.1f} {baseline / classifier:>7.1f}x "
+              f"{extract * 1000:>11.1f} {extract * 1e6 / size:>8.1f}")
+
+def benchmark_pathological(sizes, repeat):
+    """Time the regex pass and the customer fallback patterns on adversarial inputs, without the time budget"""
+    from app.parser_v2 import (fill_regex_fields, SHIP_TO_CUSTOMER_RULES, WAREHOUSE_CUSTOMER_RULES,
+                               REGEX_TIME_BUDGET_MS)
+
+    def extract(text):
+        structured_data = {
+            "customer": {"value": "", "confidence": 0.0, "source": ""},
+            "order_id": {"value": "", "confidence": 0.0, "source": ""},
+            "line_items": [],
+            "shipping_address": {"value": "", "confidence": 0.0, "source": ""}
+        }
+        fill_regex_fields(text, structured_data)
+        SHIP_TO_CUSTOMER_RULES.first_match(text)
+        WAREHOUSE_CUSTOMER_RULES.first_match(text)
+
+    print(f"Budget per document: {REGEX_TIME_BUDGET_MS:.0f} ms (REGEX_TIME_BUDGET_MS)")
+    print(f"{'input':<20}" + "".join(f"{f'{size} chars ms':>16}" for size in sizes))
+    for name, make_text in PATHOLOGICAL_INPUTS.items():
+        times = [time_call(lambda: extract(make_text(size)), repeat) for size in sizes]
+        print(f"{name:<20}" + "".join(f"{elapsed * 1000:>16.2f}" for elapsed in times))
+
+def template_invoice(row_count, seed=0):
+    """
+    Build a purchase order in the layout of the example "globex-industrial" vendor template.
+
+    Args:
+        row_count (int): Number of line item rows
+        seed (int): Random seed
+
+    Returns:
+        str: Purchase order text
+    """
+    rng = random.Random(seed)
+    rows = [f"{i + 1} | AXL-{i:05d} | {rng.randint(1, 50)} | ${rng.randint(1, 500)}.{rng.randint(0, 99):02d}"
+            for i in range(row_count)]
+    return ("GLOBEX INDUSTRIAL SUPPLY\nPurchase Order\nPO Number: GX-20931\nCustomer: Acme Corporation\n"
+            "Ship To:\nAcme Corporation\n123 Main Street\nAustin, TX 78701\n\n"
+            "Line | SKU | Qty | Unit Price\n" + "\n".join(rows) + "\n\nTotal: $1000.00\n")
+
+def benchmark_templates(sizes, repeat):
+    """
+    Time the vendor template fast path against the generic regex and NER path on the same documents.
+
+    The LLM fallback isn't timed; the generic path hands documents it reads with low confidence to it.
+    """
+    from app.parser_v2 import extract_entities, postprocess_line_items, flatten_structured_data
+    from app.vendor_templates import EXAMPLE_TEMPLATES_PATH, load_template_registry
+
+    from app import ner_cache
+
+    registry = load_template_registry(EXAMPLE_TEMPLATES_PATH)
+    # Each document is new in production, so the generic path isn't timed on cached NER results
+    ner_cache.NER_CACHE_ENABLED = False
+
+    def read_with_template(text):
+        flatten_structured_data(registry.match(text).extract(text))
+
+    def read_generic(text):
+        structured_data = extract_entities(text)
+        structured_data["line_items"] = postprocess_line_items(structured_data["line_items"])
+        return flatten_structured_data(structured_data)
+
+    miss_text = synthetic_invoice(50)
+    miss = time_call(lambda: [registry.match(miss_text) for _ in range(1000)], repeat) / 1000
+    print(f"Fingerprint check on a document in no known layout: {miss * 1e6:.1f} us")
+    print(f"{'rows':>6} {'template us':>12} {'generic us':>12} {'speedup':>9} {'generic items':>14} {'generic conf':>13}")
+    for size in sizes:
+        text = template_invoice(size)
+        template = time_call(lambda: [read_with_template(text) for _ in range(100)], repeat) / 100
+        generic = time_call(lambda: read_generic(text), repeat)
+        with contextlib.redirect_stdout(io.StringIO()):
+            output = read_generic(text)
+        print(f"{size:>6} {template * 1e6:>12.1f} {generic * 1e6:>12.1f} {generic / template:>8.1f}x "
+              f"{len(output['line_items']):>14} {output['confidence']['overall']:>13.2f}")
+
+def benchmark_logging(sizes, repeat):
+    """Time parse_order_document with the parser diagnostics off, sampled and fully on"""
+    # Keep the LLM out of the timings
+    os.environ["USE_LLM_PARSER"] = "false"
+    os.environ["CONFIDENCE_THRESHOLD"] = "0"
+    from app import logging_utils
+    from app.parser_v2 import parse_order_document
+
+    app_logger = logging.getLogger("app")
+    level, propagate, sample_rate = app_logger.level, app_logger.propagate, logging_utils.DEBUG_SAMPLE_RATE
+    # Formatted records are written to /dev/null, so the timings include formatting and I/O but not a terminal
+    devnull = open(os.devnull, "w")
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    modes = [("INFO", logging.INFO, 1.0), ("DEBUG 1%", logging.DEBUG, 0.01), ("DEBUG", logging.DEBUG, 1.0)]
+
+    app_logger.addHandler(handler)
+    app_logger.propagate = False
+    try:
+        print(f"{'lines':>8}" + "".join(f"{name + ' ms':>14}" for name, _, _ in modes))
+        for size in sizes:
+            text = synthetic_invoice(size)
+            times = []
+            for _, mode_level, mode_rate in modes:
+                app_logger.setLevel(mode_level)
+                logging_utils.DEBUG_SAMPLE_RATE = mode_rate
+                times.append(time_call(lambda: parse_order_document(text), repeat))
+            print(f"{size:>8}" + "".join(f"{elapsed * 1000:>14.2f}" for elapsed in times))
+    finally:
+        app_logger.removeHandler(handler)
+        app_logger.setLevel(level)
+        app_logger.propagate = propagate
+        logging_utils.DEBUG_SAMPLE_RATE = sample_rate
+        devnull.close()
+
+def benchmark_memory(sizes):
+    """Measure the memory the line items of a document hold, and the peak memory of parsing it"""
+    os.environ["USE_LLM_PARSER"] = "false"
+    os.environ["CONFIDENCE_THRESHOLD"] = "0"
+    # tracemalloc slows parsing down enough to hit the regex time budget
+    os.environ["REGEX_TIME_BUDGET_MS"] = "0"
+    from app.parser_v2 import extract_entities, parse_order_document
+
+    print(f"{'lines':>8} {'line items':>11} {'bytes/item':>11} {'items KB':>10} {'parse peak KB':>14}")
+    for size in sizes:
+        text = synthetic_invoice(size)
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Memory still allocated once the line items are built, i.e. what they hold
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            line_items = extract_entities(text)["line_items"]
+            retained = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+
+            tracemalloc.start()
+            parse_order_document(text)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        print(f"{size:>8} {len(line_items):>11} {retained / max(1, len(line_items)):>11.0f} "
+              f"{retained / 1024:>10.0f} {peak / 1024:>14.0f}")
+
+def synthetic_line_items(item_count, seed=0):
+    """
+    Build the line items of a large order, as extract_entities finds them.
+
+    Every SKU appears about four times, with varying confidence, and one item
+    in twenty has a banned or malformed SKU.
+
+    Args:
+        item_count (int): Number of line items
+        seed (int): Random seed
+
+    Returns:
+        list: LineItems
+    """
+    from app.line_items import line_item
+
+    rng = random.Random(seed)
+    invalid_skus = ["s", "x", "12", "#12", "A1", "1234-X"]
+    items = []
+    for _ in range(item_count):
+        if rng.random() < 0.05:
+            sku = rng.choice(invalid_skus)
+        else:
+            sku = f"HTR-{rng.randrange(max(1, item_count // 4)):05d}"
+        items.append(line_item(sku, 1 + len(sku) % 3, 12.5, rng.choice([0.8, 0.9, 0.95]), "regex"))
+    return items
+
+def benchmark_postprocess(sizes, repeat):
+    """Time postprocess_line_items on large orders, to check it stays linear in the number of items"""
+    from app.parser_v2 import postprocess_line_items
+
+    print(f"{'items':>8} {'ms':>10} {'us/item':>10} {'kept':>8}")
+    for size in sizes:
+        items = synthetic_line_items(size)
+        elapsed = time_call(lambda: postprocess_line_items(items), repeat)
+        kept = len(postprocess_line_items(items))
+        print(f"{size:>8} {elapsed * 1000:>10.2f} {elapsed * 1e6 / size:>10.2f} {kept:>8}")
+
+def synthetic_parsed_documents(document_count, seed=0):
+    """
+    Build parser outputs with random field and line item confidences, without parsing anything.
+
+    Args:
+        document_count (int): Number of documents
+        seed (int): Random seed
+
+    Returns:
+        list: Documents with the "extraction_details" of parse_order_document output
+    """
+    from app.line_items import line_item
+
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(document_count):
+        details = {field: {"value": field, "confidence": rng.choice([0.0, 0.5, 0.7, 0.9, rng.random()]), "source": "regex"}
+                   for field in ("customer", "order_id", "shipping_address")}
+        details["line_items"] = [line_item(f"HTR-{i:05d}", 1, 12.5, rng.choice([0.8, 0.9, 0.95]), "regex").to_dict()
+                                 for i in range(rng.randrange(20))]
+        documents.append({"extraction_details": details})
+    return documents
+
+def benchmark_confidence(sizes, repeat):
+    """Compare rescoring parsed documents one at a time and as one NumPy batch"""
+    from app.confidence import SCORED_FIELDS, document_field_confidences, overall_confidence, overall_confidences
+
+    def score_each(documents):
+        scores = []
+        for document in documents:
+            details = document["extraction_details"]
+            confidence = {field: details[field]["confidence"] for field in SCORED_FIELDS[:-1]}
+            items = details["line_items"]
+            confidence["line_items"] = sum(item["sku"]["confidence"] for item in items) / max(1, len(items))
+            scores.append(overall_confidence(confidence))
+        return scores
+
+    print(f"{'documents':>10} {'loop ms':>10} {'batch ms':>10} {'scoring ms':>11} {'batch us/doc':>13}")
+    for size in sizes:
+        documents = synthetic_parsed_documents(size)
+        fields = document_field_confidences(documents)
+        each = time_call(lambda: score_each(documents), repeat)
+        batch = time_call(lambda: overall_confidences(document_field_confidences(documents)), repeat)
+        scoring = time_call(lambda: overall_confidences(fields), repeat)
+        print(f"{size:>10} {each * 1000:>10.2f} {batch * 1000:>10.2f} {scoring * 1000:>11.3f} {batch * 1e6 / size:>13.2f}")
+
+def benchmark_stream(sizes):
+    """Compare time and peak memory of parsing a text file whole and streaming it line by line"""
+    os.environ["USE_LLM_PARSER"] = "false"
+    os.environ["CONFIDENCE_THRESHOLD"] = "0"
+    os.environ["REGEX_TIME_BUDGET_MS"] = "0"
+    from app.ocr import extract_text, iter_text_lines
+    from app.parser_v2 import parse_order_document, parse_order_stream
+
+    def parse_whole(path):
+        return len(parse_order_document(extract_text(path)["text"])["line_items"])
+
+    def parse_streamed(path):
+        return sum(1 for record in parse_order_stream(iter_text_lines(path)[1]) if record["type"] == "line_item")
+
+    print(f"{'lines':>8} {'file KB':>8} {'whole ms':>10} {'whole peak KB':>14} "
+          f"{'stream ms':>10} {'stream peak KB':>15} {'first item ms':>14} {'items':>7}")
+    for size in sizes:
+        handle, path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(handle, "w") as f:
+            f.write(synthetic_invoice(size))
+        try:
+            results = []
+            for parse in (parse_whole, parse_streamed):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start_time = time.perf_counter()
+                    items = parse(path)
+                    elapsed = time.perf_counter() - start_time
+                    tracemalloc.start()
+                    parse(path)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                results.append((elapsed, peak, items))
+
+            # Time until the API could send the first line item
+            start_time = time.perf_counter()
+            next(record for record in parse_order_stream(iter_text_lines(path)[1]) if record["type"] == "line_item")
+            first_item = time.perf_counter() - start_time
+
+            (whole, whole_peak, items), (stream, stream_peak, _) = results
+            print(f"{size:>8} {os.path.getsize(path) / 1024:>8.0f} {whole * 1000:>10.1f} {whole_peak / 1024:>14.0f} "
+                  f"{stream * 1000:>10.1f} {stream_peak / 1024:>15.0f} {first_item * 1000:>14.1f} {items:>7}")
+        finally:
+            os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the regex-first parser on synthetic invoices")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    lines_parser = subparsers.add_parser("lines", help="Per-line line item classification")
+    lines_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000], help="Invoice sizes in lines")
+    lines_parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+
+    pathological_parser = subparsers.add_parser("pathological", help="Adversarial inputs for the extraction patterns")
+    pathological_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Input sizes in characters")
+    pathological_parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+
+    templates_parser = subparsers.add_parser("templates", help="Vendor template fast path against the generic parser")
+    templates_parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500], help="Line item rows per document")
+    templates_parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+
+    logging_parser = subparsers.add_parser("logging", help="Parse time with the parser diagnostics off, sampled and on")
+    logging_parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="Invoice sizes in lines")
+    logging_parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+
+    memory_parser = subparsers.add_parser("memory", help="Memory held by the line items of a document")
+    memory_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000], help="Invoice sizes in lines")
+
+    postprocess_parser = subparsers.add_parser("postprocess", help="Line item validation and deduplication on large orders")
+    postprocess_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Line items per order")
+    postprocess_parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+
+    stream_parser = subparsers.add_parser("stream", help="Whole-document parsing against streaming from a file")
+    stream_parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000], help="Invoice sizes in lines")
+
+    confidence_parser = subparsers.add_parser("confidence", help="Rescoring parsed documents one at a time against as a batch")
+    confidence_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Parsed documents")
+    confidence_parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+
+    args = parser.parse_args()
+    if args.benchmark == "lines":
+        benchmark_lines(args.sizes, args.repeat)
+    elif args.benchmark == "pathological":
+        benchmark_pathological(args.sizes, args.repeat)
+    elif args.benchmark == "templates":
+        benchmark_templates(args.sizes, args.repeat)
+    elif args.benchmark == "logging":
+        benchmark_logging(args.sizes, args.repeat)
+    elif args.benchmark == "memory":
+        benchmark_memory(args.sizes)
+    elif args.benchmark == "postprocess":
+        benchmark_postprocess(args.sizes, args.repeat)
+    elif args.benchmark == "stream":
+        benchmark_stream(args.sizes)
+    elif args.benchmark == "confidence":
+        benchmark_confidence(args.sizes, args.repeat)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
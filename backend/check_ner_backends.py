@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Accuracy-parity and latency check for the NER inference backends.
+
+Runs extract_ner() over the sample documents once per backend (each in its own
+process, configured through NER_INFERENCE_BACKEND exactly like a deployment)
+and compares the entities against the fp32 PyTorch reference.
+
+Usage:
+    python check_ner_backends.py [--backends torch-int8 onnx] [--min-agreement 0.95]
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import subprocess
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def sample_document_paths():
+    """Get the sample documents used for the parity check"""
+    patterns = [
+        os.path.join(BACKEND_DIR, "data", "sample_docs", "*.txt"),
+        os.path.join(BACKEND_DIR, "data", "sample_docs", "*.pdf"),
+        os.path.join(BACKEND_DIR, "data", "temp", "*.txt"),
+        os.path.join(os.path.dirname(BACKEND_DIR), "test_document.txt"),
+    ]
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern)))
+    return paths
+
+def run_worker(output_path):
+    """Run extract_ner over the sample documents with the configured backend and save the results"""
+    sys.path.insert(0, BACKEND_DIR)
+    from app.ocr import extract_text
+    from app.parser import extract_ner
+    from app.model_registry import get_model_report
+
+    documents = {}
+    for path in sample_document_paths():
+        extraction = extract_text(path)
+        if extraction["success"] and extraction["text"].strip():
+            documents[os.path.basename(path)] = extraction["text"]
+
+    # Warm up so the first document doesn't pay for model loading
+    extract_ner("Warm up")
+
+    results = {}
+    total_time = 0.0
+    for name, text in documents.items():
+        start_time = time.perf_counter()
+        entities = extract_ner(text)
+        total_time += time.perf_counter() - start_time
+        results[name] = [[entity, entity_type, confidence] for entity, entity_type, confidence in entities]
+
+    report = get_model_report()
+    with open(output_path, "w") as f:
+        json.dump({
+            "backend": report.get("backend"),
+            "weight_bytes": report.get("parameter_bytes"),
+            "rss_bytes": report.get("current_rss_bytes"),
+            "avg_latency_ms": 1000.0 * total_time / max(1, len(documents)),
+            "entities": results
+        }, f)
+
+def run_backend(backend):
+    """Run the worker for one backend in a child process"""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output_path = f.name
+    try:
+        env = dict(os.environ, NER_INFERENCE_BACKEND=backend)
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", output_path],
+            cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL
+        )
+        with open(output_path, "r") as f:
+            return json.load(f)
+    finally:
+        os.remove(output_path)
+
+def compare(reference, candidate):
+    """
+    Compare a backend's entities with the fp32 reference.
+
+    Returns:
+        dict: Entity agreement (F1 over (text, type) pairs) and max confidence difference
+    """
+    matched = 0
+    reference_total = 0
+    candidate_total = 0
+    max_confidence_diff = 0.0
+
+    for name, reference_entities in reference["entities"].items():
+        candidate_entities = candidate["entities"].get(name, [])
+        reference_keys = [(entity, entity_type) for entity, entity_type, _ in reference_entities]
+        candidate_keys = [(entity, entity_type) for entity, entity_type, _ in candidate_entities]
+        remaining = list(candidate_keys)
+        for key in reference_keys:
+            if key in remaining:
+                remaining.remove(key)
+                matched += 1
+        reference_total += len(reference_keys)
+        candidate_total += len(candidate_keys)
+
+        if reference_keys == candidate_keys:
+            for (_, _, ref_conf), (_, _, cand_conf) in zip(reference_entities, candidate_entities):
+                max_confidence_diff = max(max_confidence_diff, abs(ref_conf - cand_conf))
+
+    if reference_total == 0 and candidate_total == 0:
+        agreement = 1.0
+    else:
+        agreement = 2.0 * matched / (reference_total + candidate_total)
+    return {"agreement": agreement, "max_confidence_diff": max_confidence_diff}
+
+def main():
+    parser = argparse.ArgumentParser(description="Check accuracy parity of NER inference backends against fp32")
+    parser.add_argument("--backends", nargs="+", default=["torch-int8", "onnx"], help="Backends to compare with fp32 torch")
+    parser.add_argument("--min-agreement", type=float, default=0.95, help="Minimum entity agreement (F1) to pass")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        return 0
+
+    print(f"Sample documents: {len(sample_document_paths())}")
+    reference = run_backend("torch")
+    print(f"{'backend':<12} {'agreement':>10} {'max conf diff':>14} {'latency ms':>11} {'weights MB':>11}")
+    print(f"{'torch':<12} {1.0:>10.3f} {0.0:>14.4f} {reference['avg_latency_ms']:>11.1f} "
+          f"{reference['weight_bytes'] / (1024 * 1024):>11.1f}")
+
+    all_passed = True
+    for backend in args.backends:
+        result = run_backend(backend)
+        comparison = compare(reference, result)
+        passed = comparison["agreement"] >= args.min_agreement
+        all_passed = all_passed and passed
+        label = backend if result["backend"] == backend else f"{backend}->{result['backend']}"
+        print(f"{label:<12} {comparison['agreement']:>10.3f} {comparison['max_confidence_diff']:>14.4f} "
+              f"{result['avg_latency_ms']:>11.1f} {result['weight_bytes'] / (1024 * 1024):>11.1f}"
+              f"  {'PASSED' if passed else 'FAILED'}")
+
+    return 0 if all_passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,10 +19,10 @@ logger = logging.getLogger(__name__)
 
 # Import document extraction and parsing functions
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from app.utils import extract_text
-from app.parser_v2 import parse_order_document
+from app.ocr import extract_text
+from app.parser_engine import get_parser_engine
 
-def process_file(file_path, output_dir, use_llm=False, dry_run=False):
+def process_file(file_path, output_dir, use_llm=False, dry_run=False, extraction_result=None, parse_func=None):
     """
     Process a single document file and save the results
     
@@ -31,6 +31,8 @@ def process_file(file_path, output_dir, use_llm=False, dry_run=False):
         output_dir (str): Directory to save results
         use_llm (bool): Whether to force LLM parser or use auto-fallback
         dry_run (bool): If True, don't save results
+        extraction_result (dict): Previously extracted text for the file, if available
+        parse_func (callable): Function used to parse the extracted text (default: the parser engine)
         
     Returns:
         dict: Processing result information
@@ -48,7 +50,8 @@ def process_file(file_path, output_dir, use_llm=False, dry_run=False):
     
     try:
         # Extract text from file
-        extraction_result = extract_text(file_path)
+        if extraction_result is None:
+            extraction_result = extract_text(file_path)
         
         if not extraction_result['success']:
             logger.error(f"Text extraction failed for {filename}: {extraction_result.get('error', 'Unknown error')}")
@@ -60,7 +63,7 @@ def process_file(file_path, output_dir, use_llm=False, dry_run=False):
         
         # Parse the document
         start_time = time.time()
-        parsed_data = parse_order_document(extraction_result['text'])
+        parsed_data = (parse_func or get_parser_engine().parse)(extraction_result['text'])
         processing_time = time.time() - start_time
         
         # Determine which parser was used based on the source field
@@ -92,7 +95,7 @@ def process_file(file_path, output_dir, use_llm=False, dry_run=False):
             "error": str(e)
         }
 
-def batch_process(input_dir, output_dir, file_patterns=None, use_llm=False, dry_run=False, delay=0):
+def batch_process(input_dir, output_dir, file_patterns=None, use_llm=False, dry_run=False, delay=0, parser_version="v2"):
     """
     Process multiple documents from a directory
     
@@ -103,6 +106,8 @@ def batch_process(input_dir, output_dir, file_patterns=None, use_llm=False, dry_
         use_llm (bool): Whether to force LLM parser
         dry_run (bool): If True, don't save results
         delay (int): Delay in seconds between processing files (for API rate limits)
+        parser_version (str): Parser engine strategy: "v2" for the regex-first parser, "v1" for the
+                              NER-augmented parser with batched NER across all files, "llm" for the LLM
         
     Returns:
         list: Processing results for all files
@@ -129,11 +134,30 @@ def batch_process(input_dir, output_dir, file_patterns=None, use_llm=False, dry_
     
     logger.info(f"Found {len(files)} files to process")
     
+    engine = get_parser_engine()
+    extraction_results = [None] * len(files)
+    parse_funcs = [lambda text: engine.parse(text, parser_version)] * len(files)
+    
+    # With the NER parser, tag all documents up front in batched forward passes
+    if parser_version == "v1":
+        ner_parser = engine.strategy_module("v1")
+        extraction_results = [extract_text(str(file_path)) for file_path in files]
+        successful = [i for i, extraction in enumerate(extraction_results) if extraction['success']]
+        
+        start_time = time.time()
+        # Documents whose regex pass is already confident skip the model entirely
+        ner_entities = ner_parser.extract_needed_ner_batch([extraction_results[i]['text'] for i in successful])
+        ner_count = sum(1 for entities in ner_entities if entities is not None)
+        logger.info(f"Batched NER for {ner_count} of {len(successful)} documents took {time.time() - start_time:.2f}s")
+        
+        for i, entities in zip(successful, ner_entities):
+            parse_funcs[i] = lambda text, entities=entities: engine.parse(text, "v1", ner_entities=entities)
+    
     # Process each file
     results = []
     for i, file_path in enumerate(files):
         logger.info(f"Processing file {i+1}/{len(files)}: {file_path.name}")
-        result = process_file(str(file_path), output_dir, use_llm, dry_run)
+        result = process_file(str(file_path), output_dir, use_llm, dry_run, extraction_results[i], parse_funcs[i])
         results.append(result)
         
         # Print result summary
@@ -171,6 +195,8 @@ def main():
     parser.add_argument("--use-llm", action="store_true", help="Force LLM parser for all documents")
     parser.add_argument("--dry-run", action="store_true", help="Don't save results, just process")
     parser.add_argument("--delay", type=int, default=0, help="Delay in seconds between files (for API rate limits)")
+    parser.add_argument("--parser", choices=["v1", "v2", "llm"], default="v2",
+                        help="Parser to use: v2 (regex-first, default), v1 (NER-augmented, batched NER) or llm")
     
     args = parser.parse_args()
     
@@ -187,7 +213,8 @@ def main():
         args.patterns, 
         args.use_llm, 
         args.dry_run, 
-        args.delay
+        args.delay,
+        args.parser
     )
 
 if __name__ == "__main__":
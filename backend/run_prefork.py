@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Pre-fork server entry point.
+
+Loads the NER model once in the parent process, freezes it, then forks worker
+processes that all accept connections on the same listening socket. The model
+weights and everything else loaded before the fork are shared copy-on-write,
+so adding workers doesn't add a full copy of the model per worker.
+
+Usage:
+    python run_prefork.py [--workers 4] [--host 0.0.0.0] [--port 5000] [--report-interval 60]
+"""
+
+import os
+import gc
+import sys
+import time
+import socket
+import signal
+import argparse
+
+PREFORK_WORKERS = int(os.environ.get("PREFORK_WORKERS", "2"))
+PREFORK_HOST = os.environ.get("PREFORK_HOST", "0.0.0.0")
+PREFORK_PORT = int(os.environ.get("PREFORK_PORT", "5000"))
+PREFORK_REPORT_INTERVAL = float(os.environ.get("PREFORK_REPORT_INTERVAL", "60"))  # Seconds, 0 to disable
+
+def load_and_freeze():
+    """
+    Load the app and the shared NER model, and freeze them before forking.
+
+    The model is put in eval mode with gradients disabled on every parameter, and
+    gc.freeze() moves all objects created so far into a permanent generation so
+    the workers' garbage collector never touches (and un-shares) their pages.
+
+    Returns:
+        Flask app
+    """
+    import torch
+    from app import app
+    from app.model_registry import get_ner_components
+
+    _, model = get_ner_components()
+    model.eval()
+    if hasattr(model, "parameters"):
+        for param in model.parameters():
+            param.requires_grad_(False)
+    torch.set_grad_enabled(False)
+
+    gc.collect()
+    gc.freeze()
+    print(f"Froze {gc.get_freeze_count()} objects before forking")
+    return app
+
+def serve_worker(app, listen_socket, worker_index, worker_count):
+    """Run a threaded WSGI server on the inherited listening socket (never returns)"""
+    from werkzeug.serving import make_server
+    from app.runtime_config import configure_runtime, print_runtime_self_check
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+
+    # Each worker gets its own thread budget and, with NER_CPU_AFFINITY=auto, its own cores
+    os.environ["PREFORK_WORKER_INDEX"] = str(worker_index)
+    configure_runtime(worker_index=worker_index, worker_count=worker_count)
+    print_runtime_self_check(worker_count)
+
+    host, port = listen_socket.getsockname()[:2]
+    server = make_server(host, port, app, threaded=True, fd=listen_socket.fileno())
+    print(f"Worker {os.getpid()} serving on {host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(0)
+
+def spawn_worker(app, listen_socket, worker_index, worker_count):
+    """Fork a worker process and return its pid"""
+    pid = os.fork()
+    if pid == 0:
+        serve_worker(app, listen_socket, worker_index, worker_count)
+    return pid
+
+def memory_report(pids):
+    """
+    Print shared vs private memory for the parent and every worker.
+
+    Args:
+        pids (list): Worker process ids
+    """
+    from app.model_registry import get_process_memory
+
+    mb = 1024 * 1024
+    print(f"{'process':<16} {'rss MB':>9} {'shared MB':>10} {'private MB':>11} {'pss MB':>9}")
+    total_pss = 0
+    for label, pid in [("parent", os.getpid())] + [(f"worker {pid}", pid) for pid in pids]:
+        memory = get_process_memory(pid)
+        if memory is None:
+            print(f"{label:<16} (memory information not available)")
+            continue
+        total_pss += memory["pss_bytes"]
+        print(f"{label:<16} {memory['rss_bytes'] / mb:>9.1f} {memory['shared_bytes'] / mb:>10.1f} "
+              f"{memory['private_bytes'] / mb:>11.1f} {memory['pss_bytes'] / mb:>9.1f}")
+    # PSS splits shared pages between the processes using them, so it adds up to the real footprint
+    print(f"{'total (pss)':<16} {total_pss / mb:>54.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with workers forked after loading the NER model")
+    parser.add_argument("--workers", type=int, default=PREFORK_WORKERS, help="Number of worker processes")
+    parser.add_argument("--host", default=PREFORK_HOST, help="Host to listen on")
+    parser.add_argument("--port", type=int, default=PREFORK_PORT, help="Port to listen on")
+    parser.add_argument("--report-interval", type=float, default=PREFORK_REPORT_INTERVAL,
+                        help="Seconds between memory reports (0 to disable; send SIGUSR1 for one on demand)")
+    args = parser.parse_args()
+
+    worker_count = max(1, args.workers)
+    # Lets the runtime self-check account for all workers sharing the machine
+    os.environ["PREFORK_WORKERS"] = str(worker_count)
+    app = load_and_freeze()
+
+    listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listen_socket.bind((args.host, args.port))
+    listen_socket.listen(128)
+    listen_socket.set_inheritable(True)
+
+    # Map worker pid -> worker index, so a replacement takes over the same cores
+    workers = {spawn_worker(app, listen_socket, index, worker_count): index for index in range(worker_count)}
+    print(f"Started {len(workers)} workers on {args.host}:{args.port}")
+
+    state = {"stopping": False, "report": False}
+
+    def stop(signum, frame):
+        state["stopping"] = True
+
+    def request_report(signum, frame):
+        state["report"] = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, request_report)
+
+    next_report = time.monotonic() + min(5.0, args.report_interval) if args.report_interval > 0 else None
+    while not state["stopping"]:
+        # Replace workers that exited unexpectedly
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid and pid in workers:
+            index = workers.pop(pid)
+            print(f"Worker {pid} exited with status {status}, starting a replacement")
+            workers[spawn_worker(app, listen_socket, index, worker_count)] = index
+
+        if state["report"] or (next_report is not None and time.monotonic() >= next_report):
+            memory_report(sorted(workers))
+            state["report"] = False
+            if next_report is not None:
+                next_report = time.monotonic() + args.report_interval
+
+        time.sleep(0.5)
+
+    print("Stopping workers...")
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    listen_socket.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Test script for the confidence calibration shared by the parser and the LLM fallback
+"""
+import os
+import random
+
+import numpy as np
+
+from app import parser
+from app.confidence import (FIELD_WEIGHTS, SCORED_FIELDS, document_field_confidences, overall_confidence,
+                            overall_confidences, rescore_documents)
+from app.llm_fallback import create_structured_result
+from app.parser_v2 import parse_order_document
+from benchmark_parser import synthetic_invoice, synthetic_parsed_documents
+
+# Keep the LLM out of parse_order_document
+os.environ["USE_LLM_PARSER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0"
+
+INFORMAL_DOCUMENT = """hey, pls send 12x of HTR-1204 @ $32.00 and 3x of ABC-9981 @ $5
+ship to Acme Corp
+123 Main Street
+Springfield, IL
+
+thanks
+Ref #: XTZ-54821-A"""
+
+def test_batch_matches_single():
+    """Scoring a batch should give exactly the per-document scores, boundaries included"""
+    print("\n==== Testing Batch Against Single Scoring ====")
+    rng = random.Random(0)
+    rows = [[rng.choice([0, 0.5, 0.6, 0.6000001, 0.8, 0.95, rng.random()]) for _ in SCORED_FIELDS]
+            for _ in range(10000)]
+
+    batch = overall_confidences(np.array(rows))
+    single = [overall_confidence(dict(zip(SCORED_FIELDS, row))) for row in rows]
+    mismatches = sum(1 for a, b in zip(batch.tolist(), single) if a != b)
+    print(f"{len(rows)} documents, {mismatches} mismatches")
+
+    # A different calibration can be tried on the same field confidences
+    flat = overall_confidences(np.array(rows), {field: 1.0 for field in FIELD_WEIGHTS})
+    print(f"Mean overall: {batch.mean():.4f} weighted, {flat.mean():.4f} unweighted")
+
+    success = mismatches == 0 and len(batch) == len(rows) and not np.array_equal(batch, flat)
+    print(f"Batch against single test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_rescore_parser_output():
+    """Rescoring parser output from its extraction details should reproduce its confidence"""
+    print("\n==== Testing Rescoring Parser Output ====")
+    documents = [parse_order_document(text) for text in
+                 (INFORMAL_DOCUMENT, "nothing to see here", synthetic_invoice(50), synthetic_invoice(500, seed=1))]
+    stored = [document["confidence"] for document in documents]
+
+    fields = document_field_confidences(documents)
+    overall = rescore_documents(documents)
+    for before, document in zip(stored, documents):
+        print(f"overall {before['overall']:.4f} -> {document['confidence']['overall']:.4f}")
+
+    success = (fields.shape == (len(documents), len(SCORED_FIELDS)) and
+               overall.tolist() == [confidence["overall"] for confidence in stored] and
+               [document["confidence"] for document in documents] == stored)
+    print(f"Rescore parser output test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_llm_calibration():
+    """LLM results should be scored with the same calibration as parser results"""
+    print("\n==== Testing LLM Calibration ====")
+    parsed = [
+        {"customer": "Acme Corp", "order_id": "PO-1", "shipping_address": "1 Main St",
+         "line_items": [{"sku": "HTR-1204", "quantity": 12, "price": 32.0}]},
+        {"customer": "Acme Corp", "order_id": "", "shipping_address": "", "line_items": []},
+        {"customer": "", "order_id": "", "shipping_address": "", "line_items": []}
+    ]
+    results = [create_structured_result(data) for data in parsed]
+    overall = [result["confidence"]["overall"] for result in results]
+    print(f"LLM overall confidences: {[round(value, 4) for value in overall]}")
+
+    success = (overall == [overall_confidence(result["confidence"]) for result in results] and
+               overall == rescore_documents(results).tolist() and
+               overall[0] > overall[1] > overall[2] == 0)
+
+    # Documents of both kinds can be rescored together
+    documents = synthetic_parsed_documents(1000) + results
+    success = success and len(rescore_documents(documents)) == len(documents)
+    print(f"LLM calibration test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_rescore_v1_output():
+    """Parser v1 output should be rescored with its own calibration, the plain mean"""
+    print("\n==== Testing Rescoring Parser v1 Output ====")
+    documents = [parser.parse_order_document(text) for text in
+                 (INFORMAL_DOCUMENT, "nothing to see here", synthetic_invoice(50))]
+    stored = [dict(document["confidence"]) for document in documents]
+
+    weighted = rescore_documents([dict(document) for document in documents]).tolist()
+    overall = rescore_documents(documents, calibration="mean")
+    for before, after, other in zip(stored, overall.tolist(), weighted):
+        print(f"overall {before['overall']:.4f} -> {after:.4f} (weighted calibration: {other:.4f})")
+
+    try:
+        rescore_documents(documents, calibration="bogus")
+        rejected = False
+    except ValueError as e:
+        print(f"Rejected: {str(e)}")
+        rejected = True
+
+    success = (overall.tolist() == [confidence["overall"] for confidence in stored] and
+               [document["confidence"] for document in documents] == stored and
+               weighted != overall.tolist() and rejected)
+    print(f"Rescore v1 output test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_batch_matches_single(),
+        test_rescore_parser_output(),
+        test_llm_calibration(),
+        test_rescore_v1_output()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
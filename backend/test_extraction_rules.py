@@ -0,0 +1,180 @@
+"""
+Test script for the declarative extraction rule sets shared by the parsers
+"""
+import os
+import json
+import tempfile
+
+from app.extraction_rules import DEFAULT_RULES_PATH, RuleSet, load_rule_set, match_value, read_rule_file
+from app import parser, parser_v2
+
+# A vendor that labels the customer "Bill To" and bans its placeholder SKU
+VENDOR_RULES = {
+    "groups": {
+        "customer.label": [
+            {
+                "description": "Bill To: Initech LLC",
+                "keywords": ["bill"],
+                "pattern": r"bill\s+to\s*:\s*(?P<value>[A-Za-z0-9][A-Za-z0-9 ]{0,200})"
+            }
+        ]
+    },
+    "lists": {
+        "banned_skus": ["TBD-000"]
+    }
+}
+
+VENDOR_RULES_YAML = """
+groups:
+  customer.label:
+    - description: "Bill To: Initech LLC"
+      keywords: [bill]
+      pattern: 'bill\\s+to\\s*:\\s*(?P<value>[A-Za-z0-9][A-Za-z0-9 ]{0,200})'
+lists:
+  banned_skus: [TBD-000]
+"""
+
+def write_rule_file(content, suffix):
+    """Write a rule file to a temporary path and return the path"""
+    handle, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(handle, "w") as f:
+        f.write(content)
+    return path
+
+def test_default_rules():
+    """The default rule set should compile and define everything the parsers read"""
+    print("\n==== Testing Default Rule Set ====")
+    rules = load_rule_set("")
+    spec = read_rule_file(DEFAULT_RULES_PATH)
+    print(f"Groups: {len(rules.groups)}, rules: {sum(len(group) for group in rules.groups.values())}, "
+          f"lists: {len(rules.lists)}")
+
+    success = set(rules.groups) == set(spec["groups"]) and set(rules.lists) == set(spec["lists"])
+    # Both parsers share the process-wide rule set, compiled once
+    success = success and parser.RULES is parser_v2.RULES and parser_v2.RULES.sources == [DEFAULT_RULES_PATH]
+
+    text = "Order ID: PO-12345\nCustomer: Acme Corporation\nRef #: XTZ-1\n"
+    positions = parser_v2.KEYWORD_SCANNER.scan(text)
+    po_match = rules.group("order_id.po_direct").first_match(text, positions)
+    customer_match = rules.group("customer.label").first_match(text, positions)
+    success = (success and match_value(po_match) == "PO-12345" and
+               match_value(customer_match).strip() == "Acme Corporation" and
+               rules.group("sku.valid_format").match("AXL-9920") is not None and
+               rules.group("sku.valid_format").match("axl") is None)
+
+    print(f"Default rule set test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_vendor_rule_file():
+    """A JSON or YAML rule file should replace only the groups and lists it defines"""
+    print("\n==== Testing Vendor Rule File ====")
+    paths = [write_rule_file(json.dumps(VENDOR_RULES), ".json")]
+    try:
+        import yaml  # noqa: F401
+        paths.append(write_rule_file(VENDOR_RULES_YAML, ".yaml"))
+    except ImportError:
+        print("PyYAML not installed, only testing the JSON rule file")
+
+    text = "Bill To: Initech LLC\nCustomer: Acme Corporation\nOrder ID: ORD-1\n"
+    success = True
+    try:
+        for path in paths:
+            rules = load_rule_set(path)
+            customer_match = rules.group("customer.label").first_match(text, rules.keyword_scanner(["customer.label"]).scan(text))
+            customer = match_value(customer_match).strip() if customer_match else None
+            print(f"{os.path.splitext(path)[1]}: customer '{customer}', banned SKUs {rules.get_list('banned_skus')}")
+            success = (success and customer == "Initech LLC" and rules.get_list("banned_skus") == ("TBD-000",) and
+                       rules.get_list("output_banned_skus") == load_rule_set("").get_list("output_banned_skus") and
+                       match_value(rules.group("order_id.general").first_match(text)) == "ORD-1" and
+                       rules.sources[-1] == path)
+    finally:
+        for path in paths:
+            os.remove(path)
+
+    print(f"Vendor rule file test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_rule_stats():
+    """Each rule should count its calls, hits and matching time"""
+    print("\n==== Testing Rule Stats ====")
+    rules = load_rule_set("")
+    lines = ["SKU: WID-00001", "Quantity: 4", "Price: $12.00", "Heavy duty fastener assembly", "Part #HTR-22 | Qty: 2"]
+    matches = list(rules.search_lines(lines, parser_v2.LINE_RULE_GROUPS))
+    text = "Order: ABC-1\nOrder: ABC-2\n"
+    rules.group("order_id.fallback").first_match(text)
+    list(rules.group("line_items.informal").iter_matches("12x of HTR-1204 @ $32.00 and 3x of ABC-9981 @ $5"))
+
+    stats = rules.get_stats()["rules"]
+    for name in ("line.sku[0]", "line.part[0]", "order_id.fallback[0]", "order_id.fallback[3]", "line_items.informal[0]"):
+        print(f"{name}: {stats[name]}")
+
+    success = ([match is not None for match in matches[0]] == [True, False, False, False] and
+               matches[3] == (None, None, None, None) and
+               # The line without keywords skips every pattern, "#" is required for the part rule
+               stats["line.sku[0]"]["calls"] == 2 and stats["line.sku[0]"]["hits"] == 2 and
+               stats["line.part[0]"]["calls"] == 1 and stats["line.part[0]"]["hits"] == 1 and
+               stats["order_id.fallback[0]"]["calls"] == 1 and stats["order_id.fallback[0]"]["hits"] == 0 and
+               stats["order_id.fallback[3]"]["hits"] == 1 and stats["order_id.fallback[4]"]["calls"] == 0 and
+               stats["line_items.informal[0]"]["hits"] == 2 and
+               all(rule["time_ms"] >= 0 for rule in stats.values()))
+
+    rules.reset_stats()
+    success = success and all(rule["calls"] == 0 for rule in rules.get_stats()["rules"].values())
+    print(f"Rule stats test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_invalid_rules():
+    """Malformed rules should fail at load time with the rule named in the error"""
+    print("\n==== Testing Invalid Rules ====")
+    invalid_specs = [
+        {"groups": {"customer.label": [{"pattern": "customer:\\s*(["}]}},
+        {"groups": {"customer.label": [{"pattern": "customer", "keywords": ["Customer"]}]}},
+        {"groups": {"customer.label": [{"pattern": "customer", "keyword": ["customer"]}]}},
+        {"groups": {"customer.label": [{"pattern": "customer", "flags": ["VERBOSE"]}]}},
+        {"groups": {"customer.label": []}},
+        {"lists": {"banned_skus": "TBD-000"}}
+    ]
+    success = True
+    for spec in invalid_specs:
+        try:
+            RuleSet(spec)
+            print(f"No error for {spec}")
+            success = False
+        except ValueError as e:
+            print(f"Rejected: {str(e)}")
+            success = success and ("customer.label" in str(e) or "banned_skus" in str(e))
+
+    path = write_rule_file("{not json", ".json")
+    try:
+        load_rule_set(path)
+        success = False
+    except ValueError as e:
+        print(f"Rejected: {str(e)}")
+    finally:
+        os.remove(path)
+
+    # Keywords that start with another keyword are tried where the shorter one starts
+    rules = RuleSet({"groups": {
+        "a": [{"pattern": "port\\s*(\\d+)", "keywords": ["port"]}],
+        "b": [{"pattern": "po\\s*(\\d+)", "keywords": ["po"]}]
+    }})
+    text = "po x port 7 po 8"
+    positions = rules.keyword_scanner(["a", "b"]).scan(text)
+    success = (success and match_value(rules.group("a").first_match(text, positions)) == "7" and
+               match_value(rules.group("b").first_match(text, positions)) == "8")
+
+    print(f"Invalid rules test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_default_rules(),
+        test_vendor_rule_file(),
+        test_rule_stats(),
+        test_invalid_rules()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
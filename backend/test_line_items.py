@@ -0,0 +1,90 @@
+"""
+Test script for the compact line item representation used by the parsers
+"""
+import os
+import json
+import tracemalloc
+
+from app import parser, parser_v2
+from app.line_items import FieldValue, LineItem, line_item
+from benchmark_parser import synthetic_invoice
+
+# Keep the LLM out of parse_order_document
+os.environ["USE_LLM_PARSER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0"
+
+def test_line_item_format():
+    """Line items should convert to the API formats, and read like the dicts they replace"""
+    print("\n==== Testing Line Item Format ====")
+    item = LineItem(FieldValue("AXL-9920", 0.8, "regex-line"))
+    item.fill_defaults()
+    details = item.to_dict()
+    print(f"Extraction details: {details}")
+
+    success = (details == {
+                   "sku": {"value": "AXL-9920", "confidence": 0.8, "source": "regex-line"},
+                   "quantity": {"value": 1, "confidence": 0.5, "source": "default", "warning": True},
+                   "price": {"value": 0.0, "confidence": 0.5, "source": "default", "warning": True}
+               } and
+               item.to_flat() == {"sku": "AXL-9920", "quantity": 1, "price": 0.0} and
+               LineItem.from_dict(details) == item and LineItem.from_dict(item) is item and
+               item["sku"]["value"] == "AXL-9920" and item.get("price").get("warning") is True and
+               item["sku"].get("warning") is None and "sku" in item and
+               "price" not in LineItem(FieldValue("AXL-9920", 0.8, "regex-line")) and
+               line_item("MNT-8833", 10, 44.99, 0.9, "regex").to_dict()["quantity"] ==
+               {"value": 10, "confidence": 0.9, "source": "regex"})
+
+    print(f"Line item format test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_parser_output():
+    """Both parsers should return plain dicts in the extraction details, in the previous format"""
+    print("\n==== Testing Parser Output ====")
+    text = synthetic_invoice(200) + "SKU: LST-00001\n"
+    success = True
+    for module in (parser, parser_v2):
+        output = module.parse_order_document(text)
+        details = output["extraction_details"]["line_items"]
+        # Fails on anything but plain JSON types
+        json.dumps(output)
+        defaults = [item for item in details if item["price"].get("warning")]
+        print(f"{module.__name__}: {len(output['line_items'])} line items, {len(defaults)} with a default price")
+        success = (success and len(details) == len(output["line_items"]) > 0 and
+                   all(type(item) is dict and set(item) == {"sku", "quantity", "price"} and
+                       all(type(field) is dict for field in item.values()) for item in details) and
+                   [item["sku"]["value"] for item in details] == [item["sku"] for item in output["line_items"]] and
+                   any(item["sku"]["value"] == "LST-00001" for item in defaults))
+
+    print(f"Parser output test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_line_item_memory():
+    """Line items should take well under half the memory of the nested dicts"""
+    print("\n==== Testing Line Item Memory ====")
+    items = [line_item(f"SKU-{i:05d}", i, i * 1.25, 0.9, "regex") for i in range(2000)]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    compact = [line_item(f"SKU-{i:05d}", i, i * 1.25, 0.9, "regex") for i in range(2000)]
+    compact_size = tracemalloc.get_traced_memory()[0] - before
+    before = tracemalloc.get_traced_memory()[0]
+    nested = [item.to_dict() for item in items]
+    nested_size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"2000 line items: {compact_size / 1024:.0f} KB as LineItems, {nested_size / 1024:.0f} KB as dicts")
+    success = len(compact) == len(nested) and compact_size < nested_size / 2
+
+    print(f"Line item memory test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_line_item_format(),
+        test_parser_output(),
+        test_line_item_memory()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
@@ -0,0 +1,129 @@
+"""
+Test script for the leveled, sampled logging of the parser diagnostics
+"""
+import os
+import logging
+
+from app import logging_utils, parser_v2
+from app.logging_utils import debug_enabled, get_logger, sample_debug
+from benchmark_parser import synthetic_invoice
+
+# Keep the LLM out of parse_order_document
+os.environ["USE_LLM_PARSER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0"
+
+class RecordCollector(logging.Handler):
+    """Keep the records logged by the app's loggers"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def parse_with_logging(texts, level, sample_rate=1.0):
+    """Parse texts with the app loggers at a level and sample rate, returning the records they logged"""
+    app_logger = logging.getLogger("app")
+    collector = RecordCollector()
+    previous = (app_logger.level, app_logger.propagate, logging_utils.DEBUG_SAMPLE_RATE)
+    app_logger.addHandler(collector)
+    app_logger.propagate = False
+    app_logger.setLevel(level)
+    logging_utils.DEBUG_SAMPLE_RATE = sample_rate
+    try:
+        for text in texts:
+            parser_v2.parse_order_document(text)
+    finally:
+        app_logger.removeHandler(collector)
+        app_logger.setLevel(previous[0])
+        app_logger.propagate = previous[1]
+        logging_utils.DEBUG_SAMPLE_RATE = previous[2]
+    return collector.records
+
+def test_silent_by_default():
+    """At INFO, parsing a document should log nothing and format no diagnostics"""
+    print("\n==== Testing Silent Default ====")
+    records = parse_with_logging([synthetic_invoice(200)], logging.INFO)
+    print(f"Records at INFO: {len(records)}")
+
+    success = records == [] and not debug_enabled(parser_v2.logger)
+    print(f"Silent default test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_debug_diagnostics():
+    """At DEBUG, the per-document and per-item diagnostics should be logged with lazy arguments"""
+    print("\n==== Testing Debug Diagnostics ====")
+    records = parse_with_logging([synthetic_invoice(200)], logging.DEBUG)
+    messages = [record.getMessage() for record in records]
+    print(f"Records at DEBUG: {len(records)}, first: {messages[:2]}")
+
+    success = (any(message.startswith("Starting parse_order_document") for message in messages) and
+               any(message.startswith("Result Item") for message in messages) and
+               all(record.levelno == logging.DEBUG for record in records) and
+               # Arguments are only formatted when a handler asks for the message
+               any(record.args for record in records))
+    print(f"Debug diagnostics test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_debug_sampling():
+    """The sample rate should pick whole documents, and keep warnings of the others"""
+    print("\n==== Testing Debug Sampling ====")
+    texts = [synthetic_invoice(20, seed) for seed in range(40)]
+    none = parse_with_logging(texts, logging.DEBUG, 0.0)
+    some = parse_with_logging(texts, logging.DEBUG, 0.25)
+    starts = sum(1 for record in some if record.getMessage().startswith("Starting parse_order_document"))
+    finishes = sum(1 for record in some if record.getMessage().startswith("Finished parse_order_document"))
+    print(f"Records at rate 0: {len(none)}, sampled documents at rate 0.25: {starts}/{len(texts)}")
+
+    logger = get_logger("app.test_logging")
+    collector = RecordCollector()
+    logger.addHandler(collector)
+    previous = logging_utils.DEBUG_SAMPLE_RATE
+    logging.getLogger("app").setLevel(logging.DEBUG)
+    logging_utils.DEBUG_SAMPLE_RATE = 0.0
+
+    @sample_debug
+    def inner():
+        logger.debug("inner")
+        return debug_enabled(logger)
+
+    @sample_debug
+    def outer():
+        logger.warning("kept")
+        logger.debug("dropped")
+        return inner()
+
+    try:
+        nested_enabled = outer()
+    finally:
+        logger.removeHandler(collector)
+        logging.getLogger("app").setLevel(logging_utils.LOG_LEVEL)
+        logging_utils.DEBUG_SAMPLE_RATE = previous
+
+    success = (none == [] and 0 < starts < len(texts) and starts == finishes and not nested_enabled and
+               [record.getMessage() for record in collector.records] == ["kept"])
+    print(f"Debug sampling test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_routes_logger():
+    """The API routes should log through a module logger"""
+    print("\n==== Testing Routes Logger ====")
+    from app import routes
+
+    success = isinstance(routes.logger, logging.Logger) and routes.logger.name == "app.routes"
+    print(f"Routes logger test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_silent_by_default(),
+        test_debug_diagnostics(),
+        test_debug_sampling(),
+        test_routes_logger()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
@@ -0,0 +1,104 @@
+"""
+Test script for the local NER model bundle
+"""
+import os
+import sys
+import json
+import ctypes
+import tempfile
+import subprocess
+
+import torch
+from transformers import AutoTokenizer, AutoModelForTokenClassification
+
+from app.model_registry import NER_MODEL_NAME
+from app.model_bundle import create_bundle, load_bundle, is_bundle
+from app.ner_backends import BACKEND_TORCH, BACKEND_TORCH_INT8, quantize_int8
+
+SAMPLE_TEXT = "Order ID: ORD-12345. Customer: John Smith, Acme Corporation, Austin"
+
+def test_bundle_matches_hub_model():
+    """A model loaded from the bundle should produce the same logits as from_pretrained"""
+    print("\n==== Testing Bundle Round Trip ====")
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        create_bundle(NER_MODEL_NAME, bundle_dir, quantize=True)
+
+        reference_tokenizer = AutoTokenizer.from_pretrained(NER_MODEL_NAME)
+        reference_model = AutoModelForTokenClassification.from_pretrained(NER_MODEL_NAME)
+        reference_model.eval()
+        inputs = reference_tokenizer(SAMPLE_TEXT, return_tensors="pt")
+
+        tokenizer, model = load_bundle(bundle_dir, BACKEND_TORCH)
+        _, int8_model = load_bundle(bundle_dir, BACKEND_TORCH_INT8)
+
+        with torch.no_grad():
+            expected = reference_model(**inputs).logits
+            actual = model(**tokenizer(SAMPLE_TEXT, return_tensors="pt")).logits
+            int8_logits = int8_model(**inputs).logits
+
+        # The fp32 weights should point into the memory-mapped file rather than a private copy
+        mapping = model._bundle_mapping
+        start = ctypes.addressof(ctypes.c_char.from_buffer(mapping))
+        mapped = [start <= param.data_ptr() < start + len(mapping) for param in model.parameters()]
+
+        max_diff = (actual - expected).abs().max().item()
+        print(f"Bundle detected: {is_bundle(bundle_dir)}")
+        print(f"Max fp32 logit difference: {max_diff}")
+        print(f"Memory-mapped parameters: {sum(mapped)}/{len(mapped)}")
+
+        success = is_bundle(bundle_dir) and max_diff == 0.0 and all(mapped) and int8_logits.shape == expected.shape
+        del model, mapping
+
+    print(f"Bundle test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_int8_bundle_in_fresh_process():
+    """A worker starting from an int8 bundle should get the same logits as quantizing the model itself"""
+    print("\n==== Testing Int8 Bundle In A Fresh Process ====")
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        create_bundle(NER_MODEL_NAME, bundle_dir, quantize=True)
+
+        code = ("import json, torch; from app.model_bundle import load_bundle; "
+                "from app.ner_backends import BACKEND_TORCH_INT8; "
+                f"tokenizer, model = load_bundle({bundle_dir!r}, BACKEND_TORCH_INT8); "
+                "torch.set_grad_enabled(False); "
+                f"print(json.dumps(model(**tokenizer({SAMPLE_TEXT!r}, return_tensors='pt')).logits.tolist()))")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode != 0:
+            print(result.stderr.strip().splitlines()[-1])
+            print("Int8 bundle test FAILED")
+            return False
+        actual = torch.tensor(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    tokenizer = AutoTokenizer.from_pretrained(NER_MODEL_NAME)
+    reference_model = AutoModelForTokenClassification.from_pretrained(NER_MODEL_NAME)
+    reference_model.eval()
+    with torch.no_grad():
+        expected = quantize_int8(reference_model)(**tokenizer(SAMPLE_TEXT, return_tensors="pt")).logits
+
+    max_diff = (actual - expected).abs().max().item()
+    print(f"Max int8 logit difference: {max_diff}")
+
+    success = actual.shape == expected.shape and max_diff < 1e-4
+    print(f"Int8 bundle test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_incomplete_bundle_is_ignored():
+    """A directory without a manifest (e.g. an interrupted build) must not be used as a bundle"""
+    print("\n==== Testing Incomplete Bundle Detection ====")
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        success = not is_bundle(bundle_dir) and not is_bundle("")
+    print(f"Incomplete bundle test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_bundle_matches_hub_model(),
+        test_int8_bundle_in_fresh_process(),
+        test_incomplete_bundle_is_ignored()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
@@ -0,0 +1,61 @@
+"""
+Test script for the shared NER model registry
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from app import model_registry
+from app.ner_model import load_model
+import app.parser
+import app.parser_v2
+
+def test_lazy_loading():
+    """Importing the parser modules should not load the model"""
+    print("\n==== Testing Lazy Loading ====")
+
+    success = not model_registry.is_loaded()
+    print(f"Model loaded after importing parsers: {model_registry.is_loaded()}")
+    print(f"Lazy loading test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_single_shared_instance():
+    """Concurrent callers and all parser modules should get the same model"""
+    print("\n==== Testing Single Shared Instance ====")
+
+    # Request the model from several threads at once
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: model_registry.get_ner_components(), range(8)))
+
+    model_ids = {id(model) for _, model in results}
+    tokenizer_ids = {id(tokenizer) for tokenizer, _ in results}
+
+    # The legacy ner_model.load_model() entry point must return the same objects
+    tokenizer, model = load_model()
+
+    success = (
+        len(model_ids) == 1 and
+        len(tokenizer_ids) == 1 and
+        id(model) in model_ids and
+        id(tokenizer) in tokenizer_ids
+    )
+    print(f"Distinct models: {len(model_ids)}, distinct tokenizers: {len(tokenizer_ids)}")
+    print(f"Shared instance test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_model_report():
+    """The registry should report load time and memory information"""
+    print("\n==== Testing Model Report ====")
+
+    report = model_registry.get_model_report()
+    print(json.dumps(report, indent=2))
+
+    success = report["loaded"] and report["load_time_seconds"] >= 0 and report["parameter_bytes"] > 0
+    print(f"Model report test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [test_lazy_loading(), test_single_shared_instance(), test_model_report()]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
@@ -100,7 +100,8 @@ def test_entity_extraction():
     
     print(f"Original text:\n{text}\n")
     print("Extracted entities:")
-    print(json.dumps(structured_data, indent=2))
+    # Line items are LineItem objects while parsing
+    print(json.dumps(structured_data, indent=2, default=lambda item: item.to_dict()))
     
     # Check that we have some structured data
     is_success = bool(structured_data["order_id"]["value"]) and bool(structured_data["customer"]["value"]) and len(structured_data["line_items"]) > 0
@@ -0,0 +1,66 @@
+"""
+Test script for batched NER across many documents
+"""
+import time
+from app.parser import extract_ner, extract_ner_batch, parse_order_document, parse_order_documents
+
+SAMPLE_TEXTS = [
+    "Order ID: ORD-12345\nCustomer: John Smith\nShipping Address: 123 Main St, Anytown, USA",
+    "PO Number: PO-10023\nCustomer: Acme Corporation\nShip to: 500 Industrial Way, Austin, TX",
+    "Please send 12x of HTR-1204 @ $32.00 to our warehouse in Berlin. Thanks, Angela Merkel",
+    "",
+    "Order #: INV-78439\nCustomer: Initech LLC\n" + "Item: PRT-0042 | Qty: 3 | Price: $9.99\n" * 150,
+]
+
+# Padded batches can change the last bits of the model's scores, like in test_ner_scheduler
+CONFIDENCE_TOLERANCE = 1e-4
+
+def same_entities(single, batch):
+    """Compare entity lists: text and type exactly, confidences within CONFIDENCE_TOLERANCE"""
+    return len(single) == len(batch) and all(
+        a[:2] == b[:2] and abs(a[2] - b[2]) < CONFIDENCE_TOLERANCE for a, b in zip(single, batch))
+
+def same_output(single, batch, confidence=False):
+    """Compare parse outputs exactly, except confidences (within CONFIDENCE_TOLERANCE)"""
+    if isinstance(single, dict) and isinstance(batch, dict):
+        return single.keys() == batch.keys() and all(
+            same_output(single[key], batch[key], confidence or key == "confidence") for key in single)
+    if isinstance(single, list) and isinstance(batch, list):
+        return len(single) == len(batch) and all(same_output(a, b, confidence) for a, b in zip(single, batch))
+    if confidence and isinstance(single, (int, float)) and isinstance(batch, (int, float)):
+        return abs(single - batch) < CONFIDENCE_TOLERANCE
+    return single == batch
+
+def test_batch_matches_single():
+    """extract_ner_batch must return what extract_ner returns per document"""
+    print("\n==== Testing Batch vs Single Document NER ====")
+
+    start_time = time.time()
+    single = [extract_ner(text) for text in SAMPLE_TEXTS]
+    single_time = time.time() - start_time
+
+    start_time = time.time()
+    batch = extract_ner_batch(SAMPLE_TEXTS)
+    batch_time = time.time() - start_time
+
+    success = len(single) == len(batch) and all(same_entities(a, b) for a, b in zip(single, batch))
+    print(f"Single-document calls: {single_time:.3f}s, batched: {batch_time:.3f}s")
+    print(f"Batch NER test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_batch_parse_matches_single():
+    """parse_order_documents must match parse_order_document for each text"""
+    print("\n==== Testing Batch Document Parsing ====")
+
+    single = [parse_order_document(text) for text in SAMPLE_TEXTS]
+    batch = parse_order_documents(SAMPLE_TEXTS)
+
+    success = same_output(single, batch)
+    print(f"Batch parsing test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [test_batch_matches_single(), test_batch_parse_matches_single()]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
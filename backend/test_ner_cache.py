@@ -0,0 +1,127 @@
+"""
+Test script for the NER result cache
+"""
+import tempfile
+
+from app.ner_cache import NerResultCache, get_ner_cache
+from app.parser import extract_ner, extract_ner_batch
+
+SAMPLE_TEXT = """Customer: John Smith
+Order ID: ORD-12345
+Ship To: 123 Main Street, Austin, TX 78701"""
+
+def test_lru_eviction():
+    """The least recently used entry should be evicted first"""
+    print("\n==== Testing LRU Eviction ====")
+    cache = NerResultCache(max_size=2, cache_dir="", version="test")
+    cache.put("first John Smith", [(6, 16, "PER", 0.9)])
+    cache.put("second", [])
+    cache.get("first John Smith")  # Now "second" is the least recently used
+    cache.put("third Austin", [(6, 12, "LOC", 0.8)])
+
+    stats = cache.get_stats()
+    print(f"Stats: {stats}")
+
+    success = (cache.get("first John Smith") == [(6, 16, "PER", 0.9)] and
+               cache.get("second") is None and
+               cache.get("third Austin") == [(6, 12, "LOC", 0.8)] and
+               stats["evictions"] == 1 and stats["size"] == 2)
+    print(f"LRU eviction test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_key_normalization():
+    """Texts that only differ in whitespace share an entry, other texts and model versions don't"""
+    print("\n==== Testing Cache Key Normalization ====")
+    cache = NerResultCache(max_size=8, cache_dir="", version="v1")
+    other_version = NerResultCache(max_size=8, cache_dir="", version="v2")
+
+    success = (cache.key("Customer:  John Smith\r\n") == cache.key("Customer: John Smith") and
+               cache.key("Customer: John Smith") != cache.key("Customer: Jane Smith") and
+               cache.key("Customer: John Smith") != other_version.key("Customer: John Smith"))
+    print(f"Key normalization test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_whitespace_variants():
+    """Texts that only differ in whitespace share an entry, but each gets entities from its own text"""
+    print("\n==== Testing Whitespace Variants ====")
+    cache = NerResultCache(max_size=8, cache_dir="", version="test")
+    spaced = "Customer:  John   Smith\r\nShip To:\n  Acme\n  Corp  "
+    single = "Customer: John Smith Ship To: Acme Corp"
+    john = spaced.index("John")
+    acme = spaced.index("Acme")
+    cache.put(spaced, [(john, spaced.index("Smith") + 5, "PER", 0.9), (acme, spaced.index("Corp") + 4, "ORG", 0.8)])
+
+    spans = cache.get(single)
+    entities = [(single[start:end], entity_type) for start, end, entity_type, _ in spans]
+    print(f"Entities for the single-spaced text: {entities}")
+    same_spans = cache.get(spaced) == [(john, spaced.index("Smith") + 5, "PER", 0.9),
+                                       (acme, spaced.index("Corp") + 4, "ORG", 0.8)]
+    success = (entities == [("John Smith", "PER"), ("Acme Corp", "ORG")] and same_spans and
+               cache.get_stats()["size"] == 1 and cache.get_stats()["memory_hits"] == 2)
+
+    # Through extract_ner, each text's entities must occur in that text
+    shared = get_ner_cache()
+    if shared is not None:
+        shared.clear()
+        spaced_entities = extract_ner(spaced)
+        single_entities = extract_ner(single)
+        stats = shared.get_stats()
+        print(f"extract_ner entities: {spaced_entities} / {single_entities}, stats: {stats}")
+        success = (success and stats["misses"] == 1 and stats["memory_hits"] == 1 and
+                   all(entity in spaced for entity, _, _ in spaced_entities) and
+                   all(entity in single for entity, _, _ in single_entities) and
+                   [entity[1:] for entity in spaced_entities] == [entity[1:] for entity in single_entities])
+    print(f"Whitespace variants test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_disk_tier():
+    """Entries written by one cache instance should be found by a new one (e.g. after a restart)"""
+    print("\n==== Testing Disk Tier ====")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        NerResultCache(max_size=8, cache_dir=cache_dir, version="test").put(SAMPLE_TEXT, [(10, 20, "PER", 0.95)])
+
+        cache = NerResultCache(max_size=8, cache_dir=cache_dir, version="test")
+        first = cache.get(SAMPLE_TEXT)
+        second = cache.get(SAMPLE_TEXT)
+        stats = cache.get_stats()
+        print(f"Stats: {stats}")
+
+        success = (first == second == [(10, 20, "PER", 0.95)] and
+                   stats["disk_hits"] == 1 and stats["memory_hits"] == 1 and stats["misses"] == 0)
+    print(f"Disk tier test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_repeated_document_skips_model():
+    """Parsing the same text again should be answered from the cache with the same entities"""
+    print("\n==== Testing Repeated Document ====")
+    cache = get_ner_cache()
+    if cache is None:
+        print("NER cache disabled (NER_CACHE_ENABLED=false), skipping")
+        return True
+    cache.clear()
+
+    first = extract_ner(SAMPLE_TEXT)
+    second = extract_ner(SAMPLE_TEXT)
+    batch = extract_ner_batch([SAMPLE_TEXT])[0]
+    stats = cache.get_stats()
+    print(f"Entities: {first}")
+    print(f"Stats: {stats}")
+
+    success = first == second == batch and stats["misses"] == 1 and stats["memory_hits"] == 2
+    print(f"Repeated document test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_lru_eviction(),
+        test_key_normalization(),
+        test_whitespace_variants(),
+        test_disk_tier(),
+        test_repeated_document_skips_model()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
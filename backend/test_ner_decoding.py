@@ -0,0 +1,209 @@
+"""
+Test script for vectorized BIO decoding of NER output
+"""
+import random
+
+import numpy as np
+import torch
+
+from app.ner_decoding import decode_entities, decode_entity_spans, merge_wordpieces
+from app.ner_model import group_entities
+
+ID2LABEL = {0: "O", 1: "B-MISC", 2: "I-MISC", 3: "B-PER", 4: "I-PER", 5: "B-ORG", 6: "I-ORG", 7: "B-LOC", 8: "I-LOC"}
+TOKENS = ["Acme", "##Corp", "John", "Smith", "##son", "Austin", "order", "##ed", "500", "Way", ","]
+
+def random_result(rng, length):
+    """Build a text and a run_ner_model()-style result with random logits, tokens and a few zero-width tokens"""
+    tokens = [rng.choice(TOKENS) for _ in range(length)]
+    offsets = []
+    pieces = []
+    position = 0
+    for token in tokens:
+        piece = "" if rng.random() < 0.1 else token.replace("##", "")
+        offsets.append((position, position + len(piece)))
+        # Wordpieces continue the previous word, everything else is separated by a space
+        separator = "" if token.startswith("##") else " "
+        pieces.append(piece + separator)
+        position += len(piece) + len(separator)
+    # Sharp logits so long entity runs actually occur
+    logits = torch.randn(1, length, len(ID2LABEL)) * 4
+    return "".join(pieces), {"tokens": tokens, "offsets": offsets, "logits": logits}
+
+def reference_decode(text, result, id2label):
+    """The token-by-token loop previously used by extract_ner, slicing entity text by offsets"""
+    predictions = torch.argmax(result["logits"], dim=2)[0].tolist()
+    confidences = torch.max(torch.softmax(result["logits"], dim=2), dim=2)[0][0].tolist()
+    idx2tag = {i: tag for i, tag in enumerate(id2label.values())}
+
+    entities = []
+    current_span = None
+    current_entity_type = None
+    current_confidences = []
+    for pred, offset, conf in zip(predictions, result["offsets"], confidences):
+        if offset[0] == offset[1]:
+            continue
+        tag = idx2tag[pred]
+        if tag.startswith("B-"):
+            if current_span is not None:
+                entities.append((current_span, current_entity_type, sum(current_confidences) / len(current_confidences)))
+            current_span = [offset[0], offset[1]]
+            current_entity_type = tag[2:]
+            current_confidences = [conf]
+        elif tag.startswith("I-") and current_span is not None and current_entity_type == tag[2:]:
+            current_span[1] = offset[1]
+            current_confidences.append(conf)
+        elif current_span is not None:
+            entities.append((current_span, current_entity_type, sum(current_confidences) / len(current_confidences)))
+            current_span = None
+            current_entity_type = None
+            current_confidences = []
+    if current_span is not None:
+        entities.append((current_span, current_entity_type, sum(current_confidences) / len(current_confidences)))
+
+    return [(text[start:end], entity_type, confidence) for (start, end), entity_type, confidence in entities if confidence > 0.3]
+
+def reference_merge(tokens, tags, confidences):
+    """The wordpiece merging loop previously used by predict_entities"""
+    entity_pairs = []
+    for token, tag, confidence in zip(tokens, tags, confidences):
+        if token.startswith("##"):
+            if entity_pairs:
+                prev_token, prev_tag, prev_conf = entity_pairs[-1]
+                entity_pairs[-1] = (prev_token + token[2:], prev_tag, (prev_conf + confidence) / 2)
+        else:
+            entity_pairs.append((token, tag, confidence))
+    return entity_pairs
+
+def reference_group(entity_pairs):
+    """The grouping loop previously used by group_entities"""
+    grouped = []
+    current_entity = []
+    current_confidences = []
+    current_type = "O"
+
+    def flush():
+        grouped.append((" ".join(current_entity), current_type, sum(current_confidences) / len(current_confidences)))
+
+    for item in entity_pairs:
+        token, tag = item[0], item[1]
+        confidence = item[2] if len(item) > 2 else 1.0
+        entity_type = "O" if tag == "O" else (tag[2:] if tag.startswith(("B-", "I-")) else tag)
+        if tag.startswith("B-"):
+            if current_entity:
+                flush()
+                current_entity, current_confidences = [], []
+            current_entity.append(token)
+            current_confidences.append(confidence)
+            current_type = entity_type
+        elif tag.startswith("I-") and current_type == entity_type:
+            current_entity.append(token)
+            current_confidences.append(confidence)
+        elif tag == "O":
+            if current_entity:
+                flush()
+                current_entity, current_confidences = [], []
+                current_type = "O"
+        else:
+            if current_entity:
+                flush()
+                current_entity, current_confidences = [], []
+            current_entity.append(token)
+            current_confidences.append(confidence)
+            current_type = entity_type
+    if current_entity:
+        flush()
+    return grouped
+
+def same_entities(actual, expected, tolerance=1e-12):
+    """Compare entity lists exactly on text and type and up to summation order on confidence"""
+    return len(actual) == len(expected) and all(
+        a[0] == e[0] and a[1] == e[1] and abs(a[2] - e[2]) <= tolerance
+        for a, e in zip(actual, expected)
+    )
+
+def test_decode_matches_reference():
+    """decode_entities should find the same entities as the old per-token loop and slice them from the text"""
+    print("\n==== Testing Vectorized Entity Decoding ====")
+    rng = random.Random(7)
+    torch.manual_seed(7)
+
+    mismatches = 0
+    total_entities = 0
+    for trial in range(300):
+        text, result = random_result(rng, rng.randint(0, 120))
+        expected = reference_decode(text, result, ID2LABEL)
+        total_entities += len(expected)
+        if not same_entities(decode_entities(text, result, ID2LABEL), expected):
+            mismatches += 1
+
+    success = mismatches == 0 and total_entities > 0
+    # Multi-word entities keep the spacing of the original text
+    text = "Ship to John Smithson today"
+    result = {
+        "tokens": ["[CLS]", "Ship", "to", "John", "Smith", "##son", "today", "[SEP]"],
+        "offsets": [(0, 0), (0, 4), (5, 7), (8, 12), (13, 18), (18, 21), (22, 27), (0, 0)],
+        "logits": torch.nn.functional.one_hot(torch.tensor([[0, 0, 0, 3, 4, 4, 0, 0]]), len(ID2LABEL)).float() * 10
+    }
+    spans = decode_entity_spans(result, ID2LABEL)
+    print(f"Spans: {spans}")
+    if [(text[start:end], entity_type) for start, end, entity_type, _ in spans] != [("John Smithson", "PER")]:
+        mismatches += 1
+
+    print(f"Compared {total_entities} entities, {mismatches} mismatching documents")
+    print(f"Decoding test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_wordpiece_merge_matches_reference():
+    """merge_wordpieces should match the old pairwise-averaging loop"""
+    print("\n==== Testing Vectorized Wordpiece Merging ====")
+    rng = np.random.default_rng(11)
+    labels = list(ID2LABEL.values())
+
+    success = True
+    for trial in range(300):
+        length = int(rng.integers(0, 60))
+        tokens = [str(rng.choice(TOKENS)) for _ in range(length)]
+        predictions = rng.integers(0, len(labels), size=length)
+        confidences = rng.random(length).astype(np.float32)
+
+        expected = reference_merge(tokens, [labels[p] for p in predictions], confidences.tolist())
+        actual = merge_wordpieces(tokens, predictions, confidences, ID2LABEL)
+        if not same_entities(actual, expected):
+            success = False
+            print(f"Mismatch for tokens {tokens}")
+            break
+
+    print(f"Wordpiece merge test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_group_entities_matches_reference():
+    """group_entities should keep its grouping rules, including orphan I- and unprefixed tags"""
+    print("\n==== Testing Vectorized Entity Grouping ====")
+    rng = random.Random(3)
+    tags = ["O", "B-PER", "I-PER", "B-ORG", "I-ORG", "I-LOC", "MISC", "I-MISC"]
+
+    success = True
+    for trial in range(300):
+        pairs = [(rng.choice(TOKENS), rng.choice(tags), rng.random()) for _ in range(rng.randint(0, 50))]
+        if not same_entities(group_entities(pairs), reference_group(pairs)):
+            success = False
+            print(f"Mismatch for pairs {pairs}")
+            break
+
+    # Pairs without a confidence default to 1.0
+    two_tuples = [("John", "B-PER"), ("Smith", "I-PER"), ("in", "O"), ("Austin", "B-LOC")]
+    success = success and same_entities(group_entities(two_tuples), reference_group(two_tuples))
+
+    print(f"Grouping test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_decode_matches_reference(),
+        test_wordpiece_merge_matches_reference(),
+        test_group_entities_matches_reference()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
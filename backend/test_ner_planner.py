@@ -0,0 +1,123 @@
+"""
+Test script for skipping NER when the regex pass is already confident and
+for restricting it to candidate regions
+"""
+import json
+
+from app import parser
+from app.ner_planner import plan_ner_fields, find_candidate_regions
+from app.parser_stats import get_usage_stats, reset_stats
+
+WELL_FORMATTED = """PO Number: GT-ORDER-4567
+Customer: Globex Inc
+Ship To:
+Globex Inc
+500 Industrial Way
+Austin, TX 78701
+
+Part #AXL-9920 | Qty: 25 | Unit Price: $12.50
+Part #MNT-8833 | Qty: 10 | Unit Price: $44.99
+"""
+
+INFORMAL = """hey, pls send 12x of HTR-1204 @ $32.00
+to the usual place, John from Acme knows
+
+thanks"""
+
+def test_confident_document_skips_ner():
+    """A well-formatted order should be parsed without calling the NER model"""
+    print("\n==== Testing NER Skipped For Confident Regex Results ====")
+    reset_stats()
+
+    original_extract_ner = parser.extract_ner
+    calls = []
+    parser.extract_ner = lambda text: calls.append(text) or original_extract_ner(text)
+    try:
+        result = parser.parse_order_document(WELL_FORMATTED)
+    finally:
+        parser.extract_ner = original_extract_ner
+
+    stats = get_usage_stats()
+    print(json.dumps({field: result[field] for field in ("customer", "order_id", "shipping_address")}, indent=2))
+    print(f"NER calls: {len(calls)}, stats: {stats['ner_model_runs']} runs / {stats['ner_model_skipped']} skipped")
+
+    success = (
+        not calls and
+        stats["ner_model_skipped"] == 1 and
+        stats["ner_model_runs"] == 0 and
+        result["order_id"] == "GT-ORDER-4567" and
+        len(result["line_items"]) == 2
+    )
+    print(f"Skip test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_uncertain_document_runs_ner():
+    """A document without labelled fields should still go through the NER model"""
+    print("\n==== Testing NER Run For Missing Fields ====")
+    reset_stats()
+
+    fields = plan_ner_fields(parser.extract_regex_fields(INFORMAL))
+    parser.parse_order_document(INFORMAL)
+    stats = get_usage_stats()
+    print(f"Planned fields: {fields}")
+    print(f"Stats: {stats['ner_model_runs']} runs / {stats['ner_model_skipped']} skipped, "
+          f"fields requested: {stats['ner_fields_requested']}")
+
+    success = (
+        "customer" in fields and
+        stats["ner_model_runs"] == 1 and
+        stats["ner_model_skipped"] == 0 and
+        stats["ner_fields_requested"].get("customer") == 1
+    )
+    print(f"Run test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_batch_only_runs_needed_documents():
+    """Batched parsing should only send documents that need NER to the model"""
+    print("\n==== Testing Batched NER Planning ====")
+    ner_entities = parser.extract_needed_ner_batch([WELL_FORMATTED, INFORMAL])
+    batch_results = parser.parse_order_documents([WELL_FORMATTED, INFORMAL])
+    single_results = [parser.parse_order_document(WELL_FORMATTED), parser.parse_order_document(INFORMAL)]
+
+    success = ner_entities[0] is None and ner_entities[1] is not None and batch_results == single_results
+    print(f"Batched planning test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_regions_cover_only_relevant_lines():
+    """Long invoices should only send the lines around missing fields through the model"""
+    print("\n==== Testing Candidate Regions ====")
+    items = "".join(f"{i}. Widget model {i} in blue, 3 units at 4.50 each\n" for i in range(1, 300))
+    text = "Acme Corporation\nInvoice 2024-11\n\nShip to:\nGlobex Inc\n500 Industrial Way\nAustin, TX 78701\n\n" + items
+    fields = plan_ner_fields(parser.extract_regex_fields(text))
+
+    regions = find_candidate_regions(text, fields)
+    region_text = [text[start:end] for start, end in regions]
+    covered = sum(end - start for start, end in regions)
+    print(f"Planned fields: {fields}")
+    print(f"Regions: {region_text}")
+    print(f"Covered {covered} of {len(text)} characters")
+
+    # Running the model on one whole-text region must match plain extract_ner
+    whole_text = parser.extract_ner_in_regions([WELL_FORMATTED], [[(0, len(WELL_FORMATTED))]])[0]
+
+    success = (
+        covered * 10 < len(text) and
+        any("Acme Corporation" in snippet for snippet in region_text) and
+        whole_text == parser.extract_ner(WELL_FORMATTED)
+    )
+    print(f"Region test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_confident_document_skips_ner(),
+        test_uncertain_document_runs_ner(),
+        test_batch_only_runs_needed_documents(),
+        test_regions_cover_only_relevant_lines()
+    ]
+    reset_stats()
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
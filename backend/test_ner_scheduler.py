@@ -0,0 +1,98 @@
+"""
+Test script for the NER micro-batching scheduler
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.ner_scheduler import NerBatchScheduler
+
+def test_concurrent_requests_are_batched():
+    """Concurrent submissions should be grouped into a few batches, each caller getting its own result"""
+    print("\n==== Testing Concurrent Requests Are Batched ====")
+    batch_sizes = []
+    release = threading.Event()
+
+    def batch_func(texts):
+        # Hold the first batch until every request has been queued
+        release.wait(timeout=5)
+        batch_sizes.append(len(texts))
+        return [text.upper() for text in texts]
+
+    scheduler = NerBatchScheduler(batch_func, max_batch_size=8, max_wait_ms=50)
+    texts = [f"order {i}" for i in range(20)]
+
+    futures = [scheduler.submit(text) for text in texts]
+    release.set()
+    results = [future.result(timeout=5) for future in futures]
+
+    stats = scheduler.get_stats()
+    print(f"Batch sizes: {batch_sizes}")
+    print(json.dumps(stats, indent=2))
+
+    success = (
+        results == [text.upper() for text in texts] and
+        sum(batch_sizes) == 20 and
+        max(batch_sizes) <= 8 and
+        len(batch_sizes) < 20 and
+        stats["requests"] == 20
+    )
+    print(f"Batching test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_errors_propagate_to_callers():
+    """An exception in the batch function should be raised in every waiting caller"""
+    print("\n==== Testing Error Propagation ====")
+
+    def batch_func(texts):
+        raise RuntimeError("model failure")
+
+    scheduler = NerBatchScheduler(batch_func, max_batch_size=4, max_wait_ms=5)
+
+    errors = 0
+    for future in [scheduler.submit("a"), scheduler.submit("b")]:
+        try:
+            future.result(timeout=5)
+        except RuntimeError:
+            errors += 1
+
+    success = errors == 2
+    print(f"Callers that received the error: {errors}")
+    print(f"Error propagation test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_model_results_match_direct_batch():
+    """Results through the scheduler should match calling the model directly"""
+    print("\n==== Testing Scheduler With NER Model ====")
+    from app.ner_model import run_ner_model_batch
+
+    texts = [
+        "Order ID: ORD-12345. Customer: John Smith",
+        "Ship to: Acme Corporation, 500 Industrial Way, Austin",
+        "Please send 12x of HTR-1204 @ $32.00 to Berlin",
+    ]
+    expected = run_ner_model_batch(texts)
+
+    scheduler = NerBatchScheduler(run_ner_model_batch, max_batch_size=8, max_wait_ms=20)
+    with ThreadPoolExecutor(max_workers=len(texts)) as executor:
+        results = list(executor.map(lambda text: scheduler.submit(text).result(timeout=60), texts))
+
+    success = all(
+        result["tokens"] == reference["tokens"] and
+        (result["logits"] - reference["logits"]).abs().max().item() < 1e-4
+        for result, reference in zip(results, expected)
+    )
+    print(f"Scheduler stats: {scheduler.get_stats()}")
+    print(f"Scheduler model test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_concurrent_requests_are_batched(),
+        test_errors_propagate_to_callers(),
+        test_model_results_match_direct_batch()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
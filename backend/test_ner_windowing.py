@@ -0,0 +1,66 @@
+"""
+Test script for sliding-window NER inference on long documents
+"""
+import torch
+from app.model_registry import get_ner_components
+from app.ner_model import run_ner_model
+from app.parser import extract_ner
+
+def test_short_text_matches_single_pass():
+    """A document that fits in one window should give the same logits as a plain forward pass"""
+    print("\n==== Testing Short Text (Single Window) ====")
+    text = "Order ID: ORD-12345. Customer: John Smith with 20 units of X123 at $42.99."
+    tokenizer, model = get_ner_components()
+
+    inputs = tokenizer(text, return_tensors="pt")
+    with torch.no_grad():
+        # Drop [CLS] and [SEP], which run_ner_model does not return
+        expected = model(**inputs).logits[0, 1:-1]
+
+    result = run_ner_model(text)
+
+    success = torch.allclose(expected, result["logits"][0], atol=1e-5)
+    print(f"Tokens: {len(result['tokens'])}, logits match: {success}")
+    print(f"Short text test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_long_text_full_coverage():
+    """Every wordpiece of a long document should be tagged exactly once"""
+    print("\n==== Testing Long Text Coverage ====")
+    lines = [f"Item: PRT-{i:04d} | Qty: {i % 9 + 1} | Price: ${i * 1.5:.2f}" for i in range(400)]
+    text = "Order ID: PO-88231\nCustomer: Acme Corporation\n" + "\n".join(lines) + "\nShip to: Berlin, Germany"
+    tokenizer, _ = get_ner_components()
+
+    expected_tokens = tokenizer(text, add_special_tokens=False).tokens()
+    result = run_ner_model(text)
+    last_start, last_end = result["offsets"][-1]
+
+    success = (
+        len(expected_tokens) > 512 and
+        result["tokens"] == expected_tokens and
+        result["logits"].shape[1] == len(expected_tokens) and
+        text[last_start:last_end] == "y"  # last wordpiece of "Germany"
+    )
+    print(f"Wordpieces in document: {len(expected_tokens)}, tagged: {result['logits'].shape[1]}")
+    print(f"Long text coverage test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_entities_after_first_window():
+    """extract_ner should be able to return entities located past the first 512 wordpieces"""
+    print("\n==== Testing Entities Past First Window ====")
+    filler = "This line is filler text for the order document. " * 120
+    text = filler + "\nCustomer: Angela Merkel from Berlin"
+
+    entities = extract_ner(text)
+    print(f"Entities: {entities[-5:]}")
+
+    success = any(entity in text[len(filler):] for entity, _, _ in entities)
+    print(f"Entities past first window test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [test_short_text_matches_single_pass(), test_long_text_full_coverage(), test_entities_after_first_window()]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
@@ -0,0 +1,155 @@
+"""
+Test script for the long-lived parser engine, its strategies and its dev-only reload mode
+"""
+import os
+import sys
+import tempfile
+import time
+
+from app import parser, parser_v2
+from app.ner_cache import get_cache_stats
+from app.parser_engine import ParserEngine
+from app.parser_stats import get_usage_stats, reset_stats
+from benchmark_parser import synthetic_invoice
+
+# Keep the LLM out of parse_order_document
+os.environ["USE_LLM_PARSER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0"
+
+INFORMAL = """hey, pls send 12x of HTR-1204 @ $32.00
+to the usual place, John from Acme knows
+
+thanks"""
+
+def _write_parser_module(directory, name, customer):
+    """Write a minimal parser module that returns a fixed customer"""
+    path = os.path.join(directory, f"{name}.py")
+    with open(path, "w") as f:
+        f.write(f"def parse_order_document(text):\n    return {{'customer': '{customer}'}}\n")
+    return path
+
+def test_no_reload_by_default():
+    """Without dev reload, edits to the parser file must not be picked up"""
+    print("\n==== Testing Production Mode (No Reload) ====")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sys.path.insert(0, tmp_dir)
+        try:
+            path = _write_parser_module(tmp_dir, "engine_prod_parser", "First")
+            engine = ParserEngine("engine_prod_parser", dev_reload=False)
+            first = engine.parse("text")
+
+            _write_parser_module(tmp_dir, "engine_prod_parser", "Second")
+            os.utime(path, (time.time() + 10, time.time() + 10))
+            second = engine.parse("text")
+        finally:
+            sys.path.remove(tmp_dir)
+
+    success = first["customer"] == "First" and second["customer"] == "First" and engine.reload_count == 0
+    print(f"Results: {first['customer']} -> {second['customer']}, reloads: {engine.reload_count}")
+    print(f"Production mode test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_dev_reload_on_mtime_change():
+    """With dev reload, the module is reloaded only after its file changes"""
+    print("\n==== Testing Dev Reload Mode ====")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sys.path.insert(0, tmp_dir)
+        try:
+            path = _write_parser_module(tmp_dir, "engine_dev_parser", "First")
+            engine = ParserEngine("engine_dev_parser", dev_reload=True)
+            first = engine.parse("text")
+            unchanged = engine.parse("text")
+            reloads_before_edit = engine.reload_count
+
+            _write_parser_module(tmp_dir, "engine_dev_parser", "Second")
+            os.utime(path, (time.time() + 10, time.time() + 10))
+            second = engine.parse("text")
+        finally:
+            sys.path.remove(tmp_dir)
+
+    success = (
+        first["customer"] == "First" and
+        unchanged["customer"] == "First" and
+        reloads_before_edit == 0 and
+        second["customer"] == "Second" and
+        engine.reload_count == 1
+    )
+    print(f"Results: {first['customer']} -> {second['customer']}, reloads: {engine.reload_count}")
+    print(f"Dev reload test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_strategies_share_resources():
+    """The v1 and v2 strategies should run in one engine on the same rules, helpers and NER cache"""
+    print("\n==== Testing Shared Strategy Resources ====")
+    engine = ParserEngine(strategy="v2", ab_strategy="", ab_share=0)
+    v1 = engine.strategy_module("v1")
+    v2 = engine.strategy_module("v2")
+
+    results = {name: engine.parse(INFORMAL, name) for name in ("v1", "v2")}
+    same_results = (results["v1"] == parser.parse_order_document(INFORMAL) and
+                    results["v2"] == parser_v2.parse_order_document(INFORMAL))
+
+    # A document tagged for one strategy is answered from the cache for the other
+    v1.extract_ner(INFORMAL)
+    hits_before = get_cache_stats().get("memory_hits", 0)
+    v2.extract_ner(INFORMAL)
+    cache_hit = get_cache_stats().get("memory_hits", 0) == hits_before + 1 or not get_cache_stats()["enabled"]
+
+    shared = (v1 is parser and v2 is parser_v2 and v1.RULES is v2.RULES and
+              v1.postprocess_line_items is v2.postprocess_line_items and v1.extract_ner is v2.extract_ner)
+    print(f"Loaded strategies: {engine.report()['loaded_strategies']}, shared: {shared}, cache hit: {cache_hit}")
+
+    rejected = 0
+    for bad in (lambda: engine.parse(INFORMAL, "v3"), lambda: ParserEngine(strategy="v3"),
+                lambda: ParserEngine(ab_strategy="v1", ab_share=1.5)):
+        try:
+            bad()
+        except ValueError as e:
+            print(f"Rejected: {str(e)}")
+            rejected += 1
+
+    success = same_results and cache_hit and shared and rejected == 3
+    print(f"Shared resources test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_ab_split():
+    """An A/B engine should send a stable share of the documents to the other strategy"""
+    print("\n==== Testing A/B Strategy Split ====")
+    reset_stats()
+    engine = ParserEngine(strategy="v2", ab_strategy="v1", ab_share=0.25)
+    texts = [synthetic_invoice(5).replace("ORD-55555", f"ORD-{i:05d}") for i in range(200)]
+
+    picks = [engine.pick_strategy(text) for text in texts]
+    for text in texts:
+        engine.parse(text)
+    stats = get_usage_stats()["strategy_runs"]
+    reset_stats()
+    print(f"Documents per strategy: { {name: runs['documents'] for name, runs in stats.items()} }")
+
+    success = (
+        0.15 < picks.count("v1") / len(picks) < 0.35 and
+        picks.count("v1") + picks.count("v2") == len(picks) and
+        [engine.pick_strategy(text) for text in texts] == picks and
+        engine.pick_strategy(texts[0], "llm") == "llm" and
+        stats["v1"]["documents"] == picks.count("v1") and
+        stats["v2"]["documents"] == picks.count("v2") and
+        stats["v2"]["confidence_total"] > 0 and
+        set(ParserEngine(strategy="v2", ab_strategy="v1", ab_share=0).pick_strategy(text) for text in texts) == {"v2"}
+    )
+    print(f"A/B split test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_no_reload_by_default(),
+        test_dev_reload_on_mtime_change(),
+        test_strategies_share_resources(),
+        test_ab_split()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
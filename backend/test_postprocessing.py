@@ -1,5 +1,7 @@
 import json
+import time
 from app.parser import postprocess_line_items, parse_order_document
+from benchmark_parser import synthetic_line_items
 
 def test_line_item_deduplication():
     """Test the deduplication of line items"""
@@ -74,6 +76,36 @@ def test_sku_validation():
           f"{'properly filtered' if success else 'not properly filtered'}")
     return success
 
+def test_large_order_postprocessing():
+    """Test that deduplication and validation stay linear on large orders"""
+    print("\n===== Testing Large Order Postprocessing =====")
+    
+    timings = {}
+    for size in (2000, 20000):
+        items = synthetic_line_items(size)
+        start_time = time.perf_counter()
+        cleaned = postprocess_line_items(items)
+        timings[size] = time.perf_counter() - start_time
+        print(f"{size} items -> {len(cleaned)} in {timings[size] * 1000:.1f} ms")
+    
+    # One item per distinct valid (SKU, quantity, price), each with the highest confidence seen
+    items = synthetic_line_items(20000)
+    best = {}
+    for item in items:
+        if item.sku.value.startswith("HTR-"):
+            best[item.key()] = max(best.get(item.key(), 0), item.sku.confidence)
+    cleaned = postprocess_line_items(items)
+    success_dedup = (len(cleaned) == len(best) and
+                     all(item.sku.confidence == best[item.key()] for item in cleaned))
+    
+    # 10x the items shouldn't take much more than 10x the time (a quadratic pass would take 100x)
+    success_linear = timings[20000] < timings[2000] * 30
+    
+    success = success_dedup and success_linear
+    print(f"Test {'PASSED' if success else 'FAILED'}: Large orders were "
+          f"{'deduplicated in linear time' if success else 'not deduplicated correctly or in linear time'}")
+    return success
+
 def test_shipping_address_trimming():
     """Test trimming of shipping address to exclude line items"""
     print("\n===== Testing Shipping Address Trimming =====")
@@ -168,6 +200,7 @@ def run_all_tests():
     test_results = [
         test_line_item_deduplication(),
         test_sku_validation(),
+        test_large_order_postprocessing(),
         test_shipping_address_trimming(),
         test_order_id_correction(),
         test_whitespace_normalization()
@@ -0,0 +1,273 @@
+"""
+Test script for the single-pass keyword scanner and the linear-time extraction patterns used by parser_v2
+"""
+import re
+import time
+import random
+
+from app import parser, parser_v2
+from app.regex_engine import (KeywordScanner, RegexTimeBudgetExceeded, anchor_positions, first_match, iter_matches,
+                              regex_deadline)
+from app.extraction_rules import digit_run_starts
+from app.parser_v2 import KEYWORD_SCANNER, RULES, extract_entities, fill_regex_fields
+from app.parser_stats import get_usage_stats
+from benchmark_parser import PATHOLOGICAL_INPUTS
+
+# Pieces of order documents, including overlapping keywords ("shipo") and Unicode case folding ("ſhip")
+FRAGMENTS = ["Order", "ORDER", "order", "PO", "po", "PO-123", "Purchase", "Number", "#", ":", " ", "  ", "\n", "\n\n",
+             "Customer", "Ship To:", "ship to", "Shipping", "Address:", "Delivery", "Part", "Part #", "Item", "item#",
+             "SKU:", "Product", "Qty", "Quantity:", "Price:", "$", "12", "3x", "12x of", "x", "X", "4", "٣", " of ", "@",
+             "32.00", "Ref #:", "Thanks", "ABC-1", "John Smith", "|", "-", "Acme", "shipo", "poorder", "addressku", "customeref", "ſhip", "K",
+             "Our warehouse", "cost", "\r", "\t"]
+
+def rule_pattern(group, index=0):
+    return RULES.group(group).rules[index].pattern
+
+PO_ID_PATTERN = rule_pattern("order_id.po_direct")
+ORDER_ID_PATTERN = rule_pattern("order_id.general")
+ALT_PO_PATTERN = rule_pattern("order_id.prefixed")
+FALLBACK_ORDER_ID_PATTERNS = [(rule.pattern, rule.keywords) for rule in RULES.group("order_id.fallback")]
+CUSTOMER_PATTERN = rule_pattern("customer.label")
+SHIP_TO_SECTION_PATTERN = rule_pattern("shipping_address.section")
+ADDRESS_PATTERN = rule_pattern("shipping_address.label")
+PART_ITEM_PATTERN = rule_pattern("line_items.part_table")
+SKU_ITEM_PATTERN = rule_pattern("line_items.sku_qty_price")
+INFORMAL_ITEM_PATTERN = rule_pattern("line_items.informal")
+LINE_SKU_PATTERN = rule_pattern("line.sku")
+LINE_QTY_PATTERN = rule_pattern("line.quantity")
+LINE_PRICE_PATTERN = rule_pattern("line.price")
+SHIP_TO_CUSTOMER_PATTERN = rule_pattern("customer.ship_to")
+WAREHOUSE_CUSTOMER_PATTERN = rule_pattern("customer.warehouse")
+
+# Patterns as they were before being anchored on a keyword and rewritten to match in linear
+# time; the captured groups must not change
+ORIGINAL_PATTERNS = {
+    PO_ID_PATTERN: r'order\s*(?:id|number|#|)?\s*[\:\#\s]\s*(PO-\d+)',
+    ORDER_ID_PATTERN: r'order\s*(?:id|number|#)?\s*[\:\#]?\s*([a-zA-Z0-9\-\_]+)',
+    ALT_PO_PATTERN: r'(?:PO|order)[\s\-]*(?:id|number|#)?[\s\:\#]*([a-zA-Z0-9\-\_]+)',
+    CUSTOMER_PATTERN: r'customer\s*[\:\#]?\s*([a-zA-Z0-9\s]+(?:$|\n))',
+    SHIP_TO_SECTION_PATTERN: r'ship\s*to\s*:?\s*([\s\S]+?)(?=\n\s*\n|\n[A-Za-z]+\s*:|\Z)',
+    ADDRESS_PATTERN: r'(?:shipping|delivery)?\s*address\s*[\:\#]?\s*([a-zA-Z0-9\s\,\-\.]+(?:$|\n))',
+    FALLBACK_ORDER_ID_PATTERNS[1][0]: r'PO\s*(?:ID|Number|#)?[:\s]*([A-Z0-9\-]+)',
+    FALLBACK_ORDER_ID_PATTERNS[6][0]: r'(?:^|\n)(?:PO|Order)[\:\s\-\#]*([A-Za-z0-9\-]+)',
+    SKU_ITEM_PATTERN: r'(?:sku|item|product)\s*:?\s*([a-zA-Z0-9\-]+).*?(?:qty|quantity)\s*:?\s*(\d+).*?(?:price)\s*:?\s*\$?(\d+(?:\.\d+)?)',
+    LINE_SKU_PATTERN: r'(?:sku|part|item)\s*(?:\#|number)?[:\s]*\s*([a-zA-Z0-9\-]+)',
+    LINE_QTY_PATTERN: r'(?:qty|quantity)[:\s]*\s*(\d+)',
+    LINE_PRICE_PATTERN: r'(?:price|cost)[:\s]*\s*\$?(\d+(?:\.\d+)?)',
+    SHIP_TO_CUSTOMER_PATTERN: r'ship\s+to\s*[:\s]*([A-Za-z0-9\s\,]+?)(?=\n|\r|$)',
+    WAREHOUSE_CUSTOMER_PATTERN: r'(?:our|your)\s+warehouse[:\s]*([A-Za-z0-9\s\,]+?)(?=\n|\r|$)'
+}
+ORIGINAL_PATTERNS = {pattern: re.compile(original, re.IGNORECASE) for pattern, original in ORIGINAL_PATTERNS.items()}
+
+# Patterns that are still searched over the whole text or line
+SEARCHED_PATTERNS = [LINE_SKU_PATTERN, LINE_QTY_PATTERN, LINE_PRICE_PATTERN, SHIP_TO_CUSTOMER_PATTERN,
+                     WAREHOUSE_CUSTOMER_PATTERN]
+
+ANCHORED_RULES = [
+    (PO_ID_PATTERN, ("order",)),
+    (ORDER_ID_PATTERN, ("order",)),
+    (ALT_PO_PATTERN, ("po", "order")),
+    (CUSTOMER_PATTERN, ("customer",)),
+    (SHIP_TO_SECTION_PATTERN, ("ship",)),
+    (ADDRESS_PATTERN, ("address",))
+] + FALLBACK_ORDER_ID_PATTERNS
+
+ITERATED_RULES = [
+    (PART_ITEM_PATTERN, ("part", "item")),
+    (SKU_ITEM_PATTERN, ("sku", "item", "product"))
+]
+
+def groups(match):
+    return match.groups() if match else None
+
+def captured(pattern, match):
+    """Get what the parser reads from a match: the stripped "value" group if the pattern has one, else all groups"""
+    if match is None:
+        return None
+    if "value" in pattern.groupindex:
+        value = match.group("value") if match.re is pattern else match.group(1)
+        return (value or "").strip()
+    return match.groups()
+
+def test_anchored_matches_equal_search():
+    """Trying each pattern only at its keywords should find what a full search finds"""
+    print("\n==== Testing Anchored Matching ====")
+    rng = random.Random(15)
+    mismatches = 0
+    for _ in range(3000):
+        text = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 40)))
+        positions = KEYWORD_SCANNER.scan(text)
+
+        for pattern, anchors in ANCHORED_RULES:
+            expected = captured(pattern, ORIGINAL_PATTERNS.get(pattern, pattern).search(text))
+            if captured(pattern, first_match(pattern, text, anchor_positions(positions, anchors))) != expected:
+                mismatches += 1
+                print(f"Mismatch for {pattern.pattern!r} on {text!r}")
+
+        for pattern, anchors in ITERATED_RULES:
+            expected = [match.groups() for match in ORIGINAL_PATTERNS.get(pattern, pattern).finditer(text)]
+            if [match.groups() for match in iter_matches(pattern, text, anchor_positions(positions, anchors))] != expected:
+                mismatches += 1
+                print(f"Mismatch for {pattern.pattern!r} on {text!r}")
+
+        # Informal line items start at the digits before the "x" keyword
+        expected = INFORMAL_ITEM_PATTERN.findall(text)
+        starts = digit_run_starts(text, positions["x"])
+        if [match.groups() for match in iter_matches(INFORMAL_ITEM_PATTERN, text, starts)] != expected:
+            mismatches += 1
+            print(f"Mismatch for informal line items on {text!r}")
+
+        for pattern in SEARCHED_PATTERNS:
+            if captured(pattern, pattern.search(text)) != captured(pattern, ORIGINAL_PATTERNS[pattern].search(text)):
+                mismatches += 1
+                print(f"Mismatch for {pattern.pattern!r} on {text!r}")
+
+    success = mismatches == 0
+    print(f"Anchored matching test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_overlapping_keywords():
+    """Keywords starting inside another keyword should still be found"""
+    print("\n==== Testing Overlapping Keywords ====")
+    scanner = KeywordScanner({"ship": "ship", "po": "po", "order": "order"})
+    ascii_positions = scanner.scan("SHIPORDER")
+    unicode_positions = scanner.scan("ſhiporder")
+    print(f"Positions: {ascii_positions}")
+
+    expected = {"ship": [0], "po": [3], "order": [4]}
+    success = ascii_positions == expected and unicode_positions == expected
+
+    try:
+        KeywordScanner({"po": "po", "port": "port"})
+        success = False
+    except ValueError:
+        pass
+
+    print(f"Overlapping keywords test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_pathological_inputs():
+    """Adversarial inputs should take time linear in their size, far below the time budget"""
+    print("\n==== Testing Pathological Inputs ====")
+    success = True
+    for name, make_text in PATHOLOGICAL_INPUTS.items():
+        text = make_text(20000)
+        structured_data = {
+            "customer": {"value": "", "confidence": 0.0, "source": ""},
+            "order_id": {"value": "", "confidence": 0.0, "source": ""},
+            "line_items": [],
+            "shipping_address": {"value": "", "confidence": 0.0, "source": ""}
+        }
+        start_time = time.perf_counter()
+        fill_regex_fields(text, structured_data)
+        SHIP_TO_CUSTOMER_PATTERN.search(text)
+        WAREHOUSE_CUSTOMER_PATTERN.search(text)
+        elapsed = time.perf_counter() - start_time
+        print(f"{name}: {elapsed * 1000:.1f} ms")
+        # The previous patterns needed seconds for a few thousand characters of these
+        if elapsed > 0.5:
+            success = False
+
+    print(f"Pathological inputs test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_time_budget():
+    """Extraction should stop at its deadline and keep the fields found before it"""
+    print("\n==== Testing Regex Time Budget ====")
+    # The labelled fields are found quickly, the line item patterns then take most of a second on the rest
+    text = "Customer: Acme Corporation\nOrder ID: ORD-55555\n" + PATHOLOGICAL_INPUTS["item repeated"](200000)
+    structured_data = {
+        "customer": {"value": "", "confidence": 0.0, "source": ""},
+        "order_id": {"value": "", "confidence": 0.0, "source": ""},
+        "line_items": [],
+        "shipping_address": {"value": "", "confidence": 0.0, "source": ""}
+    }
+    try:
+        fill_regex_fields(text, structured_data, regex_deadline(0.001))
+        raised = False
+    except RegexTimeBudgetExceeded:
+        raised = True
+
+    exceeded_before = get_usage_stats()["regex_budget_exceeded"]
+    budget = parser_v2.REGEX_TIME_BUDGET_MS
+    parser_v2.REGEX_TIME_BUDGET_MS = 100
+    try:
+        start_time = time.perf_counter()
+        partial = extract_entities(text)
+        elapsed = time.perf_counter() - start_time
+    finally:
+        parser_v2.REGEX_TIME_BUDGET_MS = budget
+    print(f"Stopped after {elapsed * 1000:.1f} ms with {len(partial['line_items'])} line items, "
+          f"order ID '{partial['order_id']['value']}'")
+
+    success = (raised and regex_deadline(0) is None and elapsed < 0.5 and
+               partial["order_id"]["value"] == "ORD-55555" and partial["customer"]["value"] == "Acme Corporation" and
+               get_usage_stats()["regex_budget_exceeded"] == exceeded_before + 1)
+    print(f"Regex time budget test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_v1_time_budget():
+    """Parser v1 (?strategy=v1) should run its regex passes under the same time budget"""
+    print("\n==== Testing Parser v1 Regex Time Budget ====")
+    text = "Customer: Acme Corporation\nOrder ID: ORD-55555\n" + PATHOLOGICAL_INPUTS["item repeated"](200000)
+
+    exceeded_before = get_usage_stats()["regex_budget_exceeded"]
+    budget = parser.REGEX_TIME_BUDGET_MS
+    parser.REGEX_TIME_BUDGET_MS = 100
+    try:
+        start_time = time.perf_counter()
+        # No NER needed for this test, the budget only covers the regex passes
+        partial = parser.extract_entities(text, ner_entities=[])
+        elapsed = time.perf_counter() - start_time
+    finally:
+        parser.REGEX_TIME_BUDGET_MS = budget
+    print(f"Stopped after {elapsed * 1000:.1f} ms with {len(partial['line_items'])} line items, "
+          f"order ID '{partial['order_id']['value']}'")
+
+    success = (elapsed < 0.5 and
+               partial["order_id"]["value"] == "ORD-55555" and partial["customer"]["value"] == "Acme Corporation" and
+               get_usage_stats()["regex_budget_exceeded"] == exceeded_before + 1)
+    print(f"Parser v1 regex time budget test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_v1_budget_excludes_ner():
+    """Time spent in NER (e.g. loading the model on the first request) shouldn't count against the budget"""
+    print("\n==== Testing Parser v1 Budget Around NER ====")
+    # No customer label, so v1 runs NER before assembling the multi-line items
+    text = "Order ID: ORD-55555\nSKU: HTR-1204\nQty: 12\nPrice: $32.00\nSKU: ABC-9981\nQty: 3\nPrice: $5.00"
+
+    def slow_ner(texts, regions):
+        time.sleep(0.3)
+        return [[] for _ in texts]
+
+    exceeded_before = get_usage_stats()["regex_budget_exceeded"]
+    budget, extract_ner_in_regions = parser.REGEX_TIME_BUDGET_MS, parser.extract_ner_in_regions
+    parser.REGEX_TIME_BUDGET_MS, parser.extract_ner_in_regions = 100, slow_ner
+    try:
+        result = parser.extract_entities(text)
+    finally:
+        parser.REGEX_TIME_BUDGET_MS, parser.extract_ner_in_regions = budget, extract_ner_in_regions
+    skus = [item.sku.value for item in result["line_items"]]
+    print(f"Line items after a 300 ms NER call with a 100 ms budget: {skus}")
+
+    success = (skus == ["HTR-1204", "ABC-9981"] and
+               get_usage_stats()["regex_budget_exceeded"] == exceeded_before)
+    print(f"Parser v1 budget around NER test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_anchored_matches_equal_search(),
+        test_overlapping_keywords(),
+        test_pathological_inputs(),
+        test_time_budget(),
+        test_v1_time_budget(),
+        test_v1_budget_excludes_ner()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
@@ -0,0 +1,96 @@
+"""
+Test script for the torch thread budget and CPU pinning configuration
+"""
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+from app.runtime_config import parse_cpu_list, worker_cpus, available_cpus
+
+def test_cpu_lists():
+    """CPU lists should parse like Linux cpulist files and split cores between workers"""
+    print("\n==== Testing CPU Lists ====")
+    parsed = parse_cpu_list("0-3, 8,10-11")
+    print(f"Parsed: {parsed}")
+
+    cpus = available_cpus()
+    slices = [worker_cpus(index, 2, threads=0) for index in range(2)]
+    print(f"Available CPUs: {cpus}, worker slices: {slices}")
+
+    success = parsed == [0, 1, 2, 3, 8, 10, 11] and all(set(s) <= set(cpus) and s for s in slices)
+    if len(cpus) >= 2:
+        # With enough cores, workers must not share any
+        success = success and not set(slices[0]) & set(slices[1])
+    print(f"CPU list test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_thread_budget_is_applied():
+    """NER_INTRA_OP_THREADS and NER_CPU_AFFINITY should take effect in a fresh process"""
+    print("\n==== Testing Thread Budget ====")
+    cpu = available_cpus()[0]
+    env = dict(os.environ, NER_INTRA_OP_THREADS="1", NER_CPU_AFFINITY=str(cpu), OCR_THREAD_LIMIT="2")
+    code = ("import json; from app.runtime_config import configure_runtime, get_runtime_report; "
+            "configure_runtime(); print(json.dumps(get_runtime_report()))")
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    report = json.loads(output.strip().splitlines()[-1])
+    print(json.dumps(report, indent=2))
+
+    success = (
+        report["torch_intra_op_threads"] == 1 and
+        report["pinned_cpus"] == [cpu] and
+        report["available_cpus"] == 1 and
+        report["ocr_thread_limit"] == "2"
+    )
+    print(f"Thread budget test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_onnx_session_threads():
+    """The ONNX Runtime session should get the worker's thread budget, not one thread per core"""
+    print("\n==== Testing ONNX Runtime Thread Budget ====")
+    try:
+        import onnxruntime  # noqa: F401
+        import onnx  # noqa: F401
+    except ImportError:
+        print("onnxruntime or onnx not installed, skipping")
+        return True
+
+    cpu = available_cpus()[0]
+    code = ("import json; from app.model_registry import get_ner_components; "
+            "from app.runtime_config import get_runtime_report; _, model = get_ner_components(); "
+            "options = model.session.get_session_options(); "
+            "print(json.dumps([options.intra_op_num_threads, get_runtime_report()]))")
+    results = {}
+    with tempfile.TemporaryDirectory() as onnx_dir:
+        # An explicit thread count, then the pinned core count under NER_CPU_AFFINITY
+        for name, settings in (("threads", {"NER_INTRA_OP_THREADS": "2"}),
+                               ("pinned", {"NER_INTRA_OP_THREADS": "0", "NER_CPU_AFFINITY": str(cpu)})):
+            env = dict(os.environ, NER_INFERENCE_BACKEND="onnx", NER_ONNX_CACHE_DIR=onnx_dir, NER_MODEL_BUNDLE_DIR="",
+                       **settings)
+            output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            results[name] = json.loads(output.strip().splitlines()[-1])
+            session_threads, report = results[name]
+            print(f"{name}: session intra-op threads {session_threads}, "
+                  f"report {report['onnx_intra_op_threads']}/{report['onnx_inter_op_threads']}")
+
+    success = (
+        results["threads"][0] == results["threads"][1]["onnx_intra_op_threads"] == 2 and
+        results["pinned"][0] == results["pinned"][1]["onnx_intra_op_threads"] == 1 and
+        results["pinned"][1]["pinned_cpus"] == [cpu]
+    )
+    print(f"ONNX Runtime thread budget test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_cpu_lists(),
+        test_thread_budget_is_applied(),
+        test_onnx_session_threads()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
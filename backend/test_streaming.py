@@ -0,0 +1,153 @@
+"""
+Test script for the streaming parse of large order documents
+"""
+import os
+import json
+import tempfile
+import tracemalloc
+
+from app.ocr import iter_text_lines
+from app.parser_v2 import parse_order_document, parse_order_stream
+from app.parser_engine import ParserEngine
+from benchmark_parser import synthetic_invoice
+
+# Keep the LLM out of parse_order_document
+os.environ["USE_LLM_PARSER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0"
+
+PART_TABLE_DOCUMENT = """PO Number: GT-ORDER-4567
+Customer: Globex Inc
+Ship To:
+Globex Inc
+500 Industrial Way
+Austin, TX 78701
+
+Part #AXL-9920 | Qty: 25 | Unit Price: $12.50
+Part #MNT-8833 | Qty: 10 | Unit Price: $44.99
+Part #AXL-9920 | Qty: 25 | Unit Price: $12.50
+"""
+
+INFORMAL_DOCUMENT = """hey, pls send 12x of HTR-1204 @ $32.00 and 3x of ABC-9981 @ $5
+ship to Acme Corp
+123 Main Street
+Springfield, IL
+
+thanks
+Ref #: XTZ-54821-A"""
+
+def test_stream_matches_whole():
+    """Streaming a document should find the same fields, line items and confidence as parsing it whole"""
+    print("\n==== Testing Stream Against Whole Parse ====")
+    success = True
+    for name, text in (("part table", PART_TABLE_DOCUMENT), ("informal", INFORMAL_DOCUMENT),
+                       ("synthetic", synthetic_invoice(1000))):
+        whole = parse_order_document(text)
+        records = list(parse_order_stream(text.splitlines()))
+        header, items, summary = records[0], records[1:-1], records[-1]
+        flat_items = [{key: item[key] for key in ("sku", "quantity", "price")} for item in items]
+        print(f"{name}: {len(items)} streamed line items, {len(whole['line_items'])} whole")
+
+        success = (success and header["type"] == "header" and summary["type"] == "summary" and
+                   all(item["type"] == "line_item" for item in items) and
+                   all(header[field] == whole[field] for field in ("customer", "order_id", "shipping_address")) and
+                   # Items come in document order, rather than grouped by the pattern that found them
+                   sorted(map(json.dumps, flat_items)) == sorted(map(json.dumps, whole["line_items"])) and
+                   summary["line_items"] == len(items) and
+                   abs(summary["confidence"]["overall"] - whole["confidence"]["overall"]) < 1e-9 and
+                   items[0]["extraction_details"]["sku"]["value"] == items[0]["sku"])
+
+    print(f"Stream against whole parse test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_stream_memory():
+    """Memory used while streaming should not grow with the document"""
+    print("\n==== Testing Stream Memory ====")
+    peaks = {}
+    for size in (20000, 100000):
+        lines = synthetic_invoice(size).splitlines()
+        tracemalloc.start()
+        records = parse_order_stream(iter(lines), dedup_window=1000)
+        item_count = sum(1 for record in records if record["type"] == "line_item")
+        peaks[size] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{size} lines: {item_count} line items, peak {peaks[size] / 1024:.0f} KB")
+
+    success = peaks[100000] < peaks[20000] * 1.5
+    print(f"Stream memory test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_stream_early_results():
+    """The header and first line items should come before the rest of the document is read"""
+    print("\n==== Testing Early Results ====")
+    read = [0]
+
+    def lines():
+        for line in synthetic_invoice(5000).splitlines():
+            read[0] += 1
+            yield line
+
+    records = parse_order_stream(lines(), header_lines=50)
+    header = next(records)
+    read_for_header = read[0]
+    first_item = next(records)
+    print(f"Lines read for the header: {read_for_header}, for the first line item: {read[0]}")
+
+    success = (header["type"] == "header" and header["order_id"] == "ORD-55555" and read_for_header == 50 and
+               first_item["type"] == "line_item" and read[0] < 100)
+    print(f"Early results test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_text_lines():
+    """Text files should be read line by line whatever their encoding, and bad files rejected up front"""
+    print("\n==== Testing Text Lines ====")
+    paths = []
+    success = True
+    try:
+        for content in ("Customer: Zoë Müller\r\nSKU: ABC-123\n".encode("utf-8"),
+                        "Customer: Zoë Müller\r\nSKU: ABC-123\n".encode("latin-1")):
+            handle, path = tempfile.mkstemp(suffix=".txt")
+            paths.append(path)
+            with os.fdopen(handle, "wb") as f:
+                f.write(content)
+            file_type, lines = iter_text_lines(path)
+            lines = list(lines)
+            print(f"{file_type}: {lines}")
+            success = success and file_type == "txt" and lines == ["Customer: Zoë Müller", "SKU: ABC-123"]
+
+        handle, path = tempfile.mkstemp(suffix=".txt")
+        os.close(handle)
+        paths.append(path)
+        for bad_path in (path, path + ".missing"):
+            try:
+                iter_text_lines(bad_path)
+                success = False
+            except ValueError as e:
+                print(f"Rejected: {str(e)}")
+    finally:
+        for path in paths:
+            os.remove(path)
+
+    # The v1 parser has no streaming mode, which GET /parse/stream checks up front
+    engine = ParserEngine("app.parser")
+    success = success and not engine.has_streaming_mode() and engine.has_streaming_mode("v2")
+    try:
+        engine.stream([])
+        success = False
+    except ValueError as e:
+        print(f"Rejected: {str(e)}")
+
+    print(f"Text lines test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_stream_matches_whole(),
+        test_stream_memory(),
+        test_stream_early_results(),
+        test_text_lines()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")
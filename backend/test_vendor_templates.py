@@ -0,0 +1,210 @@
+"""
+Test script for the vendor template fast path in parser_v2
+"""
+import os
+import json
+import time
+import tempfile
+
+# Keep the LLM out of parse_order_document (set before the app modules read it)
+os.environ["USE_LLM_PARSER"] = "false"
+os.environ["CONFIDENCE_THRESHOLD"] = "0"
+
+from app import parser_v2
+from app.vendor_templates import EXAMPLE_TEMPLATES_PATH, TemplateRegistry, VendorTemplate, load_template_registry
+from app.parser_stats import get_usage_stats
+
+GLOBEX_DOCUMENT = """GLOBEX INDUSTRIAL SUPPLY
+Purchase Order
+PO Number: GX-20931
+Customer: Acme Corporation
+Ship To:
+Acme Corporation
+123 Main Street
+Austin, TX 78701
+
+Line | SKU | Qty | Unit Price
+1 | AXL-9920 | 25 | $12.50
+2 | BRK-1100 | 4 | $1,310.00
+
+Total: $5552.50
+"""
+
+INITECH_DOCUMENT = """Initech Parts Co.
+Order #: IN-7781
+Bill To: Initech LLC
+Deliver To: 500 Oak Avenue, Springfield, IL 62701
+Items:
+Part #HTR-1204 ; Qty: 12 ; Price: $32.00
+Part #ABC-9981 ; Qty: 3 ; Price: $5
+"""
+
+GENERIC_DOCUMENT = """Order ID: ORD-55555
+Customer: Acme Corporation
+Items:
+- SKU: WID-001, Quantity: 2, Price: $10.00
+"""
+
+def use_registry(registry):
+    """Make parse_order_document use a registry, returning the previous one"""
+    previous = parser_v2.TEMPLATES
+    parser_v2.TEMPLATES = registry
+    return previous
+
+def test_template_match():
+    """Documents should match the template whose header they start with, and only that one"""
+    print("\n==== Testing Template Matching ====")
+    registry = load_template_registry(EXAMPLE_TEMPLATES_PATH)
+
+    globex = registry.match(GLOBEX_DOCUMENT)
+    initech = registry.match(INITECH_DOCUMENT)
+    # Same lines in another order, and a document in no known layout
+    reordered = registry.match(GLOBEX_DOCUMENT.replace("GLOBEX INDUSTRIAL SUPPLY\nPurchase Order",
+                                                       "Purchase Order\nGLOBEX INDUSTRIAL SUPPLY"))
+    generic = registry.match(GENERIC_DOCUMENT)
+    print(f"Matched: {globex and globex.name}, {initech and initech.name}, {reordered}, {generic}")
+
+    # Values, case and spacing of the header lines don't change the fingerprint
+    restyled = registry.match(GLOBEX_DOCUMENT.replace("PO Number: GX-20931", "PO   NUMBER:GX-1"))
+
+    success = (globex is registry.templates["globex-industrial"] and
+               initech is registry.templates["initech-parts"] and
+               reordered is None and generic is None and restyled is globex and
+               TemplateRegistry().match(GLOBEX_DOCUMENT) is None)
+
+    print(f"Template matching test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_template_extraction():
+    """A matched document should be read directly, in the output format of the generic parser"""
+    print("\n==== Testing Template Extraction ====")
+    previous = use_registry(load_template_registry(EXAMPLE_TEMPLATES_PATH))
+    try:
+        used_before = get_usage_stats()["template_used"]
+        output = parser_v2.parse_order_document(GLOBEX_DOCUMENT)
+        initech_output = parser_v2.parse_order_document(INITECH_DOCUMENT)
+        stats = get_usage_stats()
+    finally:
+        use_registry(previous)
+
+    print(f"Output: { {key: value for key, value in output.items() if key != 'extraction_details'} }")
+    success = (output["order_id"] == "GX-20931" and output["customer"] == "Acme Corporation" and
+               output["shipping_address"] == "Acme Corporation, 123 Main Street, Austin, TX 78701" and
+               output["line_items"] == [{"sku": "AXL-9920", "quantity": 25, "price": 12.5},
+                                        {"sku": "BRK-1100", "quantity": 4, "price": 1310.0}] and
+               output["source"] == "template" and
+               output["extraction_details"]["order_id"]["source"] == "template:globex-industrial" and
+               abs(output["confidence"]["overall"] - 0.98) < 1e-9 and
+               initech_output["line_items"] == [{"sku": "HTR-1204", "quantity": 12, "price": 32.0},
+                                                {"sku": "ABC-9981", "quantity": 3, "price": 5.0}] and
+               initech_output["shipping_address"] == "500 Oak Avenue, Springfield, IL 62701" and
+               stats["template_used"] == used_before + 2 and
+               stats["template_matches"].get("initech-parts", 0) >= 1)
+
+    # Matching and reading a document takes microseconds, not the milliseconds of the generic path
+    registry = load_template_registry(EXAMPLE_TEMPLATES_PATH)
+    start_time = time.perf_counter()
+    for _ in range(1000):
+        registry.match(GLOBEX_DOCUMENT).extract(GLOBEX_DOCUMENT)
+    elapsed = (time.perf_counter() - start_time) / 1000
+    print(f"Template match + extraction: {elapsed * 1e6:.1f} us per document")
+    success = success and elapsed < 0.001
+
+    print(f"Template extraction test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_template_fallthrough():
+    """A document the template can't fully read should go through the generic parser"""
+    print("\n==== Testing Template Fall-through ====")
+    registry = load_template_registry(EXAMPLE_TEMPLATES_PATH)
+    template = registry.templates["globex-industrial"]
+    broken_documents = [
+        GLOBEX_DOCUMENT.replace("2 | BRK-1100 | 4 | $1,310.00", "2 | BRK-1100 | four | $1,310.00"),
+        GLOBEX_DOCUMENT.replace("2 | BRK-1100 | 4 | $1,310.00", "2 | BRK-1100 | 4"),
+        GLOBEX_DOCUMENT.replace("Customer: Acme Corporation", "Customer:"),
+        GLOBEX_DOCUMENT.split("Line | SKU")[0]
+    ]
+    success = all(registry.match(text) is template and template.extract(text) is None for text in broken_documents)
+
+    previous = use_registry(registry)
+    threshold = os.environ.get("CONFIDENCE_THRESHOLD")
+    # Keep the generic path off the LLM fallback
+    os.environ["CONFIDENCE_THRESHOLD"] = "0"
+    try:
+        fallthroughs_before = get_usage_stats()["template_fallthroughs"].get("globex-industrial", 0)
+        output = parser_v2.parse_order_document(broken_documents[0])
+        stats = get_usage_stats()
+    finally:
+        use_registry(previous)
+        if threshold is None:
+            del os.environ["CONFIDENCE_THRESHOLD"]
+        else:
+            os.environ["CONFIDENCE_THRESHOLD"] = threshold
+
+    print(f"Generic parser output: order ID '{output['order_id']}', source {output.get('source')}")
+    success = (success and output.get("source") != "template" and
+               output["extraction_details"]["order_id"]["source"].startswith("regex") and
+               stats["template_fallthroughs"]["globex-industrial"] == fallthroughs_before + 1)
+
+    print(f"Template fall-through test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+def test_invalid_templates():
+    """Malformed templates should fail at load time with the template named in the error"""
+    print("\n==== Testing Invalid Templates ====")
+    with open(EXAMPLE_TEMPLATES_PATH, "r", encoding="utf-8") as f:
+        valid = json.load(f)["templates"][1]
+
+    invalid_specs = [
+        dict(valid, header=[]),
+        dict(valid, fields={"total": {"label": "Total"}}),
+        dict(valid, fields={"order_id": {"label": "Order #", "max_lines": 0}}),
+        dict(valid, line_items=dict(valid["line_items"], columns=["sku", "quantity"])),
+        dict(valid, line_items=dict(valid["line_items"], columns=["sku", "sku", "price"])),
+        dict(valid, required=["customer", "notes"]),
+        dict(valid, layout="fixed")
+    ]
+    success = True
+    for spec in invalid_specs:
+        try:
+            VendorTemplate(spec)
+            print(f"No error for {spec}")
+            success = False
+        except ValueError as e:
+            print(f"Rejected: {str(e)}")
+            success = success and "initech-parts" in str(e)
+
+    # Two templates can't share a header
+    try:
+        TemplateRegistry([VendorTemplate(valid), VendorTemplate(dict(valid, name="initech-copy"))])
+        success = False
+    except ValueError as e:
+        print(f"Rejected: {str(e)}")
+
+    handle, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(handle, "w") as f:
+        json.dump([valid], f)
+    try:
+        load_template_registry(path)
+        success = False
+    except ValueError as e:
+        print(f"Rejected: {str(e)}")
+    finally:
+        os.remove(path)
+
+    success = success and len(load_template_registry("")) == 0
+    print(f"Invalid templates test {'PASSED' if success else 'FAILED'}")
+
+    return success
+
+if __name__ == "__main__":
+    results = [
+        test_template_match(),
+        test_template_extraction(),
+        test_template_fallthrough(),
+        test_invalid_templates()
+    ]
+    print(f"\n===== TEST RESULTS: {sum(results)}/{len(results)} tests passed =====")